@@ -1,11 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, url_for
+from flask import (Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context,
+                   url_for)
 from flask_cors import CORS
 import os
 import sys
+import json
 import shutil
 import logging
 import uuid
 import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import random
 from dotenv import load_dotenv
@@ -13,6 +16,21 @@ from manim import config
 
 # Import the new service
 from edudiff.services.manim_service import ManimService
+from edudiff.services.concept_cache import get_concept_index
+from edudiff.services.degradation import get_governor
+from edudiff.services.jobs import (JOB_ID_RE, RenderCancelled, client_disconnected, get_job_registry,
+                                   run_render_process)
+from edudiff.services.render_queue import FINAL_STATES, RENDER_QUEUE, get_render_queue
+from edudiff.services.render_worker import cancel_render, wait_for_render
+from edudiff.services.scheduler import SchedulerRejected, get_scheduler, tenant_for
+from edudiff.manim_engine.duration import QUALITY_FLAGS, DurationBudgetError, budget_for, enforce_duration_budget
+from edudiff.manim_engine.cost import SceneCostError, check_admission, estimate_cost
+from edudiff.manim_engine.params import extract_params, params_key
+from edudiff.manim_engine.progress import count_animations
+from edudiff.manim_engine.renderer import render_env
+from edudiff.math.equations import solve_equation
+from edudiff.audio.narration_packs import get_pack
+from edudiff.pipeline.generate import NARRATION_MODE, inject_audio_into_script, narrate_video
 
 # Load environment variables
 load_dotenv()
@@ -66,6 +84,16 @@ logger = logging.getLogger(__name__)
 
 # --- GenAI / rendering defaults ---------------------------------------------
 RENDER_QUALITY_DEFAULT = os.getenv('RENDER_QUALITY', 'low').lower()
+# Seconds /jobs/<id>/events waits for a job that has not been registered yet
+JOB_EVENTS_WAIT = float(os.getenv('JOB_EVENTS_WAIT', '10'))
+# Seconds /generate waits for a render worker when RENDER_QUEUE is on (queue wait plus render)
+RENDER_QUEUE_WAIT = float(os.getenv('RENDER_QUEUE_WAIT', '420'))
+
+# Explanation LLM calls run in the background while the scene renders
+explanation_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('EXPLANATION_WORKERS', '4')),
+    thread_name_prefix='explanation'
+)
 
 # Set media and temporary directories with fallback to local paths
 if os.environ.get('DOCKER_ENV'):
@@ -105,6 +133,52 @@ def generate():
         if quality_requested not in {'low', 'medium', 'high'}:
             quality_requested = RENDER_QUALITY_DEFAULT
         
+        # Values in the concept (function, range, matrix) select and parameterize the template
+        params = extract_params(concept)
+        signature = params_key(params)
+        
+        # Under load, render a step or two below the requested quality with shorter scenes
+        degradation = get_governor().plan(quality_requested)
+        quality_effective = degradation['quality']
+        if degradation['level']:
+            logger.info(f"Degraded render (level {degradation['level']}): "
+                        f"{quality_requested} requested, {quality_effective} delivered")
+        
+        # Serve a stored result for the same or a near-duplicate concept (any quality under load)
+        concept_index = get_concept_index()
+        cached = concept_index.lookup(concept, quality_requested, params_key=signature,
+                                      any_quality=degradation['prefer_cached'])
+        if cached:
+            logger.info(f"Concept cache hit: '{concept}' ~ '{cached['matched_concept']}' ({cached['similarity']})")
+            cached['cache_hit'] = True
+            cached['requested_quality'] = quality_requested
+            return jsonify(cached)
+        
+        # Refuse quickly when this user or the node already has too many renders queued
+        tenant = tenant_for(request.headers, request.remote_addr)
+        lane = 'batch' if request.json.get('lane') == 'batch' else 'interactive'
+        try:
+            get_scheduler().check(tenant, lane, get_render_queue() if RENDER_QUEUE else None)
+        except SchedulerRejected as sr:
+            logger.warning(f'Render refused for {tenant}: {sr}')
+            return jsonify(sr.to_dict()), sr.status, {'Retry-After': str(sr.retry_after)}
+        
+        # The client may name the job up front so it can cancel it with DELETE /jobs/<id>
+        job_id = request.json.get('job_id') or uuid.uuid4().hex
+        if not JOB_ID_RE.match(job_id):
+            return jsonify({'error': 'Invalid job_id', 'details': 'Use 8-64 letters, digits, _ or -'}), 400
+        if get_job_registry().owner(job_id) is not None or (RENDER_QUEUE and get_render_queue().get(job_id)):
+            return jsonify({'error': 'Job is already running', 'job_id': job_id}), 409
+        
+        # Start the explanation now; it is independent of the render and joined at the end.
+        # Locally solved equations already carry their explanation.
+        solution = solve_equation(concept)
+        if solution:
+            explanation_future = Future()
+            explanation_future.set_result(solution['explanation'])
+        else:
+            explanation_future = explanation_executor.submit(ManimService.generate_explanation, concept)
+        
         # Generate unique filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         random_str = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=6))
@@ -117,7 +191,7 @@ def generate():
         try:
             # Generate Manim code using the service
             try:
-                result = ManimService.generate_code(concept)
+                result = ManimService.generate_code(concept, params)
                 
                 # Unpack result based on length (backward compatibility)
                 if isinstance(result, tuple):
@@ -151,15 +225,63 @@ def generate():
             if not manim_code:
                 # No verification template found -> Return explanation only (Safety Policy)
                 logger.info("No visualization generated (strict safety). Returning explanation only.")
-                explanation = ManimService.generate_explanation(concept)
-                return jsonify({
+                explanation = explanation_future.result()
+                response = {
                     'success': True,
                     'visualization_generated': False,
                     'visualization_type': 'none',
                     'explanation': explanation,
                     'video_url': None,
                     'code': None
-                })
+                }
+                concept_index.add(concept, response, params_key=signature)
+                return jsonify(response)
+            
+            # Built-in templates are narrated from their narration pack (built once, then reused)
+            try:
+                narration = get_pack(manim_code)
+            except Exception as pack_err:
+                # e.g. no TTS engine on this host: the video is still worth serving silent
+                logger.error(f"Narration pack unavailable, rendering without narration: {pack_err}")
+                narration = None
+            if narration:
+                manim_code = inject_audio_into_script(manim_code, narration['voice'], narration['audio'])
+                logger.info(f"Narrating with the '{narration['voice']['title']}' pack")
+            
+            # Keep the timeline within the budget for the delivered quality, shortened under load
+            try:
+                try:
+                    budget = budget_for(quality_effective) * degradation['duration_scale']
+                    manim_code, duration_report = enforce_duration_budget(manim_code, quality_effective, budget)
+                except DurationBudgetError:
+                    if degradation['duration_scale'] == 1:
+                        raise
+                    # the narration does not fit the shortened budget; keep the tier's own
+                    manim_code, duration_report = enforce_duration_budget(manim_code, quality_effective)
+            except DurationBudgetError as de:
+                logger.warning(f'Scene rejected by the duration budget: {de}')
+                return jsonify({
+                    'error': 'Animation is too long to render',
+                    'details': str(de),
+                    'duration': de.report
+                }), 422
+            if duration_report['edits']:
+                logger.info(f"Scene shortened from {duration_report['planned']}s to "
+                            f"{duration_report['final']}s (budget {duration_report['budget']}s)")
+            
+            # Refuse scenes whose estimated render cost is over the limits
+            render_estimate = estimate_cost(manim_code, quality_effective)
+            try:
+                check_admission(render_estimate)
+            except SceneCostError as ce:
+                logger.warning(f'Scene rejected by cost admission: {ce}')
+                return jsonify({
+                    'error': 'Animation is too expensive to render',
+                    'details': str(ce),
+                    'estimate': render_estimate
+                }), 422
+            logger.info(f"Estimated render: {render_estimate['cpu_seconds']} CPU s, "
+                        f"{render_estimate['memory_mb']} MB, ETA {render_estimate['eta_seconds']}s")
             
             # Write code to temporary file
             code_file = os.path.join(temp_dir, 'scene.py')
@@ -171,7 +293,7 @@ def generate():
             os.makedirs(media_dir, exist_ok=True)
             
             # Determine manim quality flag
-            quality_flag = {'low': '-ql', 'medium': '-qm', 'high': '-qh'}[quality_requested]
+            quality_flag = {'low': '-ql', 'medium': '-qm', 'high': '-qh'}[quality_effective]
             
             # Run manim command with error handling
             output_file = os.path.join(app.static_folder, 'videos', f'{filename}.mp4')
@@ -187,71 +309,117 @@ def generate():
             ]
             
             try:
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    cwd=temp_dir,
-                    timeout=300  # 5 minute timeout
-                )
+                if RENDER_QUEUE:
+                    # Other requests may have queued while this one was generating code
+                    get_scheduler().check(tenant, lane, get_render_queue())
+                    # A render worker (render_worker.py) renders the scene straight to output_file
+                    get_job_registry().open_log(job_id, tenant, fresh=True)
+                    get_job_registry().publish(job_id, {'type': 'queued'})
+                    get_render_queue().enqueue(job_id, tenant, lane, {
+                        'code': manim_code,
+                        'quality': QUALITY_FLAGS[quality_effective],
+                        'scene': 'MainScene',
+                        'output_path': output_file,
+                        'cost': render_estimate['cpu_seconds'],
+                    })
+                    wait_for_render(job_id, timeout=RENDER_QUEUE_WAIT,
+                                    cancelled=client_disconnected(request.environ))
+                else:
+                    # Cancelled by DELETE /jobs/<id> or when the client goes away, queued or rendering
+                    with get_job_registry().job(job_id, tenant, client_disconnected(request.environ)) as job:
+                        # Wait for a render slot (node-wide cap, lanes, per-user fair queuing)
+                        with get_scheduler().slot(tenant, lane, cost=render_estimate['cpu_seconds'],
+                                                  cancelled=job.should_cancel):
+                            # Own process group: a timeout or cancellation also stops manim's ffmpeg children
+                            result = run_render_process(
+                                command,
+                                cwd=temp_dir,
+                                env=render_env(),
+                                timeout=300,  # 5 minute timeout
+                                job=job,
+                                animations=count_animations(manim_code)
+                            )
                 
-                if result.returncode != 0:
-                    # Capture both stderr and stdout for better error reporting
-                    error_msg = result.stderr if result.stderr else result.stdout if result.stdout else 'Unknown error during animation generation'
-                    logger.error(f'Manim execution failed (returncode={result.returncode})')
-                    logger.error(f'Manim stderr: {result.stderr}')
-                    logger.error(f'Manim stdout: {result.stdout}')
-                    # Raise RuntimeError as requested, but we'll catch it in the outer handler
-                    raise RuntimeError(f'Manim render failed: {error_msg}')
+                    if result.returncode != 0:
+                        # Capture both stderr and stdout for better error reporting
+                        error_msg = result.stderr if result.stderr else result.stdout if result.stdout else 'Unknown error during animation generation'
+                        logger.error(f'Manim execution failed (returncode={result.returncode})')
+                        logger.error(f'Manim stderr: {result.stderr}')
+                        logger.error(f'Manim stdout: {result.stdout}')
+                        # Raise RuntimeError as requested, but we'll catch it in the outer handler
+                        raise RuntimeError(f'Manim render failed: {error_msg}')
                 
-                # Look for the video file in multiple possible locations
-                possible_paths = [
-                    os.path.join(media_dir, 'videos', 'scene', '1080p60', 'MainScene.mp4'),
-                    os.path.join(media_dir, 'videos', 'scene', '720p30', 'MainScene.mp4'),
-                    os.path.join(media_dir, 'videos', 'scene', '480p15', 'MainScene.mp4'),  # low-quality default in manim 0.17
-                    os.path.join(media_dir, 'videos', 'MainScene.mp4'),
-                    os.path.join(temp_dir, 'MainScene.mp4')
-                ]
+                    # Look for the video file in multiple possible locations
+                    possible_paths = [
+                        os.path.join(media_dir, 'videos', 'scene', '1080p60', 'MainScene.mp4'),
+                        os.path.join(media_dir, 'videos', 'scene', '720p30', 'MainScene.mp4'),
+                        os.path.join(media_dir, 'videos', 'scene', '480p15', 'MainScene.mp4'),  # low-quality default in manim 0.17
+                        os.path.join(media_dir, 'videos', 'MainScene.mp4'),
+                        os.path.join(temp_dir, 'MainScene.mp4')
+                    ]
                 
-                video_found = False
-                for source_path in possible_paths:
-                    if os.path.exists(source_path):
-                        shutil.move(source_path, output_file)
-                        video_found = True
-                        break
+                    video_found = False
+                    for source_path in possible_paths:
+                        if os.path.exists(source_path):
+                            shutil.move(source_path, output_file)
+                            video_found = True
+                            break
                 
-                # Fallback: walk media_dir recursively to locate the file
-                if not video_found:
-                    for root, _dirs, files in os.walk(media_dir):
-                        if 'MainScene.mp4' in files:
-                            try:
-                                shutil.move(os.path.join(root, 'MainScene.mp4'), output_file)
-                                video_found = True
-                                break
-                            except Exception as move_err:
-                                logger.error(f'Error moving located video: {move_err}')
-                                # if move fails, continue searching
-                                continue
+                    # Fallback: walk media_dir recursively to locate the file
+                    if not video_found:
+                        for root, _dirs, files in os.walk(media_dir):
+                            if 'MainScene.mp4' in files:
+                                try:
+                                    shutil.move(os.path.join(root, 'MainScene.mp4'), output_file)
+                                    video_found = True
+                                    break
+                                except Exception as move_err:
+                                    logger.error(f'Error moving located video: {move_err}')
+                                    # if move fails, continue searching
+                                    continue
                 
-                if not video_found:
-                    logger.error(f'Video not found in any of these locations or recursively under media_dir: {possible_paths}')
-                    return jsonify({'error': 'Generated video file not found'}), 500
+                    if not video_found:
+                        logger.error(f'Video not found in any of these locations or recursively under media_dir: {possible_paths}')
+                        return jsonify({'error': 'Generated video file not found'}), 500
                 
-                # Generate explanation using service
-                explanation = ManimService.generate_explanation(concept)
+                # The scene rendered silent; mux its narration track in place
+                if narration and NARRATION_MODE in ('mux', 'overlap'):
+                    try:
+                        narrate_video(output_file, manim_code, narration['audio'], output_path=output_file)
+                    except Exception as mux_err:
+                        logger.error(f"Narration mux failed, serving the silent video: {mux_err}")
+                
+                # Join the explanation started when the request arrived
+                explanation = explanation_future.result()
 
                 # Return success response
-                return jsonify({
+                response = {
                     'success': True,
+                    'job_id': job_id,
                     'video_url': url_for('static', filename=f'videos/{filename}.mp4'),
                     'code': manim_code,
                     'used_ai': used_ai,
                     'visualization_type': viz_type,
                     'visualization_generated': True,
-                    'render_quality': quality_requested,
+                    'render_quality': quality_effective,
+                    'requested_quality': quality_requested,
+                    'degradation_level': degradation['level'],
+                    'render_estimate': render_estimate,
                     'explanation': explanation
-                })
+                }
+                # A degraded render is shortened as well as lowered in quality; it is not the
+                # video this concept gets at full service, so later requests must not be served it
+                if not degradation['level']:
+                    concept_index.add(concept, response, quality=quality_effective, video_path=output_file,
+                                      params_key=signature)
+                return jsonify(response)
                 
+            except SchedulerRejected as sr:
+                logger.warning(f'Render refused for {tenant}: {sr}')
+                return jsonify(sr.to_dict()), sr.status, {'Retry-After': str(sr.retry_after)}
+            except RenderCancelled as rc:
+                logger.info(f'Render {job_id} stopped: {rc}')
+                return jsonify({'error': 'Render cancelled', 'details': str(rc), 'job_id': job_id}), 499
             except subprocess.TimeoutExpired:
                 return jsonify({
                     'error': 'Animation generation timed out',
@@ -266,6 +434,9 @@ def generate():
                 }), 500
                 
         finally:
+            # A request that ends early (rejected, cancelled, failed) does not wait for its explanation;
+            # drop it if it has not started. Joined futures are already done, so this is a no-op for them.
+            explanation_future.cancel()
             # Cleanup temporary directory
             shutil.rmtree(temp_dir, ignore_errors=True)
             
@@ -279,6 +450,56 @@ def generate():
             'details': str(e)
         }), 500
 
+def job_active(job_id):
+    """Whether a job is rendering on this node or waiting in, or leased from, the render queue."""
+    if get_job_registry().owner(job_id) is not None:
+        return True
+    queued = get_render_queue().get(job_id) if RENDER_QUEUE else None
+    return queued is not None and queued['state'] not in FINAL_STATES
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a render started by the same user; its processes are killed and its slot freed."""
+    tenant = tenant_for(request.headers, request.remote_addr)
+    cancelled = get_job_registry().cancel(job_id, tenant)
+    if RENDER_QUEUE:
+        # queued jobs, and leased ones whose worker does not share JOBS_DIR
+        cancelled = cancel_render(job_id, tenant) or cancelled
+    if not cancelled:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'cancelling'}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Latest event of a render started by the same user."""
+    registry = get_job_registry()
+    if registry.events_owner(job_id) != tenant_for(request.headers, request.remote_addr):
+        return jsonify({'error': 'Job not found'}), 404
+    events = registry.events(job_id)
+    return jsonify({'job_id': job_id, 'running': job_active(job_id), 'event': events[-1] if events else None})
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a render's progress as server-sent events until it ends."""
+    registry = get_job_registry()
+    # the stream may be opened just before the POST /generate that creates the job
+    if registry.events_owner(job_id, wait=JOB_EVENTS_WAIT) != tenant_for(request.headers, request.remote_addr):
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        after = 0
+    
+    def stream():
+        for event in registry.follow(job_id, after=after, alive=lambda: job_active(job_id)):
+            if event is None:
+                yield ': keepalive\n\n'
+            else:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/static/videos/<path:filename>')
 def serve_video(filename):
     """Serve video files from static/videos directory."""
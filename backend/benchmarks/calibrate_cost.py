@@ -0,0 +1,135 @@
+"""
+Calibrate the scene cost model against measured template renders.
+
+Renders every template in ``manim_engine/templates.py`` at the given quality
+tiers, measures CPU seconds (manim + ffmpeg, via wait4) and peak RSS, fits
+the coefficients of ``edudiff.manim_engine.cost`` with non-negative least
+squares and writes them to COST_MODEL_PATH.
+
+    python benchmarks/calibrate_cost.py
+    python benchmarks/calibrate_cost.py --qualities l m h --repeat 2
+    python benchmarks/calibrate_cost.py --dry-run    # report only, keep the current model
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edudiff.manim_engine import cost, templates
+
+TEMPLATES = {
+    "pythagorean": templates.generate_pythagorean_code,
+    "tangent_slope": templates.generate_tangent_slope_code,
+    "derivative_function": templates.generate_derivative_function_code,
+    "integral": templates.generate_integral_code,
+    "3d_surface": templates.generate_3d_surface_code,
+    "sphere": templates.generate_sphere_code,
+    "cube": templates.generate_cube_code,
+    "matrix": templates.generate_matrix_code,
+    "eigenvalue": templates.generate_eigenvalue_code,
+    "complex": templates.generate_complex_code,
+    "diff_eq": templates.generate_diff_eq_code,
+    "trig": templates.generate_trig_code,
+    "quadratic": templates.generate_quadratic_code,
+    "basic": templates.generate_basic_visualization_code,
+}
+
+CPU_TERMS = ["base", "tex", "play", "frame", "frame_3d", "frame_updater"]
+MEM_TERMS = ["mem_base", "mem_mpx", "mem_3d", "mem_mobject"]
+
+
+def measure_render(code, quality):
+    """Render once; returns (cpu_seconds, peak_rss_mb, wall_seconds)."""
+    with tempfile.TemporaryDirectory(prefix="edudiff_calibrate_") as work:
+        scene_file = os.path.join(work, "scene.py")
+        with open(scene_file, "w", encoding="utf-8") as f:
+            f.write(code)
+        command = [sys.executable, "-m", "manim", "render", f"-q{quality}", "--disable_caching",
+                   "--media_dir", os.path.join(work, "media"), scene_file, "MainScene"]
+        # stderr goes to a file: wait4 does not drain pipes, and manim is chatty
+        with open(os.path.join(work, "stderr.log"), "w+", encoding="utf-8") as err:
+            start = time.perf_counter()
+            proc = subprocess.Popen(command, cwd=work, stdout=subprocess.DEVNULL, stderr=err)
+            _pid, status, usage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            if proc.returncode != 0:
+                err.seek(0)
+                raise RuntimeError(err.read()[-500:])
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024.0, wall
+
+
+def memory_row(features, quality):
+    width, height, _fps = cost.QUALITY_SPECS[quality]
+    return [1.0, width * height / 1e6, features["three_d"], features["mobjects"]]
+
+
+def fit(rows, targets):
+    import numpy as np
+    from scipy.optimize import nnls
+
+    coefficients, _residual = nnls(np.array(rows, dtype=float), np.array(targets, dtype=float))
+    return coefficients.tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qualities", nargs="+", default=["l", "m"], choices=sorted(cost.QUALITY_SPECS))
+    parser.add_argument("--repeat", type=int, default=1, help="renders per template and quality")
+    parser.add_argument("--output", default=cost.COST_MODEL_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="do not write the fitted model")
+    args = parser.parse_args()
+
+    samples = []
+    for name, generate in TEMPLATES.items():
+        code = generate()
+        features = cost.scene_features(code)
+        for quality in args.qualities:
+            for _ in range(args.repeat):
+                try:
+                    cpu, rss, wall = measure_render(code, quality)
+                except RuntimeError as e:
+                    print(f"{name:<22}{quality:<4} render failed: {e}")
+                    continue
+                samples.append({"template": name, "quality": quality, "features": features,
+                                "cpu_seconds": cpu, "memory_mb": rss, "wall_seconds": wall})
+                print(f"{name:<22}{quality:<4}cpu={cpu:7.1f}s  rss={rss:7.0f}MB  wall={wall:7.1f}s")
+
+    if len(samples) < len(CPU_TERMS):
+        print(f"Only {len(samples)} successful renders; need at least {len(CPU_TERMS)} to fit.")
+        return 1
+
+    cpu_rows = [[cost.design_row(s["features"], s["quality"])[t] for t in CPU_TERMS] for s in samples]
+    mem_rows = [memory_row(s["features"], s["quality"]) for s in samples]
+    coefficients = dict(zip(CPU_TERMS, fit(cpu_rows, [s["cpu_seconds"] for s in samples])))
+    coefficients.update(zip(MEM_TERMS, fit(mem_rows, [s["memory_mb"] for s in samples])))
+    coefficients["wall_ratio"] = sum(s["wall_seconds"] for s in samples) / sum(s["cpu_seconds"] for s in samples)
+
+    print()
+    print(f"{'template':<22}{'q':<4}{'cpu':>8}{'pred':>8}{'err':>7}{'rss':>8}{'pred':>8}")
+    errors = []
+    for s in samples:
+        predicted = cost.estimate_cost(TEMPLATES[s["template"]](), s["quality"], coefficients)
+        err = abs(predicted["cpu_seconds"] - s["cpu_seconds"]) / max(s["cpu_seconds"], 1e-6)
+        errors.append(err)
+        print(f"{s['template']:<22}{s['quality']:<4}{s['cpu_seconds']:>8.1f}{predicted['cpu_seconds']:>8.1f}"
+              f"{err:>7.0%}{s['memory_mb']:>8.0f}{predicted['memory_mb']:>8.0f}")
+    print(f"\nCPU mean absolute percentage error: {sum(errors) / len(errors):.0%}")
+    print(json.dumps(coefficients, indent=2))
+
+    if not args.dry_run:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"coefficients": coefficients, "fitted_at": time.time(), "samples": samples}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
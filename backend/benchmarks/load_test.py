@@ -0,0 +1,100 @@
+"""
+Offline load test for the EduDiff backend.
+
+Runs with the mock LLM provider so measurements reflect rendering, TTS and
+server capacity rather than Gemini latency.
+
+Examples:
+    # In-process pipeline (LLM -> TTS -> render), 4 concurrent jobs
+    LLM_PROVIDER=mock LLM_MOCK_LATENCY=lognormal:0.0,0.4 \
+        python benchmarks/load_test.py pipeline --jobs 8 --concurrency 4
+
+    # Against a running server (start it with LLM_PROVIDER=mock)
+    python benchmarks/load_test.py server --url http://localhost:5001 --jobs 20 --concurrency 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONCEPTS = [
+    "pythagorean theorem",
+    "derivative as slope of tangent",
+    "area under curve integral",
+    "unit circle sine and cosine",
+    "quadratic parabola",
+    "complex plane",
+    "matrix multiplication",
+    "eigenvalue of a matrix",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def run_pipeline_job(i):
+    from edudiff.pipeline.generate import generate_video
+
+    question = CONCEPTS[i % len(CONCEPTS)]
+    start = time.perf_counter()
+    generate_video(question, output_dir=os.path.join("tmp", "loadtest_videos"))
+    return time.perf_counter() - start
+
+
+def run_server_job(i, url, quality):
+    import requests
+
+    concept = CONCEPTS[i % len(CONCEPTS)]
+    start = time.perf_counter()
+    resp = requests.post(f"{url}/generate", json={"concept": concept, "quality": quality}, timeout=600)
+    resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=["pipeline", "server"])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--quality", default="low", choices=["low", "medium", "high"])
+    args = parser.parse_args()
+
+    if args.target == "pipeline":
+        os.environ.setdefault("LLM_PROVIDER", "mock")
+        job = run_pipeline_job
+    else:
+        job = lambda i: run_server_job(i, args.url, args.quality)
+
+    latencies, failures = [], 0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(job, i) for i in range(args.jobs)]
+        for fut in as_completed(futures):
+            try:
+                latencies.append(fut.result())
+            except Exception as e:
+                failures += 1
+                print(f"job failed: {e}", file=sys.stderr)
+    wall = time.perf_counter() - wall_start
+
+    print(f"target={args.target} jobs={args.jobs} concurrency={args.concurrency}")
+    print(f"completed={len(latencies)} failed={failures} wall={wall:.2f}s "
+          f"throughput={len(latencies) / wall if wall else 0:.3f} jobs/s")
+    if latencies:
+        print(f"latency mean={statistics.mean(latencies):.2f}s p50={percentile(latencies, 50):.2f}s "
+              f"p95={percentile(latencies, 95):.2f}s max={max(latencies):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
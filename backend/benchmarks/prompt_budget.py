@@ -0,0 +1,136 @@
+"""
+Prompt token budget analyzer and full-vs-compact evaluation harness.
+
+Static report (no LLM calls): input tokens per call site for the full and
+compact prompt variants, and for the voice-script input as raw code vs the
+scene summary.
+
+    python benchmarks/prompt_budget.py
+    python benchmarks/prompt_budget.py --exact          # use the provider's tokenizer
+
+Side-by-side evaluation: run every call site with both variants on sample
+inputs and compare tokens, latency and output validity.
+
+    python benchmarks/prompt_budget.py --run
+    LLM_PROVIDER=mock python benchmarks/prompt_budget.py --run
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edudiff.llm.providers import get_provider
+from edudiff.llm.tokens import estimate_tokens
+from edudiff.prompts import manim_prompt, manim_prompts, tutor_prompt, voice_prompt
+from edudiff.prompts.scene_summary import summarize_scene
+
+SAMPLE_CONCEPTS = [
+    "Solve for x: 3x - 5 = 10",
+    "Explain the Pythagorean theorem",
+    "What is the derivative of x^2?",
+]
+
+
+def sample_scenes():
+    """Template scenes as realistic voice-script inputs."""
+    try:
+        from edudiff.manim_engine import templates
+        return {
+            "pythagorean": templates.generate_pythagorean_code(),
+            "tangent_slope": templates.generate_tangent_slope_code(),
+            "diff_eq": templates.generate_diff_eq_code(),
+        }
+    except ImportError:
+        from edudiff.llm.providers import MockProvider
+        return {"mock": MockProvider.synthetic_response("Sample", "manim_code")}
+
+
+def static_report(count):
+    rows = []
+    for variant in ("full", "compact"):
+        rows.append(("manim_code system", variant, count(
+            manim_prompt.SYSTEM_PROMPT if variant == "full" else manim_prompt.SYSTEM_PROMPT_COMPACT)))
+        rows.append(("voice_script system", variant, count(
+            voice_prompt.VOICE_SYSTEM_PROMPT if variant == "full" else voice_prompt.VOICE_SYSTEM_PROMPT_COMPACT)))
+        rows.append(("math_solution system", variant, count(
+            tutor_prompt.SYSTEM_PROMPT if variant == "full" else tutor_prompt.SYSTEM_PROMPT_COMPACT)))
+        for concept in SAMPLE_CONCEPTS:
+            rows.append((f"manim_prompts '{concept[:24]}'", variant,
+                         count(manim_prompts.generate_manim_prompt(concept, variant))))
+
+    print(f"{'call':<48}{'variant':<10}{'tokens':>8}")
+    for call, variant, n in rows:
+        print(f"{call:<48}{variant:<10}{n:>8}")
+
+    print()
+    print(f"{'voice input':<24}{'code':>8}{'summary':>10}{'saved':>8}")
+    for name, code in sample_scenes().items():
+        raw, summary = count(code), count(summarize_scene(code))
+        print(f"{name:<24}{raw:>8}{summary:>10}{1 - summary / raw:>8.0%}")
+
+
+def _valid_code(text):
+    try:
+        ast.parse(text)
+        return bool(text.strip())
+    except SyntaxError:
+        return False
+
+
+def _valid_voice(data):
+    return isinstance(data, dict) and isinstance(data.get("segments"), list) and all(
+        isinstance(s.get("start_after_animation"), int) and s.get("text") for s in data["segments"])
+
+
+def run_evaluation():
+    from edudiff.llm.math_tutor import generate_math_solution
+    from edudiff.llm.tokens import ledger
+
+    scenes = sample_scenes()
+    cases = []
+    for concept in SAMPLE_CONCEPTS:
+        cases.append(("manim_code", concept,
+                      lambda v, c=concept: _valid_code(manim_prompt.generate_manim_code(c, variant=v))))
+        cases.append(("math_solution", concept,
+                      lambda v, c=concept: bool(generate_math_solution(c, variant=v))))
+    for name, code in scenes.items():
+        for mode in ("code", "summary"):
+            cases.append((f"voice_script[{mode}]", name, lambda v, c=code, m=mode: _valid_voice(
+                voice_prompt.generate_voice_script(c, variant=v, input_mode=m))))
+
+    print(f"{'call':<24}{'input':<34}{'variant':<9}{'in_tok':>7}{'out_tok':>8}{'latency':>9}  valid")
+    for call, label, fn in cases:
+        for variant in ("full", "compact"):
+            ledger.reset()
+            start = time.perf_counter()
+            try:
+                ok = fn(variant)
+            except Exception as e:
+                ok = f"error: {e}"[:40]
+            elapsed = time.perf_counter() - start
+            calls = ledger.calls()
+            in_tok = sum(c["input_tokens"] for c in calls)
+            out_tok = sum(c["output_tokens"] for c in calls)
+            print(f"{call:<24}{label[:32]:<34}{variant:<9}{in_tok:>7}{out_tok:>8}{elapsed:>8.2f}s  {ok}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exact", action="store_true", help="count with the provider's tokenizer")
+    parser.add_argument("--run", action="store_true", help="run both variants through the LLM provider")
+    args = parser.parse_args()
+
+    count = get_provider().count_tokens if args.exact else estimate_tokens
+    static_report(count)
+
+    if args.run:
+        print()
+        run_evaluation()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark template selection: matching time and accuracy as the registry grows.
+
+Compares the compiled registry matcher with the previous approach (a
+substring test of every keyword of every template) on a labeled concept
+corpus, first with the built-in templates and then with hundreds of
+synthetic templates registered alongside them. Accuracy is the share of
+corpus concepts whose best match is the labeled template (None = no template).
+
+    python benchmarks/template_matching.py
+    python benchmarks/template_matching.py --sizes 0 250 1000 --repeat 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edudiff.manim_engine import templates
+from edudiff.manim_engine.registry import TemplateRegistry
+
+# concept -> expected template (keyword stage only, no parsed values)
+CORPUS = [
+    ("slope of tangent line", "derivative_as_tangent"),
+    ("instantaneous rate of change", "derivative_as_tangent"),
+    ("tangent lines to a curve", "derivative_as_tangent"),
+    ("derivative graph of a function", "derivative_as_function"),
+    ("what is differentiation", "derivative_as_function"),
+    ("explain derivatives", "derivative_general"),
+    ("the derivative", "derivative_general"),
+    ("pythagorean theorem", "pythagorean"),
+    ("hypotenuse of a right triangle", "pythagorean"),
+    ("pythagoras proof", "pythagorean"),
+    ("quadratic functions", "quadratic"),
+    ("shape of a parabola", "quadratic"),
+    ("graph of x squared", "quadratic"),
+    ("sine and cosine", "trigonometry"),
+    ("the unit circle", "trigonometry"),
+    ("intro to trigonometry", "trigonometry"),
+    ("cosine waves", "trigonometry"),
+    ("3d surface plot", "3d_surface"),
+    ("three dimensional surfaces", "3d_surface"),
+    ("volume of a sphere", "sphere"),
+    ("spherical coordinates", "sphere"),
+    ("volume of a cube", "cube"),
+    ("surface area of a box", "cube"),
+    ("definite integrals", "integral"),
+    ("area under curve", "integral"),
+    ("integration by parts", "integral"),
+    ("antiderivatives", "integral"),
+    ("matrix multiplication", "matrix"),
+    ("linear transformations", "matrix"),
+    ("what are matrices", "matrix"),
+    ("eigenvalues and eigenvectors", "eigenvalue"),
+    ("characteristic polynomial", "eigenvalue"),
+    ("complex numbers", "complex"),
+    ("imaginary unit", "complex"),
+    ("the complex plane", "complex"),
+    ("differential equations", "differential_equation"),
+    ("first order ode", "differential_equation"),
+    ("how does code work", None),
+    ("nodes in a graph", None),
+    ("football physics", None),
+    ("photosynthesis", None),
+    ("history of rome", None),
+    ("trigonometric identities", "trigonometry"),
+    ("boxplots in statistics", None),
+]
+
+
+def legacy_match(specs, concept):
+    """The previous selection loop: substring score per template, first best wins."""
+    concept = concept.lower()
+    best, best_score = None, 0
+    for spec in specs:
+        score = sum(1 for keyword in spec.keywords if keyword in concept)
+        if score > best_score:
+            best, best_score = spec.name, score
+    return best
+
+
+CORPUS_WORDS = {word for concept, _ in CORPUS for word in concept.split()}
+
+
+def synthetic_keyword(rng):
+    """A made-up word or two-word phrase that no corpus concept contains."""
+    def word():
+        while True:
+            w = "".join(rng.choice("bdfgklmnprtvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+            if not any(c.startswith(w) for c in CORPUS_WORDS):  # plurals match too
+                return w
+    return f"{word()} {word()}" if rng.random() < 0.5 else word()
+
+
+def build_registry(extra, seed):
+    registry = TemplateRegistry()
+    for spec in templates.REGISTRY:
+        registry.register(spec.name, spec.generator, spec.keywords, priority=spec.priority,
+                          formula_keywords=spec.formula_keywords, builder=spec.builder,
+                          requires=spec.requires, description=spec.description)
+    rng = random.Random(seed)
+    for i in range(extra):
+        registry.register(f"synthetic_{i}", None, [synthetic_keyword(rng) for _ in range(rng.randint(3, 8))])
+    return registry
+
+
+def time_per_query(fn, concepts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for concept in concepts:
+            fn(concept)
+    return (time.perf_counter() - start) / (repeat * len(concepts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[0, 100, 300, 1000],
+                        help="synthetic templates added to the built-in ones")
+    parser.add_argument("--repeat", type=int, default=100, help="passes over the corpus per timing")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+
+    concepts = [concept for concept, _ in CORPUS]
+    print(f"{'templates':>10}{'keywords':>10}{'legacy us':>11}{'registry us':>13}{'speedup':>9}"
+          f"{'legacy acc':>12}{'registry acc':>14}")
+    for extra in args.sizes:
+        registry = build_registry(extra, args.seed)
+        specs = list(registry)
+        keywords = sum(len(spec.keywords) for spec in specs)
+
+        def registry_match(concept):
+            match = registry.match(concept)
+            return match.spec.name if match else None
+
+        registry.match("warm up")  # compile outside the timed loop
+        legacy_us = time_per_query(lambda c: legacy_match(specs, c), concepts, args.repeat)
+        registry_us = time_per_query(registry_match, concepts, args.repeat)
+
+        legacy_hits = sum(legacy_match(specs, c) == expected for c, expected in CORPUS)
+        registry_hits = sum(registry_match(c) == expected for c, expected in CORPUS)
+        print(f"{len(specs):>10}{keywords:>10}{legacy_us:>11.1f}{registry_us:>13.1f}"
+              f"{legacy_us / registry_us:>8.1f}x{legacy_hits / len(CORPUS):>12.0%}"
+              f"{registry_hits / len(CORPUS):>14.0%}")
+
+        if args.show_misses and extra == args.sizes[0]:
+            for concept, expected in CORPUS:
+                got_legacy, got_registry = legacy_match(specs, concept), registry_match(concept)
+                if got_legacy != expected or got_registry != expected:
+                    print(f"    {concept!r:<36} expected={expected} legacy={got_legacy} registry={got_registry}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark the in-place updater template variants against the always_redraw originals.
+
+For every template pair and quality tier, renders both versions and reports
+render throughput (output frames per wall-clock second) and the speedup, then
+decodes both videos and compares them frame by frame (PSNR). A variant passes
+when every sampled frame is at least --min-psnr dB from the original.
+
+    python benchmarks/template_updaters.py
+    python benchmarks/template_updaters.py --qualities l m h --sample-fps 5
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edudiff.manim_engine import templates
+
+
+def render(code, quality, work):
+    """Render MainScene; returns (video_path, wall_seconds)."""
+    scene_file = os.path.join(work, "scene.py")
+    with open(scene_file, "w", encoding="utf-8") as f:
+        f.write(code)
+    media_dir = os.path.join(work, "media")
+    command = [sys.executable, "-m", "manim", "render", f"-q{quality}", "--disable_caching",
+               "--media_dir", media_dir, scene_file, "MainScene"]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=work, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-500:])
+    for root, _dirs, files in os.walk(os.path.join(media_dir, "videos")):
+        if "MainScene.mp4" in files:
+            return os.path.join(root, "MainScene.mp4"), wall
+    raise RuntimeError("rendered video not found")
+
+
+def probe(video):
+    """(width, height, frame_count) of the first video stream."""
+    out = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0", "-count_frames",
+                          "-show_entries", "stream=width,height,nb_read_frames", "-of", "json", video],
+                         capture_output=True, text=True, check=True).stdout
+    stream = json.loads(out)["streams"][0]
+    return int(stream["width"]), int(stream["height"]), int(stream["nb_read_frames"])
+
+
+def sampled_frames(video, width, height, sample_fps):
+    """Yield RGB frames (as numpy arrays) sampled at ``sample_fps``."""
+    import numpy as np
+
+    proc = subprocess.Popen(["ffmpeg", "-v", "error", "-i", video, "-vf", f"fps={sample_fps}",
+                             "-f", "rawvideo", "-pix_fmt", "rgb24", "-"], stdout=subprocess.PIPE)
+    frame_bytes = width * height * 3
+    try:
+        while True:
+            buf = proc.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes:
+                break
+            yield np.frombuffer(buf, dtype=np.uint8).reshape(height, width, 3).astype(np.float32)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def compare(video_a, video_b, sample_fps):
+    """Minimum and mean PSNR over sampled frames, and the frame counts."""
+    wa, ha, na = probe(video_a)
+    wb, hb, nb = probe(video_b)
+    if (wa, ha) != (wb, hb):
+        return {"min_psnr": 0.0, "mean_psnr": 0.0, "frames": (na, nb)}
+    scores = []
+    for a, b in zip(sampled_frames(video_a, wa, ha, sample_fps), sampled_frames(video_b, wb, hb, sample_fps)):
+        mse = float(((a - b) ** 2).mean())
+        scores.append(99.0 if mse == 0 else 10 * math.log10(255.0 ** 2 / mse))
+    if not scores:
+        return {"min_psnr": 0.0, "mean_psnr": 0.0, "frames": (na, nb)}
+    return {"min_psnr": min(scores), "mean_psnr": sum(scores) / len(scores), "frames": (na, nb)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qualities", nargs="+", default=["l", "m"], choices=["l", "m", "h", "p", "k"])
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="frames per second compared")
+    parser.add_argument("--min-psnr", type=float, default=35.0, help="pass threshold in dB")
+    args = parser.parse_args()
+
+    print(f"{'template':<34}{'q':<3}{'frames':>7}{'redraw fps':>12}{'inplace fps':>13}{'speedup':>9}"
+          f"{'min psnr':>10}  result")
+    failures = 0
+    for original, variant in templates.UPDATER_VARIANTS.items():
+        name = original.__name__.replace("generate_", "").replace("_code", "")
+        for quality in args.qualities:
+            with tempfile.TemporaryDirectory(prefix="edudiff_updaters_") as work:
+                os.makedirs(os.path.join(work, "a"))
+                os.makedirs(os.path.join(work, "b"))
+                try:
+                    video_a, wall_a = render(original(), quality, os.path.join(work, "a"))
+                    video_b, wall_b = render(variant(), quality, os.path.join(work, "b"))
+                except RuntimeError as e:
+                    print(f"{name:<34}{quality:<3} render failed: {e}")
+                    failures += 1
+                    continue
+                result = compare(video_a, video_b, args.sample_fps)
+            frames_a, frames_b = result["frames"]
+            ok = result["min_psnr"] >= args.min_psnr and frames_a == frames_b
+            failures += not ok
+            print(f"{name:<34}{quality:<3}{frames_a:>7}{frames_a / wall_a:>12.1f}{frames_b / wall_b:>13.1f}"
+                  f"{wall_a / wall_b:>8.2f}x{result['min_psnr']:>10.1f}  {'ok' if ok else 'MISMATCH'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark TTS backends: seconds of audio produced per CPU-second.
+
+For every available backend, synthesizes the same narration segments three
+ways:
+
+- ``legacy``: a fresh backend (and so a fresh engine) per segment, as the
+  old ``generate_audio_segment`` did;
+- ``persistent``: one backend reused for every segment, one call each;
+- ``batch``: one ``synthesize_batch`` call for all segments.
+
+CPU time is this process plus its children (espeak-ng runs as a
+subprocess), so the backends are compared on equal terms.
+
+    python benchmarks/tts_backends.py
+    python benchmarks/tts_backends.py --backends espeak --segments 20
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edudiff.audio.backends import BACKENDS, build_backend, new_wav_path
+
+SEGMENTS = [
+    "We start with a set of axes.",
+    "This curve is the graph of f of x equals x squared.",
+    "The red line touches the curve at a single point. It is the tangent line.",
+    "As the point moves along the curve, the slope of the tangent changes.",
+    "That slope is the derivative of the function at that point.",
+    "The shaded region is the area under the curve from zero to one.",
+    "Each entry is a row of the matrix times the vector: multiply matching entries, then add them up.",
+    "So the eigenvalues are one and three.",
+]
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def audio_seconds(paths):
+    total = 0.0
+    for path in paths:
+        with wave.open(path, "rb") as f:
+            total += f.getnframes() / float(f.getframerate())
+    return total
+
+
+def run_legacy(name, texts, output_dir):
+    return [build_backend(name).synthesize(text, new_wav_path(output_dir)) for text in texts]
+
+
+def run_persistent(backend, texts, output_dir):
+    return [backend.synthesize(text, new_wav_path(output_dir)) for text in texts]
+
+
+def run_batch(backend, texts, output_dir):
+    return backend.synthesize_batch(texts, output_dir)
+
+
+def measure(fn, output_dir):
+    shutil.rmtree(output_dir, ignore_errors=True)
+    cpu, wall = cpu_seconds(), time.perf_counter()
+    paths = fn(output_dir)
+    cpu, wall = cpu_seconds() - cpu, time.perf_counter() - wall
+    return audio_seconds(paths), cpu, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--segments", type=int, default=len(SEGMENTS), help="segments per run (cycled)")
+    args = parser.parse_args()
+
+    texts = [SEGMENTS[i % len(SEGMENTS)] for i in range(args.segments)]
+    workdir = tempfile.mkdtemp(prefix="tts_bench_")
+    print(f"{'backend':<10}{'mode':<12}{'audio s':>9}{'cpu s':>8}{'wall s':>8}{'audio s/cpu s':>15}")
+    try:
+        for name in args.backends:
+            backend = build_backend(name)
+            if not backend.is_available():
+                print(f"{name:<10}(not available, skipped)")
+                continue
+            backend.synthesize("warm up", new_wav_path(os.path.join(workdir, "warmup")))
+            runs = [
+                ("legacy", lambda d: run_legacy(name, texts, d)),
+                ("persistent", lambda d: run_persistent(backend, texts, d)),
+                ("batch", lambda d: run_batch(backend, texts, d)),
+            ]
+            for mode, fn in runs:
+                audio, cpu, wall = measure(fn, os.path.join(workdir, name, mode))
+                print(f"{name:<10}{mode:<12}{audio:>9.1f}{cpu:>8.2f}{wall:>8.2f}{audio / max(cpu, 1e-6):>15.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+import pytest
+
+SCENE_HEADER = "from manim import *\n\n\nclass MainScene(Scene):\n    def construct(self):\n"
+
+
+def build_scene(*lines):
+    """Source of a MainScene whose construct() runs ``lines`` (indented one level)."""
+    return SCENE_HEADER + "".join(f"        {line}\n" for line in lines)
+
+
+@pytest.fixture
+def scene():
+    return build_scene
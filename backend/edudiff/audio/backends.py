@@ -0,0 +1,204 @@
+"""
+Text-to-speech backends.
+
+Every synthesis in EduDiff goes through ``get_backend()``:
+
+- ``pyttsx3`` (default): one engine per process, configured once and reused
+  for every segment; a batch queues all utterances and runs the event loop
+  once.
+- ``espeak``: runs ``espeak-ng`` directly, one short-lived subprocess per
+  utterance, with no Python engine or driver loop at all.
+
+Configuration (environment):
+    TTS_BACKEND   pyttsx3 | espeak (default: pyttsx3)
+    TTS_RATE      words per minute (default: 160)
+    TTS_VOLUME    0.0 - 1.0 (default: 1.0)
+    TTS_VOICE     backend voice id / espeak voice name (default: backend default)
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+TTS_BACKEND = os.getenv("TTS_BACKEND", "pyttsx3").lower()
+TTS_RATE = int(os.getenv("TTS_RATE", "160"))
+TTS_VOLUME = float(os.getenv("TTS_VOLUME", "1.0"))
+TTS_VOICE = os.getenv("TTS_VOICE") or None
+
+
+def new_wav_path(output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.abspath(os.path.join(output_dir, f"voice_{uuid.uuid4()}.wav"))
+
+
+class TTSBackend:
+    """
+    Base class for speech synthesizers.
+
+    Subclasses implement ``synthesize``; ``synthesize_batch`` defaults to a
+    loop and is overridden where a backend can amortize work across texts.
+    ``version`` is part of ``identity()`` so cached audio is invalidated
+    when a backend's output changes.
+    """
+
+    name = "base"
+    version = "1"
+
+    def __init__(self, rate: int = TTS_RATE, volume: float = TTS_VOLUME, voice: Optional[str] = TTS_VOICE):
+        self.rate = rate
+        self.volume = volume
+        self.voice = voice
+
+    def is_available(self) -> bool:
+        return True
+
+    def identity(self) -> dict:
+        """Everything that determines the audio produced for a given text."""
+        return {"backend": self.name, "version": self.version, "voice": self.voice,
+                "rate": self.rate, "volume": self.volume}
+
+    def synthesize(self, text: str, output_path: str) -> str:
+        """
+        Write ``text`` as a WAV file.
+
+        Returns:
+            str: ``output_path``.
+
+        Raises:
+            RuntimeError: If no audio was produced.
+        """
+        raise NotImplementedError
+
+    def synthesize_batch(self, texts: List[str], output_dir: str) -> List[str]:
+        """Synthesize each text to a new WAV in ``output_dir``; paths are returned in order."""
+        return [self.synthesize(text, new_wav_path(output_dir)) for text in texts]
+
+    @staticmethod
+    def _check(path: str) -> str:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            raise RuntimeError(f"TTS failed: Expected output file at {path} was not found.")
+        return path
+
+
+class Pyttsx3Backend(TTSBackend):
+    """pyttsx3 with a single engine per process, created and configured on first use."""
+
+    name = "pyttsx3"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._engine = None
+        self._pid = None
+        self._lock = threading.Lock()  # the engine's event loop is not reentrant
+
+    def is_available(self) -> bool:
+        try:
+            import pyttsx3  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _get_engine(self):
+        if self._engine is None or self._pid != os.getpid():
+            import pyttsx3
+
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self.rate)
+            engine.setProperty("volume", self.volume)
+            if self.voice:
+                engine.setProperty("voice", self.voice)
+            self._engine, self._pid = engine, os.getpid()
+            logger.info(f"pyttsx3 engine initialized in process {self._pid}")
+        return self._engine
+
+    def synthesize(self, text: str, output_path: str) -> str:
+        return self.synthesize_batch_to([text], [output_path])[0]
+
+    def synthesize_batch(self, texts: List[str], output_dir: str) -> List[str]:
+        return self.synthesize_batch_to(texts, [new_wav_path(output_dir) for _ in texts])
+
+    def synthesize_batch_to(self, texts: List[str], paths: List[str]) -> List[str]:
+        """Queue every utterance, then run the engine loop once for the whole batch."""
+        with self._lock:
+            engine = self._get_engine()
+            for text, path in zip(texts, paths):
+                engine.save_to_file(text, path)
+            engine.runAndWait()
+        return [self._check(path) for path in paths]
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng called directly; text goes in on stdin, the WAV is written with -w."""
+
+    name = "espeak"
+
+    def __init__(self, *args, executable: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak") or "espeak-ng"
+
+    def is_available(self) -> bool:
+        return shutil.which(self.executable) is not None
+
+    def identity(self) -> dict:
+        return {**super().identity(), "executable": os.path.basename(self.executable)}
+
+    def command(self, output_path: str) -> List[str]:
+        # espeak amplitude is 0-200 with 100 as normal
+        command = [self.executable, "--stdin", "-w", output_path, "-s", str(self.rate),
+                   "-a", str(int(round(self.volume * 100)))]
+        if self.voice:
+            command += ["-v", self.voice]
+        return command
+
+    def synthesize(self, text: str, output_path: str) -> str:
+        try:
+            subprocess.run(self.command(output_path), input=text, text=True, check=True,
+                           capture_output=True, timeout=60)
+        except FileNotFoundError as e:
+            raise RuntimeError(f"TTS failed: {self.executable} is not installed") from e
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"TTS failed: {self.executable} exited with {e.returncode}: {e.stderr.strip()}") from e
+        except subprocess.TimeoutExpired as e:
+            raise RuntimeError(f"TTS failed: {self.executable} timed out") from e
+        return self._check(output_path)
+
+
+BACKENDS = {
+    "pyttsx3": Pyttsx3Backend,
+    "espeak": EspeakBackend,
+}
+
+_backend: Optional[TTSBackend] = None
+_backend_lock = threading.Lock()
+
+
+def build_backend(name: Optional[str] = None) -> TTSBackend:
+    """Construct a backend by name (default: TTS_BACKEND)."""
+    name = (name or TTS_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+def get_backend() -> TTSBackend:
+    """Return the process-wide backend, building it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = build_backend()
+                logger.info(f"TTS backend: {_backend.name}")
+    return _backend
+
+
+def set_backend(backend: Optional[TTSBackend]):
+    """Override the process-wide backend (None resets to the environment default)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
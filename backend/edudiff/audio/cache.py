@@ -0,0 +1,239 @@
+"""
+Content-addressed cache of synthesized narration.
+
+Narration repeats: template intros, "We start with a set of axes.", "The
+final answer is...". A segment's audio depends only on its text and the
+backend's configuration (``TTSBackend.identity()``: backend, version, voice,
+rate, volume), so the SHA-256 of those is the cache key and the WAV is
+stored once as ``<key>.wav`` next to an index holding its duration.
+
+Cached files are handed out as hard links (copies across filesystems), so
+evicting an entry never pulls a file from under a running job, and a
+segment's duration is answered from the index by file identity without
+reopening the WAV. The total size is bounded; least recently used entries
+are evicted first. Durations are remembered for the last MAX_DURATIONS files
+handed out; an older one is read from the WAV header again.
+
+Configuration (environment):
+    TTS_CACHE          use the cache (default: 1)
+    TTS_CACHE_DIR      cache storage (default: tmp/tts_cache)
+    TTS_CACHE_MAX_MB   size bound of the cached WAVs (default: 256)
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import wave
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .backends import get_backend, new_wav_path
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE = os.getenv("TTS_CACHE", "1") not in ("0", "false", "False")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("tmp", "tts_cache"))
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "256"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Files whose duration is remembered by identity, least recently used dropped first
+MAX_DURATIONS = 4096
+
+
+def wav_duration(path: str) -> float:
+    """Duration of a WAV file in seconds, read from its header."""
+    with contextlib.closing(wave.open(path, "r")) as f:
+        return f.getnframes() / float(f.getframerate())
+
+
+def link_or_copy(source: str, target: str):
+    """Hard-link ``source`` to ``target``, copying when links are not possible."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _file_id(path: str) -> Optional[tuple]:
+    """Identity shared by every hard link to a file (size and mtime guard against inode reuse)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class TTSCache:
+    """
+    Size-bounded, persistent map from (text, backend identity) to a WAV and its duration.
+
+    The index is shared by every process using the same directory; it is
+    reloaded when another process has written it, like the concept index.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_bytes = max_bytes if max_bytes is not None else int(TTS_CACHE_MAX_MB * 1024 * 1024)
+        self._entries: Dict[str, dict] = {}
+        self._durations: "OrderedDict[tuple, float]" = OrderedDict()  # _file_id -> seconds
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence ---------------------------------------------------------
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load TTS cache index {self.index_path}: {e}")
+            return
+        # keep this process's newer hit times across reloads
+        for key, entry in entries.items():
+            if key in self._entries:
+                entry["last_hit"] = max(entry["last_hit"], self._entries[key]["last_hit"])
+        self._entries = entries
+        self._mtime = mtime
+        for key, entry in entries.items():
+            self._remember(self._path(key), entry["duration"])
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+        self._mtime = os.path.getmtime(self.index_path)
+
+    def _path(self, key: str) -> str:
+        return os.path.abspath(os.path.join(self.directory, f"{key}.wav"))
+
+    # --- public API ----------------------------------------------------------
+
+    @staticmethod
+    def key(text: str, identity: Optional[dict] = None) -> str:
+        """Cache key of ``text`` spoken by a backend with ``identity`` (default: the current backend)."""
+        identity = identity if identity is not None else get_backend().identity()
+        payload = json.dumps({"text": _WHITESPACE_RE.sub(" ", text).strip(), **identity}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, output_dir: str) -> Optional[Tuple[str, float]]:
+        """
+        Link the cached WAV for ``key`` into ``output_dir``.
+
+        Returns:
+            tuple: (absolute path of the new link, duration in seconds), or None on a miss.
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = new_wav_path(output_dir)
+            try:
+                link_or_copy(self._path(key), path)
+            except OSError:
+                # evicted by another process since the index was read
+                del self._entries[key]
+                return None
+            entry["last_hit"] = time.time()
+            self._remember(path, entry["duration"])
+            return path, entry["duration"]
+
+    def put(self, key: str, wav_path: str, text: str = "") -> float:
+        """
+        Store a freshly synthesized WAV under ``key``; ``wav_path`` stays valid.
+
+        Returns:
+            float: The WAV's duration in seconds.
+        """
+        duration = wav_duration(wav_path)
+        with self._lock:
+            self._load()
+            os.makedirs(self.directory, exist_ok=True)
+            staging = f"{self._path(key)}.{os.getpid()}.tmp"
+            try:
+                link_or_copy(wav_path, staging)
+                os.replace(staging, self._path(key))
+            except OSError as e:
+                logger.warning(f"Could not cache TTS audio for '{text[:40]}': {e}")
+                return duration
+            self._entries[key] = {
+                "text": text,
+                "duration": duration,
+                "size": os.path.getsize(wav_path),
+                "last_hit": time.time(),
+            }
+            self._remember(self._path(key), duration)
+            self._remember(wav_path, duration)
+            self._evict()
+            self._save()
+        return duration
+
+    def duration(self, path: str) -> Optional[float]:
+        """Duration of a WAV handed out by (or linked from) the cache, without opening it."""
+        file_id = _file_id(path)
+        if file_id is None:
+            return None
+        with self._lock:
+            if file_id not in self._durations:
+                return None
+            self._durations.move_to_end(file_id)
+            return self._durations[file_id]
+
+    def _remember(self, path: str, duration: float):
+        file_id = _file_id(path)
+        if file_id is not None:
+            self._durations[file_id] = duration
+            self._durations.move_to_end(file_id)
+            while len(self._durations) > MAX_DURATIONS:
+                self._durations.popitem(last=False)
+
+    def _forget(self, path: str):
+        """Drop the duration of a file about to be removed, unless a job still holds a link to it."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if st.st_nlink <= 1:
+            self._durations.pop((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns), None)
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_hit"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries.pop(key)["size"]
+            self._forget(self._path(key))
+            with contextlib.suppress(OSError):
+                os.remove(self._path(key))
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> Optional[TTSCache]:
+    """The process-wide cache, or None if TTS_CACHE is disabled."""
+    global _cache
+    if not TTS_CACHE:
+        return None
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
@@ -0,0 +1,267 @@
+"""
+Precomputed narration for the built-in templates.
+
+A fixed template's code never changes, so neither does its narration. Each
+template here has an authored script whose segments are anchored to the
+objects they describe ("graph", "equation") instead of to animation numbers;
+the anchors are resolved against the template code (and its in-place updater
+variant) to ``start_after_animation`` indices once, when the pack is built.
+
+A pack is the resolved voice JSON plus one WAV per segment, stored under
+``NARRATION_PACK_DIR/<template>-<code hash>/``. Packs are built lazily on
+first use and reused afterwards, or ahead of time with
+
+    python -m edudiff.audio.narration_packs
+
+so template concepts are narrated with no LLM or TTS call on the request
+path. Parameterized templates produce code that matches no pack and are
+narrated the regular way.
+
+Configuration (environment):
+    NARRATION_PACKS      use narration packs (default: 1)
+    NARRATION_PACK_DIR   pack storage (default: tmp/narration_packs)
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional
+
+from ..manim_engine.scene_ir import parse_scene
+from .tts import synthesize_segments
+
+logger = logging.getLogger(__name__)
+
+NARRATION_PACKS = os.getenv("NARRATION_PACKS", "1") not in ("0", "false", "False")
+NARRATION_PACK_DIR = os.getenv("NARRATION_PACK_DIR", os.path.join("tmp", "narration_packs"))
+
+# template name -> (title, [(anchor, text)]); an anchor is a variable the animation
+# shows, and a segment plays after the first animation that uses it, later than
+# the previous segment's
+NARRATIONS = {
+    "pythagorean": ("The Pythagorean Theorem", [
+        ("triangle", "Here is a right triangle."),
+        ("c", "Its two shorter sides are a and b. The longest side, opposite the right angle, is c, "
+              "the hypotenuse."),
+        ("equation", "The Pythagorean theorem says that a squared plus b squared equals c squared."),
+    ]),
+    "derivative_as_tangent": ("The Derivative as a Slope", [
+        ("axes", "We start with a set of axes."),
+        ("graph", "This curve is the graph of f of x equals x squared."),
+        ("tangent", "The red line touches the curve at a single point. It is the tangent line, "
+                    "and its slope is shown next to the point."),
+        ("x_tracker", "As the point moves along the curve, the slope of the tangent changes. "
+                      "That slope is the derivative of the function at that point."),
+    ]),
+    "derivative_as_function": ("A Function and Its Derivative", [
+        ("axes", "We start with a set of axes."),
+        ("graph", "The blue curve is f of x equals x squared."),
+        ("derivative", "The red line is its derivative, f prime of x equals two x. "
+                       "At every x it gives the slope of the blue curve."),
+    ]),
+    "quadratic": ("Quadratic Functions", [
+        ("axes", "We start with a set of axes."),
+        ("graph", "This U-shaped curve is a parabola."),
+        ("equation", "It is the graph of the quadratic function f of x equals x squared."),
+        ("dot", "The dot marks a point on the curve. The lines show its x and y values."),
+        ("x", "As x moves from left to right, y falls to zero at the vertex and then rises again."),
+    ]),
+    "trigonometry": ("Sine and Cosine on the Unit Circle", [
+        ("plane", "Here is a coordinate plane."),
+        ("circle", "This is the unit circle, a circle of radius one centered at the origin."),
+        ("dot", "A point sits on the circle at an angle theta."),
+        ("sin_label", "The two lines from the point give its coordinates: cosine of theta across, "
+                      "and sine of theta up."),
+        ("theta", "As the point travels once around the circle, sine and cosine trace out their values "
+                  "for every angle."),
+    ]),
+    "3d_surface": ("A Surface in Three Dimensions", [
+        ("axes", "Here are three-dimensional axes."),
+        ("surface", "This surface shows z as a function of x and y. Its height is the sine of the distance "
+                    "from the origin, so it ripples outward in rings."),
+    ]),
+    "sphere": ("The Sphere", [
+        ("sphere", "This is a sphere: every point on its surface is the same distance from the center."),
+        ("radius_line", "That distance is the radius, r."),
+        ("volume_formula", "The volume of a sphere is four thirds pi r cubed."),
+    ]),
+    "cube": ("The Cube", [
+        ("cube", "This is a cube. All of its edges have the same length."),
+        ("a_label", "We call the edge length a."),
+        ("area_formula", "A cube has six square faces, so its surface area is six a squared."),
+    ]),
+    "integral": ("The Integral as Area", [
+        ("axes", "We start with a set of axes."),
+        ("graph", "The curve is f of x equals x squared."),
+        ("area", "The shaded region is the area under the curve from zero to one. "
+                 "The integral gives this area: one third."),
+    ]),
+    "matrix": ("Matrix Multiplication", [
+        ("matrix_a", "Here is a two by two matrix."),
+        ("matrix_b", "We multiply it by a column vector."),
+        ("result", "The result is another vector."),
+        ("calc1", "Each entry is a row of the matrix times the vector: multiply matching entries, "
+                  "then add them up."),
+    ]),
+    "eigenvalue": ("Eigenvalues and Eigenvectors", [
+        ("matrix", "Here is a matrix A and a vector v."),
+        ("equation", "An eigenvector keeps its direction when multiplied by A. It is only scaled, "
+                     "by a number lambda called the eigenvalue."),
+        ("char_eq", "To find lambda, we solve the determinant of A minus lambda I equals zero."),
+        ("solved", "For this matrix that gives two minus lambda, squared, minus one equals zero."),
+        ("result", "So the eigenvalues are one and three."),
+    ]),
+    "complex": ("The Complex Plane", [
+        ("plane", "This is the complex plane. The horizontal axis is real, the vertical axis is imaginary."),
+        ("z_label", "The arrow shows the complex number z equals three plus two i."),
+        ("re_line", "Its real part is three and its imaginary part is two."),
+    ]),
+    "differential_equation": ("Solving a Differential Equation", [
+        ("eq", "Here is a first-order linear differential equation: dy by dx plus two y equals e to the x."),
+        ("step1", "Using an integrating factor, we write y as an integral."),
+        ("step3", "Integrating gives the general solution."),
+        ("step4", "It simplifies to one third e to the x, plus C times e to the minus two x."),
+        ("graph", "Here is one solution curve."),
+    ]),
+}
+NARRATIONS["derivative_general"] = NARRATIONS["derivative_as_function"]
+
+_lock = threading.Lock()
+_code_index: Optional[Dict[str, str]] = None
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+
+
+def _template_codes() -> Dict[str, str]:
+    """Code hash -> template name, for every narrated template and its updater variant."""
+    global _code_index
+    if _code_index is None:
+        from ..manim_engine import templates
+
+        index = {}
+        for spec in templates.REGISTRY:
+            if spec.name not in NARRATIONS or spec.generator is None:
+                continue
+            for generate in (spec.generator, templates.UPDATER_VARIANTS.get(spec.generator)):
+                if generate is not None:
+                    index.setdefault(code_hash(generate()), spec.name)
+        _code_index = index
+    return _code_index
+
+
+def template_for_code(code: str) -> Optional[str]:
+    """The built-in template ``code`` was generated from, if it is an unmodified one."""
+    return _template_codes().get(code_hash(code))
+
+
+def _animation_names(code: str) -> List[set]:
+    """Variable names each top-level animation refers to, in animation order."""
+    return [{n.id for n in ast.walk(a.call) if isinstance(n, ast.Name)} for a in parse_scene(code).animations]
+
+
+def resolve_segments(code: str, narration: list) -> List[dict]:
+    """
+    Voice segments for ``code`` with anchors resolved to animation indices.
+
+    Raises:
+        ValueError: If an anchor is not shown by any later animation.
+    """
+    names = _animation_names(code)
+    segments, index = [], 0
+    for anchor, text in narration:
+        found = next((i for i in range(index, len(names)) if anchor in names[i]), None)
+        if found is None:
+            raise ValueError(f"Narration anchor '{anchor}' is not used by animation {index} or later")
+        segments.append({"start_after_animation": found, "text": text})
+        index = found + 1
+    return segments
+
+
+def _pack_dir(name: str, code: str) -> str:
+    return os.path.join(NARRATION_PACK_DIR, f"{name}-{code_hash(code)}")
+
+
+def _load(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, "voice.json"), "r", encoding="utf-8") as f:
+            voice = json.load(f)
+    except (OSError, ValueError):
+        return None
+    audio = {i: os.path.abspath(os.path.join(directory, f"segment_{i}.wav")) for i in range(len(voice["segments"]))}
+    if not all(os.path.exists(p) for p in audio.values()):
+        return None
+    return {"voice": voice, "audio": audio}
+
+
+def _build(name: str, code: str, directory: str) -> dict:
+    title, narration = NARRATIONS[name]
+    voice = {"title": title, "segments": resolve_segments(code, narration)}
+    staging = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        paths, errors = synthesize_segments([segment["text"] for segment in voice["segments"]], staging)
+        if errors:
+            raise RuntimeError(f"Narration pack '{name}': TTS failed for segment(s) {sorted(errors)}")
+        for i, path in paths.items():
+            os.replace(path, os.path.join(staging, f"segment_{i}.wav"))
+        with open(os.path.join(staging, "voice.json"), "w", encoding="utf-8") as f:
+            json.dump(voice, f, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"Built narration pack '{name}' ({len(voice['segments'])} segments) in {directory}")
+    return _load(directory)
+
+
+def get_pack(code: str, build: bool = True) -> Optional[dict]:
+    """
+    Narration for a built-in template's code.
+
+    Args:
+        code: Scene code as returned by a template generator.
+        build: Synthesize the pack if it is not on disk yet.
+
+    Returns:
+        dict: ``voice`` (voice JSON with resolved indices) and ``audio`` (segment index -> WAV path),
+        or None if ``code`` is not an unmodified narrated template or packs are disabled.
+    """
+    if not NARRATION_PACKS:
+        return None
+    name = template_for_code(code)
+    if name is None:
+        return None
+    directory = _pack_dir(name, code)
+    pack = _load(directory)
+    if pack is not None or not build:
+        return pack
+    with _lock:
+        return _load(directory) or _build(name, code, directory)
+
+
+def build_all() -> List[str]:
+    """Build every missing pack; returns the pack directories."""
+    from ..manim_engine import templates
+
+    built = []
+    for spec in templates.REGISTRY:
+        if spec.name not in NARRATIONS or spec.generator is None:
+            continue
+        for generate in (spec.generator, templates.UPDATER_VARIANTS.get(spec.generator)):
+            code = generate() if generate is not None else None
+            if code is not None and get_pack(code) is not None:
+                built.append(_pack_dir(template_for_code(code), code))
+    return sorted(set(built))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for directory in build_all():
+        print(directory)
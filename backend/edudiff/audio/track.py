@@ -0,0 +1,172 @@
+"""
+Narration track assembly and muxing.
+
+Instead of manim mixing one ``add_sound`` per segment into the render, the
+scene is rendered silent (narration waits still hold the screen) and the
+segment WAVs are laid out on a single track at their planned offsets
+(``duration.narration_offsets``). ffmpeg then muxes the track onto the video
+with the video stream copied, so narration costs one audio encode and never
+a re-render. A scene rendered before its narration existed (no narration
+waits at all) is held instead: ffmpeg freezes the frame at each segment's
+animation for the segment's length (``mux_narration_with_holds``).
+
+The track is 16-bit PCM at the first segment's rate and channel count;
+segments in another format are converted with ffmpeg first. Overlapping
+segments are mixed with clipping.
+
+Configuration (environment):
+    FFMPEG_BINARY       ffmpeg executable (default: ffmpeg)
+    NARRATION_BITRATE   AAC bitrate of the muxed narration (default: 128k)
+"""
+
+import array
+import contextlib
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+NARRATION_BITRATE = os.getenv("NARRATION_BITRATE", "128k")
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+def _ffmpeg(args: List[str], what: str):
+    command = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + args
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True, timeout=120)
+    except FileNotFoundError as e:
+        raise RuntimeError(f"{what} failed: {FFMPEG_BINARY} is not installed") from e
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{what} failed: {e.stderr.strip()}") from e
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"{what} timed out") from e
+
+
+def _read_samples(path: str, rate: int, channels: int, scratch_dir: str) -> array.array:
+    """16-bit samples of ``path`` at ``rate``/``channels``, converting with ffmpeg if needed."""
+    with contextlib.closing(wave.open(path, "rb")) as f:
+        if (f.getframerate(), f.getnchannels(), f.getsampwidth()) != (rate, channels, SAMPLE_WIDTH):
+            converted = os.path.join(scratch_dir, f"converted_{os.path.basename(path)}")
+            _ffmpeg(["-i", path, "-ar", str(rate), "-ac", str(channels), "-sample_fmt", "s16", converted],
+                    "Narration conversion")
+            return _read_samples(converted, rate, channels, scratch_dir)
+        samples = array.array("h")
+        samples.frombytes(f.readframes(f.getnframes()))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def build_narration_track(clips: List[Tuple[float, str]], output_path: str) -> str:
+    """
+    Lay segment WAVs out on one track.
+
+    Args:
+        clips: (start offset in seconds, WAV path) per segment.
+        output_path: Track WAV to write.
+
+    Returns:
+        str: ``output_path``.
+
+    Raises:
+        ValueError: If there are no clips.
+    """
+    if not clips:
+        raise ValueError("No narration clips to assemble")
+    clips = sorted(clips)
+    with contextlib.closing(wave.open(clips[0][1], "rb")) as f:
+        rate, channels = f.getframerate(), f.getnchannels()
+
+    track = array.array("h")
+    written = 0  # end of the audio laid out so far, in samples
+    with tempfile.TemporaryDirectory(prefix="narration_") as scratch_dir:
+        for offset, path in clips:
+            samples = _read_samples(path, rate, channels, scratch_dir)
+            start = int(round(max(offset, 0.0) * rate)) * channels
+            end = start + len(samples)
+            if len(track) < end:
+                track.extend(array.array("h", bytes(SAMPLE_WIDTH * (end - len(track)))))
+            mixed = max(0, min(written, end) - start)
+            if mixed:
+                logger.warning(f"Narration clip at {offset:.2f}s overlaps the previous one by "
+                               f"{mixed / channels / rate:.2f}s; mixing")
+                for i in range(mixed):
+                    track[start + i] = max(-32768, min(32767, track[start + i] + samples[i]))
+            track[start + mixed:end] = samples[mixed:]
+            written = max(written, end)
+
+    if sys.byteorder == "big":
+        track.byteswap()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with contextlib.closing(wave.open(output_path, "wb")) as f:
+        f.setnchannels(channels)
+        f.setsampwidth(SAMPLE_WIDTH)
+        f.setframerate(rate)
+        f.writeframes(track.tobytes())
+    return output_path
+
+
+def mux_narration(video_path: str, track_path: str, output_path: str) -> str:
+    """
+    Mux a narration track onto a video, copying the video stream.
+
+    The track is padded with silence to the video's length and cut at its end.
+
+    Returns:
+        str: ``output_path``.
+
+    Raises:
+        RuntimeError: If ffmpeg fails.
+    """
+    return _mux(["-i", video_path, "-i", track_path, "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy",
+                 "-af", "apad"], output_path)
+
+
+def mux_narration_with_holds(video_path: str, track_path: str, holds: List[Tuple[float, float]],
+                             output_path: str) -> str:
+    """
+    Mux a narration track onto a video that was rendered without narration pauses.
+
+    The video is cut at each hold time and its frame there is frozen for the
+    hold's length, which re-encodes the video stream.
+
+    Args:
+        holds: (time in the source video, seconds to freeze), in time order.
+
+    Raises:
+        RuntimeError: If ffmpeg fails.
+    """
+    if not holds:
+        return mux_narration(video_path, track_path, output_path)
+    pieces = len(holds) + 1
+    graph = [f"[0:v]split={pieces}{''.join(f'[s{i}]' for i in range(pieces))}"]
+    start = 0.0
+    for i, (at, seconds) in enumerate(holds):
+        graph.append(f"[s{i}]trim=start={start:.3f}:end={at:.3f},setpts=PTS-STARTPTS,"
+                     f"tpad=stop_mode=clone:stop_duration={seconds:.3f}[v{i}]")
+        start = at
+    graph.append(f"[s{len(holds)}]trim=start={start:.3f},setpts=PTS-STARTPTS[v{len(holds)}]")
+    graph.append(f"{''.join(f'[v{i}]' for i in range(pieces))}concat=n={pieces}:v=1:a=0[v]")
+    graph.append("[1:a]apad[a]")
+    return _mux(["-i", video_path, "-i", track_path, "-filter_complex", ";".join(graph),
+                 "-map", "[v]", "-map", "[a]", "-c:v", "libx264", "-preset", "veryfast", "-crf", "20",
+                 "-pix_fmt", "yuv420p"], output_path)
+
+
+def _mux(args: List[str], output_path: str) -> str:
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.mp4"
+    try:
+        _ffmpeg(args + ["-c:a", "aac", "-b:a", NARRATION_BITRATE, "-shortest", "-movflags", "+faststart",
+                        tmp_path], "Narration mux")
+        os.replace(tmp_path, output_path)
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    return output_path
@@ -1,31 +1,155 @@
+"""
+Narration synthesis.
+
+Segments of one narration fan out over a process pool shared by every job,
+so a 10-segment script costs about 10 / TTS_MAX_WORKERS segment latencies
+instead of 10. Each worker process keeps its own backend (and engine), and
+synthesizes its share of the segments as one batch. A failing segment does
+not fail its neighbours: it is retried on its own, and if it still fails it
+is reported and left out. Segments already in the TTS cache (``cache.py``)
+are linked from it and never reach the pool.
+
+Configuration (environment):
+    TTS_MAX_WORKERS   concurrent TTS processes across all jobs; 1 synthesizes
+                      in-process (default: half the CPUs, at most 4)
+"""
+
+import logging
+import multiprocessing
 import os
-import pyttsx3
-import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from .backends import get_backend, new_wav_path
+from .cache import get_tts_cache
+
+logger = logging.getLogger(__name__)
+
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", str(min(4, max(1, (os.cpu_count() or 2) // 2)))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
 
 def generate_audio_segment(text: str, output_dir: str) -> str:
     """
-    Generates a WAV file for the given text using pyttsx3.
+    Generates a WAV file for the given text with the configured TTS backend.
     Returns the absolute path to the generated file.
     """
-    engine = pyttsx3.init()
-    
-    # Configure voice
-    engine.setProperty("rate", 160)
-    engine.setProperty("volume", 1.0)
-    
-    # Ensure raw output dir exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    unique_id = str(uuid.uuid4())
-    filename = f"voice_{unique_id}.wav"
-    output_path = os.path.join(output_dir, filename)
-    abs_path = os.path.abspath(output_path)
-    
-    # Save to file
-    engine.save_to_file(text, abs_path)
-    engine.runAndWait()
-    
-    if not os.path.exists(abs_path):
-        raise RuntimeError(f"TTS failed: Expected output file at {abs_path} was not found.")
-        
-    return abs_path
+    return get_backend().synthesize(text, new_wav_path(output_dir))
+
+
+def generate_audio_segments(texts: List[str], output_dir: str) -> List[str]:
+    """
+    Generates one WAV file per text in a single backend batch.
+    Returns the absolute paths, in the order of ``texts``.
+    """
+    if not texts:
+        return []
+    return get_backend().synthesize_batch(list(texts), output_dir)
+
+
+def _synthesize_chunk(texts: List[str], output_dir: str) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Worker entry point: (path, error) per text. A failed batch is retried text by text."""
+    backend = get_backend()
+    try:
+        return [(path, None) for path in backend.synthesize_batch(texts, output_dir)]
+    except Exception as e:
+        if len(texts) == 1:
+            return [(None, str(e))]
+    results = []
+    for text in texts:
+        try:
+            results.append((backend.synthesize(text, new_wav_path(output_dir)), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: workers must not inherit the server's threads or a parent's TTS engine
+                _pool = ProcessPoolExecutor(max_workers=TTS_MAX_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def synthesize_segments(texts: List[str], output_dir: str) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """
+    Synthesize narration segments in parallel.
+
+    Args:
+        texts: Segment texts; empty texts are skipped.
+        output_dir: Directory for the WAV files.
+
+    Returns:
+        tuple: (segment index -> absolute WAV path, segment index -> error message). Every
+        non-empty text appears in exactly one of the two.
+    """
+    paths, errors = {}, {}
+    spoken = [i for i, text in enumerate(texts) if text]
+    cache = get_tts_cache()
+    keys = {}
+    if cache is not None:
+        for i in spoken:
+            keys[i] = cache.key(texts[i])
+            hit = cache.get(keys[i], output_dir)
+            if hit is not None:
+                paths[i] = hit[0]
+        if paths:
+            logger.info(f"TTS cache: {len(paths)}/{len(spoken)} segment(s) reused")
+        spoken = [i for i in spoken if i not in paths]
+    # repeated text in one narration is synthesized once and linked for the repeats
+    first = {}
+    for i in spoken:
+        first.setdefault(keys.get(i, i), i)
+    repeats = [i for i in spoken if first[keys.get(i, i)] != i]
+    spoken = [i for i in spoken if first[keys.get(i, i)] == i]
+    if not spoken:
+        return paths, errors
+    workers = min(TTS_MAX_WORKERS, len(spoken))
+    # contiguous chunks keep each worker's share a single batch
+    chunks = [spoken[w * len(spoken) // workers:(w + 1) * len(spoken) // workers] for w in range(workers)]
+
+    results: List[List[Tuple[Optional[str], Optional[str]]]]
+    if workers <= 1:
+        results = [_synthesize_chunk([texts[i] for i in spoken], output_dir)]
+    else:
+        try:
+            pool = _get_pool()
+            futures = [pool.submit(_synthesize_chunk, [texts[i] for i in chunk], output_dir) for chunk in chunks]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            logger.warning(f"TTS worker pool failed ({e}); synthesizing in-process")
+            _reset_pool()
+            results = [_synthesize_chunk([texts[i] for i in chunk], output_dir) for chunk in chunks]
+
+    for chunk, chunk_results in zip(chunks, results):
+        for i, (path, error) in zip(chunk, chunk_results):
+            if path is not None:
+                paths[i] = path
+                if cache is not None:
+                    cache.put(keys[i], path, texts[i])
+            else:
+                errors[i] = error
+                logger.warning(f"TTS failed for segment {i}: {error}")
+    for i in repeats:
+        hit = cache.get(keys[i], output_dir)
+        if hit is not None:
+            paths[i] = hit[0]
+        else:
+            errors[i] = errors.get(first[keys[i]], "TTS cache write failed")
+    return paths, errors
@@ -1,40 +1,29 @@
 import os
 import logging
 import re
-import google.generativeai as genai
 from ..prompts.manim_prompts import generate_manim_prompt
+from .providers import get_provider
 
 logger = logging.getLogger(__name__)
 
 # --- GenAI Configuration -----------------------------------------------------
 GENAI_MODEL = os.getenv('GENAI_MODEL', 'gemini-2.5-flash')
-genai_model = None
 
-def init_genai():
-    global genai_model
-    try:
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            # Configure safety settings to block nothing
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-            genai_model = genai.GenerativeModel(GENAI_MODEL, safety_settings=safety_settings)
-            logger.info(f"GenAI initialized with model: {GENAI_MODEL} and safety settings: BLOCK_NONE")
-        else:
-            logger.warning("No GOOGLE_API_KEY or GEMINI_API_KEY found. AI features will be disabled.")
-    except Exception as e:
-        logger.error(f"Failed to initialize GenAI: {e}")
+# Safety settings for the code/explanation calls: block nothing
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
 
-# Call init on module import (or we can call it explicitly from app.py, but module level is easier for now)
-# However, env vars might not be loaded yet if this is imported before load_dotenv() is called in app.py
-# Better to have a explicit init or a lazy loader. I'll make sure to call init_genai() or handle it.
-# For now, let's keep it lazy or let app.py initialize it via an init function called after dotenv.
-# But original code had it at top level. I will keep `init_genai` function and call it.
+def init_genai():
+    """Return the configured LLM provider, or None if it cannot be used."""
+    provider = get_provider()
+    if not provider.is_available():
+        logger.warning("No GOOGLE_API_KEY or GEMINI_API_KEY found. AI features will be disabled.")
+        return None
+    return provider
 
 def extract_text(response) -> str:
     """
@@ -227,10 +216,9 @@ def sanitize_manim_code(code: str) -> str:
     return sanitized
 
 def generate_ai_manim_code(concept: str) -> str:
-    if genai_model is None:
-        init_genai() # Try initializing if not already
-        if genai_model is None:
-             return ""
+    provider = init_genai()
+    if provider is None:
+        return ""
     try:
         # Backend guard: Detect equation-based questions
         concept_lower = concept.lower()
@@ -243,16 +231,14 @@ def generate_ai_manim_code(concept: str) -> str:
         if is_equation:
             logger.info(f"Detected equation-solving question: {concept}")
         
-        resp = genai_model.generate_content(
-            contents=full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,  # Lower temperature for more deterministic output
-            ),
+        content = provider.generate(
+            full_prompt,
+            purpose="manim_code",
+            temperature=0.1,  # Lower temperature for more deterministic output
+            model=GENAI_MODEL,
+            safety_settings=SAFETY_SETTINGS,
         )
         
-        # Extract text using helper function (logging happens inside extract_text)
-        content = extract_text(resp)
-        
         # Validate extracted content is not empty
         if not content or not content.strip():
             logger.error("LLM returned empty output")
@@ -275,25 +261,22 @@ def generate_ai_manim_code(concept: str) -> str:
 
 def generate_explanation(concept):
     """Generate a short text explanation of the concept."""
-    if genai_model is None:
-        init_genai()
-        if genai_model is None:
-            return f"Here is a visual explanation of {concept}."
+    provider = init_genai()
+    if provider is None:
+        return f"Here is a visual explanation of {concept}."
     try:
         prompt = (
             "You are a helpful math tutor. Provide a concise, 2-sentence explanation "
             "of the requested concept. Do not use LaTeX formatting, just plain text.\n\n"
             f"Concept: {concept}"
         )
-        resp = genai_model.generate_content(
-            contents=prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-            ),
+        text = provider.generate(
+            prompt,
+            purpose="explanation",
+            temperature=0.7,
+            model=GENAI_MODEL,
+            safety_settings=SAFETY_SETTINGS,
         )
-        
-        # Extract text using helper function
-        text = extract_text(resp)
         return text if text else f"Explanation of {concept}."
     except Exception as e:
         logger.error(f"Explanation generation failed: {e}")
@@ -0,0 +1,361 @@
+"""
+LLM provider abstraction.
+
+Every LLM call in EduDiff goes through ``get_provider().generate(...)`` so the
+backing service can be swapped without touching the callers:
+
+- ``gemini`` (default): Google Gemini via ``google.generativeai``.
+- ``mock``: a local, deterministic stand-in that serves recorded or synthetic
+  responses with a configurable latency distribution. Used for offline
+  load-testing and benchmarking of rendering, TTS and the Flask server.
+
+Configuration (environment):
+    LLM_PROVIDER          gemini | mock (default: gemini)
+    LLM_RECORD_PATH       if set, real responses are appended to this JSONL file
+    LLM_MOCK_RESPONSES    JSONL file of recorded responses for the mock provider
+    LLM_MOCK_LATENCY      latency spec, e.g. "fixed:0.5", "uniform:0.2,1.5",
+                          "normal:1.0,0.3", "lognormal:0.0,0.5" (seconds)
+    LLM_MOCK_SEED         seed for latency sampling and response selection
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .tokens import estimate_tokens, ledger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv('GENAI_MODEL', 'gemini-2.5-flash')
+
+
+def prompt_fingerprint(prompt: str, system_instruction: Optional[str] = None) -> str:
+    """Stable hash of a (system instruction, prompt) pair used to match recordings."""
+    h = hashlib.sha256()
+    h.update((system_instruction or "").encode("utf-8"))
+    h.update(b"\x00")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMProvider:
+    """
+    Base class for text-generation backends.
+
+    Subclasses implement ``_generate``; callers use ``generate``.
+    ``purpose`` names the call site (e.g. "manim_code", "voice_script") so
+    providers can route, record and account per call type.
+    """
+
+    name = "base"
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        purpose: str = "generic",
+        system_instruction: Optional[str] = None,
+        temperature: Optional[float] = None,
+        response_mime_type: Optional[str] = None,
+        model: Optional[str] = None,
+        safety_settings: Optional[List[dict]] = None,
+    ) -> str:
+        """
+        Generate text for the prompt.
+
+        Returns:
+            str: The response text (may be empty).
+        """
+        start = time.perf_counter()
+        text = self._generate(
+            prompt,
+            purpose=purpose,
+            system_instruction=system_instruction,
+            temperature=temperature,
+            response_mime_type=response_mime_type,
+            model=model or DEFAULT_MODEL,
+            safety_settings=safety_settings,
+        )
+        latency = time.perf_counter() - start
+
+        input_tokens = estimate_tokens(system_instruction) + estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        ledger.record(purpose, self.name, input_tokens, output_tokens, latency)
+        logger.info(
+            f"LLM call purpose={purpose} provider={self.name} "
+            f"input~{input_tokens} output~{output_tokens} tokens latency={latency:.2f}s"
+        )
+        return text
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Token count for ``text``; exact where the backend supports it, estimated otherwise."""
+        return estimate_tokens(text)
+
+    def _generate(self, prompt, *, purpose, system_instruction, temperature,
+                  response_mime_type, model, safety_settings) -> str:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend. Models are created lazily and cached per system instruction."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _key(self) -> Optional[str]:
+        return self._api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+
+    def is_available(self) -> bool:
+        return bool(self._key())
+
+    def _get_model(self, model, system_instruction, safety_settings):
+        import google.generativeai as genai
+
+        cache_key = (model, system_instruction, json.dumps(safety_settings, sort_keys=True))
+        with self._lock:
+            if not self._configured:
+                key = self._key()
+                if not key:
+                    raise RuntimeError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable is not set.")
+                genai.configure(api_key=key)
+                self._configured = True
+            if cache_key not in self._models:
+                kwargs = {"model_name": model}
+                if system_instruction:
+                    kwargs["system_instruction"] = system_instruction
+                if safety_settings:
+                    kwargs["safety_settings"] = safety_settings
+                self._models[cache_key] = genai.GenerativeModel(**kwargs)
+                logger.info(f"GenAI model initialized: {model}")
+            return self._models[cache_key]
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        gen_model = self._get_model(model or DEFAULT_MODEL, None, None)
+        return gen_model.count_tokens(text).total_tokens
+
+    def _generate(self, prompt, *, purpose, system_instruction, temperature,
+                  response_mime_type, model, safety_settings) -> str:
+        import google.generativeai as genai
+        from .generator import extract_text
+
+        gen_model = self._get_model(model, system_instruction, safety_settings)
+        config_kwargs = {}
+        if temperature is not None:
+            config_kwargs["temperature"] = temperature
+        if response_mime_type:
+            config_kwargs["response_mime_type"] = response_mime_type
+
+        response = gen_model.generate_content(
+            contents=prompt,
+            generation_config=genai.types.GenerationConfig(**config_kwargs),
+        )
+        return extract_text(response)
+
+
+class RecordingProvider(LLMProvider):
+    """Wraps another provider and appends every response to a JSONL file for later replay."""
+
+    def __init__(self, inner: LLMProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+record"
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return self.inner.is_available()
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        return self.inner.count_tokens(text, model)
+
+    def _generate(self, prompt, *, purpose, system_instruction, **kwargs) -> str:
+        text = self.inner._generate(prompt, purpose=purpose, system_instruction=system_instruction, **kwargs)
+        record = {
+            "purpose": purpose,
+            "fingerprint": prompt_fingerprint(prompt, system_instruction),
+            "response": text,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return text
+
+
+def parse_latency_spec(spec: Optional[str]):
+    """
+    Parse a latency distribution spec into a sampler ``f(rng) -> seconds``.
+
+    Supported forms: "fixed:S", "uniform:LO,HI", "normal:MEAN,STD",
+    "lognormal:MU,SIGMA". An empty spec means no added latency.
+    """
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, raw_args = spec.partition(":")
+    kind = kind.strip().lower()
+    try:
+        args = [float(a) for a in raw_args.split(",") if a.strip()]
+    except ValueError as e:
+        raise ValueError(f"Invalid LLM latency spec '{spec}': {e}") from e
+
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0]
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "normal" and len(args) == 2:
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == "lognormal" and len(args) == 2:
+        return lambda rng: rng.lognormvariate(args[0], args[1])
+    raise ValueError(f"Invalid LLM latency spec '{spec}'")
+
+
+_MOCK_SCENE = '''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        title = Text("{title}", font_size=40).to_edge(UP)
+        eq = MathTex(r"a^2 + b^2 = c^2")
+        box = SurroundingRectangle(eq, color=GREEN)
+        self.play(Write(title))
+        self.play(Write(eq))
+        self.wait(1)
+        self.play(Create(box))
+        self.wait(0.5)
+'''
+
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic local stand-in for an LLM.
+
+    Responses come from recordings (matched by prompt fingerprint, then by
+    purpose) or, failing that, from built-in synthetic responses shaped like
+    what each call site expects. Latency is sampled from a seeded RNG derived
+    from the prompt, so the same prompt always gets the same response and delay.
+    """
+
+    name = "mock"
+
+    def __init__(self, responses_path: Optional[str] = None, latency: Optional[str] = None,
+                 seed: int = 0):
+        self.seed = seed
+        self.latency_spec = latency
+        self._sample_latency = parse_latency_spec(latency)
+        self._by_fingerprint: Dict[str, str] = {}
+        self._by_purpose: Dict[str, List[str]] = {}
+        if responses_path:
+            self.load_recordings(responses_path)
+
+    def load_recordings(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                response = record.get("response", "")
+                if record.get("fingerprint"):
+                    self._by_fingerprint[record["fingerprint"]] = response
+                self._by_purpose.setdefault(record.get("purpose", "generic"), []).append(response)
+        logger.info(f"Mock LLM loaded {len(self._by_fingerprint)} recorded responses from {path}")
+
+    def _rng(self, fingerprint: str) -> random.Random:
+        return random.Random(f"{self.seed}:{fingerprint}")
+
+    def _generate(self, prompt, *, purpose, system_instruction, **kwargs) -> str:
+        fingerprint = prompt_fingerprint(prompt, system_instruction)
+        rng = self._rng(fingerprint)
+
+        delay = self._sample_latency(rng)
+        if delay > 0:
+            time.sleep(delay)
+
+        if fingerprint in self._by_fingerprint:
+            return self._by_fingerprint[fingerprint]
+        recorded = self._by_purpose.get(purpose)
+        if recorded:
+            return recorded[rng.randrange(len(recorded))]
+        return self.synthetic_response(prompt, purpose)
+
+    @staticmethod
+    def synthetic_response(prompt: str, purpose: str) -> str:
+        """Build a plausible, well-formed response for the given call purpose."""
+        first_line = next((l.strip() for l in prompt.splitlines() if l.strip()), "the concept")
+        topic = first_line.replace('"', "'")[:60]
+
+        if purpose == "manim_code":
+            return _MOCK_SCENE.format(title=topic.replace("{", "").replace("}", ""))
+        if purpose == "voice_script":
+            # Raw scene code or the indexed summary from prompts.scene_summary
+            plays = prompt.count("self.play(") + prompt.count("self.add(")
+            plays = max(1, plays or len(re.findall(r"^\s*\d+: (?:play|add) ", prompt, re.MULTILINE)))
+            segments = [
+                {"start_after_animation": i, "text": f"Step {i + 1} of the explanation."}
+                for i in range(min(plays, 4))
+            ]
+            return json.dumps({"title": "Explanation", "segments": segments})
+        if purpose == "math_solution":
+            return (
+                f"1. Restate the problem: {topic}\n"
+                "2. Identify what is given and what we need to find.\n"
+                "3. Apply the relevant rule step by step.\n"
+                "4. Final answer: see the worked steps above."
+            )
+        return f"This is a short explanation of {topic}. It highlights the key idea in plain language."
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def build_provider(name: Optional[str] = None) -> LLMProvider:
+    """Construct a provider from its name and the environment."""
+    name = (name or os.getenv("LLM_PROVIDER", "gemini")).strip().lower()
+    if name == "mock":
+        provider = MockProvider(
+            responses_path=os.getenv("LLM_MOCK_RESPONSES") or None,
+            latency=os.getenv("LLM_MOCK_LATENCY") or None,
+            seed=int(os.getenv("LLM_MOCK_SEED", "0")),
+        )
+    elif name == "gemini":
+        provider = GeminiProvider()
+    else:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}' (expected 'gemini' or 'mock')")
+
+    record_path = os.getenv("LLM_RECORD_PATH")
+    if record_path and name != "mock":
+        provider = RecordingProvider(provider, record_path)
+    return provider
+
+
+def get_provider() -> LLMProvider:
+    """Return the process-wide provider, building it on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+                logger.info(f"LLM provider: {_provider.name}")
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]):
+    """Override the process-wide provider (None resets to the environment default)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
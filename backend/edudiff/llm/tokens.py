@@ -0,0 +1,97 @@
+"""
+Token accounting for LLM calls.
+
+``estimate_tokens`` is a provider-independent approximation (roughly what
+SentencePiece/BPE tokenizers produce for English prose and Python code).
+Every ``LLMProvider.generate`` call is recorded in the process-wide ledger,
+so per-call and per-purpose token counts can be reported without extra
+API traffic.
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|\s+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the number of tokens in ``text``.
+
+    Words cost one token per ~4 letters, digit runs one per 3 digits,
+    whitespace runs are mostly free (newlines/indentation cost one),
+    every other symbol costs one token.
+    """
+    if not text:
+        return 0
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        first = piece[0]
+        if first.isalpha() and first.isascii():
+            total += (len(piece) + 3) // 4
+        elif first.isdigit():
+            total += (len(piece) + 2) // 3
+        elif first.isspace():
+            if "\n" in piece or len(piece) > 1:
+                total += 1
+        else:
+            total += 1
+    return total
+
+
+class TokenLedger:
+    """Thread-safe record of recent LLM calls and per-purpose totals."""
+
+    def __init__(self, max_calls: int = 500):
+        self._calls = deque(maxlen=max_calls)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, purpose: str, provider: str, input_tokens: int, output_tokens: int,
+               latency: float):
+        entry = {
+            "purpose": purpose,
+            "provider": provider,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "latency": round(latency, 4),
+        }
+        with self._lock:
+            self._calls.append(entry)
+            totals = self._totals.setdefault(purpose, {
+                "calls": 0, "input_tokens": 0, "output_tokens": 0, "latency": 0.0,
+            })
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["latency"] += latency
+
+    def calls(self) -> List[dict]:
+        with self._lock:
+            return list(self._calls)
+
+    def report(self) -> Dict[str, dict]:
+        """Per-purpose totals and averages."""
+        with self._lock:
+            report = {}
+            for purpose, t in self._totals.items():
+                n = t["calls"] or 1
+                report[purpose] = {
+                    "calls": t["calls"],
+                    "input_tokens": t["input_tokens"],
+                    "output_tokens": t["output_tokens"],
+                    "avg_input_tokens": round(t["input_tokens"] / n, 1),
+                    "avg_output_tokens": round(t["output_tokens"] / n, 1),
+                    "avg_latency": round(t["latency"] / n, 3),
+                }
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._totals.clear()
+
+
+ledger = TokenLedger()
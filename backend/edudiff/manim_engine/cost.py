@@ -0,0 +1,177 @@
+"""
+Pre-render cost estimate for Manim scenes.
+
+Features are read from the scene's AST (``play`` calls, planned duration,
+3D base class, updaters, TeX objects) and combined with the resolution and
+frame rate of the quality tier in a linear model:
+
+    cpu_s  = base + tex * n_tex + play * n_play
+             + frames * megapixels * (frame + frame_3d * is_3d + frame_updater * has_updaters)
+    mem_mb = mem_base + mem_mpx * megapixels + mem_3d * is_3d + mem_mobject * n_mobjects
+    eta_s  = cpu_s * wall_ratio
+
+The default coefficients are rough; ``benchmarks/calibrate_cost.py`` fits
+them against measured renders of the built-in templates and writes them to
+``COST_MODEL_PATH``, which is picked up here when present.
+
+Configuration (environment):
+    COST_MODEL_PATH         calibrated coefficients (default: tmp/cost_model.json)
+    MAX_SCENE_CPU_SECONDS   admission limit on estimated CPU seconds (default: 600)
+    MAX_SCENE_MEMORY_MB     admission limit on estimated peak memory (default: 2048)
+    HEAVY_SCENE_CPU_SECONDS estimates above this are flagged ``heavy`` (default: 120)
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from .duration import QUALITY_FLAGS, planned_seconds
+from .scene_ir import parse_scene
+
+logger = logging.getLogger(__name__)
+
+COST_MODEL_PATH = os.getenv("COST_MODEL_PATH", os.path.join("tmp", "cost_model.json"))
+MAX_SCENE_CPU_SECONDS = float(os.getenv("MAX_SCENE_CPU_SECONDS", "600"))
+MAX_SCENE_MEMORY_MB = float(os.getenv("MAX_SCENE_MEMORY_MB", "2048"))
+HEAVY_SCENE_CPU_SECONDS = float(os.getenv("HEAVY_SCENE_CPU_SECONDS", "120"))
+
+# manim quality flag -> (width, height, fps)
+QUALITY_SPECS = {
+    "l": (854, 480, 15),
+    "m": (1280, 720, 30),
+    "h": (1920, 1080, 60),
+    "p": (2560, 1440, 60),
+    "k": (3840, 2160, 60),
+}
+
+DEFAULT_COEFFICIENTS = {
+    "base": 4.0,            # interpreter + manim import + ffmpeg setup
+    "tex": 0.6,             # one LaTeX -> SVG compile
+    "play": 0.15,           # per-animation setup/teardown and partial movie file
+    "frame": 0.05,          # per frame per megapixel
+    "frame_3d": 0.25,
+    "frame_updater": 0.03,
+    "mem_base": 250.0,
+    "mem_mpx": 40.0,
+    "mem_3d": 150.0,
+    "mem_mobject": 0.5,
+    "wall_ratio": 1.1,      # wall seconds per CPU second (ffmpeg runs alongside)
+}
+
+THREE_D_BASES = {"ThreeDScene", "SpecialThreeDScene"}
+THREE_D_MOBJECTS = {"ThreeDAxes", "Surface", "Sphere", "Cube", "Prism", "Cone", "Cylinder", "Torus",
+                    "Dot3D", "Line3D", "Arrow3D", "ParametricSurface", "OpenGLSurface"}
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex", "Matrix", "IntegerMatrix", "DecimalMatrix",
+               "MobjectMatrix", "BulletedList", "Title"}
+UPDATER_CALLS = {"always_redraw", "add_updater", "ValueTracker", "always", "f_always", "UpdateFromFunc",
+                 "UpdateFromAlphaFunc", "TracedPath"}
+
+
+class SceneCostError(ValueError):
+    """The estimated scene cost exceeds the admission limits."""
+
+    def __init__(self, message: str, estimate: dict):
+        self.estimate = estimate
+        super().__init__(message)
+
+
+def scene_features(code: str) -> Dict[str, float]:
+    """
+    Cost-relevant features of a scene.
+
+    Returns:
+        dict: play_calls, duration, three_d, updaters, tex, mobjects.
+    """
+    ir = parse_scene(code)
+    calls = ir.call_names
+    three_d = bool(ir.all_base_names & THREE_D_BASES) or any(calls[n] for n in THREE_D_MOBJECTS)
+    return {
+        "play_calls": sum(t.multiplier for t in ir.timeline if t.kind == "play"),
+        "duration": round(sum(planned_seconds(t) for t in ir.timeline), 2),
+        "three_d": int(three_d),
+        "updaters": sum(calls[n] for n in UPDATER_CALLS),
+        "tex": sum(calls[n] for n in TEX_CLASSES),
+        "mobjects": sum(count for name, count in calls.items() if name[:1].isupper()),
+    }
+
+
+_model_cache = {"mtime": None, "coefficients": DEFAULT_COEFFICIENTS}
+
+
+def load_coefficients(path: Optional[str] = None) -> Dict[str, float]:
+    """Calibrated coefficients from ``COST_MODEL_PATH``, falling back to the defaults."""
+    path = path or COST_MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return DEFAULT_COEFFICIENTS
+    if mtime != _model_cache["mtime"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                fitted = json.load(f).get("coefficients", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load cost model {path}: {e}")
+            return DEFAULT_COEFFICIENTS
+        _model_cache["coefficients"] = {**DEFAULT_COEFFICIENTS, **fitted}
+        _model_cache["mtime"] = mtime
+    return _model_cache["coefficients"]
+
+
+def design_row(features: Dict[str, float], quality: str) -> Dict[str, float]:
+    """Per-coefficient terms of the CPU model (the calibration design matrix row)."""
+    width, height, fps = QUALITY_SPECS[QUALITY_FLAGS.get(quality, quality)]
+    pixel_frames = features["duration"] * fps * (width * height / 1e6)
+    return {
+        "base": 1.0,
+        "tex": features["tex"],
+        "play": features["play_calls"],
+        "frame": pixel_frames,
+        "frame_3d": pixel_frames * features["three_d"],
+        "frame_updater": pixel_frames * min(features["updaters"], 1),
+    }
+
+
+def estimate_cost(code: str, quality: str = "l", coefficients: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Estimate CPU seconds, peak memory and wall-clock ETA for rendering ``code``.
+
+    Args:
+        code: Scene source.
+        quality: Quality name ('low') or manim flag ('l').
+        coefficients: Model coefficients; defaults to the calibrated model.
+
+    Returns:
+        dict: cpu_seconds, memory_mb, eta_seconds, heavy, and the features used.
+    """
+    c = coefficients or load_coefficients()
+    features = scene_features(code)
+    flag = QUALITY_FLAGS.get(quality, quality)
+    width, height, _fps = QUALITY_SPECS[flag]
+
+    cpu = sum(c[k] * v for k, v in design_row(features, flag).items())
+    memory = (c["mem_base"] + c["mem_mpx"] * width * height / 1e6
+              + c["mem_3d"] * features["three_d"] + c["mem_mobject"] * features["mobjects"])
+    return {
+        "quality": flag,
+        "cpu_seconds": round(cpu, 1),
+        "memory_mb": round(memory),
+        "eta_seconds": round(cpu * c["wall_ratio"], 1),
+        "heavy": cpu > HEAVY_SCENE_CPU_SECONDS,
+        "features": features,
+    }
+
+
+def check_admission(estimate: dict):
+    """
+    Reject scenes whose estimated cost is over the configured limits.
+
+    Raises:
+        SceneCostError: If CPU seconds or memory exceed the limits.
+    """
+    if estimate["cpu_seconds"] > MAX_SCENE_CPU_SECONDS:
+        raise SceneCostError(f"Scene needs ~{estimate['cpu_seconds']:.0f} CPU seconds at quality "
+                             f"'{estimate['quality']}' (limit {MAX_SCENE_CPU_SECONDS:.0f})", estimate)
+    if estimate["memory_mb"] > MAX_SCENE_MEMORY_MB:
+        raise SceneCostError(f"Scene needs ~{estimate['memory_mb']} MB at quality "
+                             f"'{estimate['quality']}' (limit {MAX_SCENE_MEMORY_MB:.0f} MB)", estimate)
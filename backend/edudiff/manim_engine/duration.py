@@ -0,0 +1,232 @@
+"""
+Render duration budget for generated scenes.
+
+Render time grows linearly with the scene's timeline, and LLM-written scenes
+sometimes ask for ``run_time=8`` or ``self.wait(10)``. This pass plans the
+timeline from the AST (``self.play`` run times, including ``run_time`` set on
+the animations, ``self.wait`` durations, loops with a fixed iteration count
+and the scene's helper methods) and enforces a per-quality budget:
+
+1. every non-narration ``run_time``/``wait`` is clamped to a per-call cap,
+2. if the scene is still over budget, those calls are scaled down uniformly.
+
+Narration waits (a ``self.wait`` directly after ``self.add_sound`` or a
+``"narration N"`` marker, as written by ``inject_audio_into_script``) are
+never shortened, so audio stays in sync; a scene whose narration alone
+exceeds the budget is rejected, as is one whose length cannot be planned
+(a ``while`` loop or a loop over a computed range around timed calls).
+``narration_offsets`` gives the planned start
+of each marked narration wait, where the muxed narration track places it, and
+``animation_end_times`` where a silent render is held for narration.
+
+Edits are applied to the source text by AST span, so comments and formatting
+outside the touched arguments are preserved.
+
+Configuration (environment):
+    RENDER_DURATION_BUDGETS   seconds per quality flag (default: l=120,m=90,h=60,p=45,k=30)
+    MAX_RUN_TIME              cap for a single animation run_time (default: 5)
+    MAX_WAIT                  cap for a single non-narration wait (default: 5)
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .scene_ir import TimedCall, parse_scene
+
+logger = logging.getLogger(__name__)
+
+MIN_DURATION = 0.2
+
+
+def _parse_budgets(spec: str) -> Dict[str, float]:
+    budgets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            flag, seconds = item.split("=", 1)
+            budgets[flag.strip()] = float(seconds)
+    return budgets
+
+
+RENDER_DURATION_BUDGETS = _parse_budgets(os.getenv("RENDER_DURATION_BUDGETS", "l=120,m=90,h=60,p=45,k=30"))
+MAX_RUN_TIME = float(os.getenv("MAX_RUN_TIME", "5"))
+MAX_WAIT = float(os.getenv("MAX_WAIT", "5"))
+
+# /generate quality names -> manim quality flags
+QUALITY_FLAGS = {"low": "l", "medium": "m", "high": "h"}
+
+
+class DurationBudgetError(ValueError):
+    """The scene cannot be brought under its duration budget without breaking narration sync."""
+
+    def __init__(self, message: str, report: dict):
+        self.report = report
+        super().__init__(message)
+
+
+def budget_for(quality: str) -> float:
+    """Duration budget in seconds for a quality name ('low') or manim flag ('l')."""
+    flag = QUALITY_FLAGS.get(quality, quality)
+    return RENDER_DURATION_BUDGETS.get(flag, min(RENDER_DURATION_BUDGETS.values()))
+
+
+def cap_for(t: TimedCall) -> float:
+    return MAX_RUN_TIME if t.kind == "play" else MAX_WAIT
+
+
+def current_duration(t: TimedCall) -> float:
+    """Known duration, or the upper bound of a runtime one (the cap if unbounded)."""
+    bound = t.upper_bound
+    if bound is None:
+        return cap_for(t)
+    return bound if t.value is not None else min(bound, cap_for(t))
+
+
+def planned_seconds(t: TimedCall) -> float:
+    return current_duration(t) * t.multiplier
+
+
+def planned_duration(code: str) -> float:
+    """Total planned scene duration in seconds."""
+    return sum(planned_seconds(t) for t in parse_scene(code).timeline)
+
+
+def narration_offsets(code: str) -> Dict[int, float]:
+    """Narration segment index -> planned start in seconds of its marked wait."""
+    offsets, elapsed = {}, 0.0
+    for t in parse_scene(code).timeline:
+        if t.segment is not None:
+            offsets.setdefault(t.segment, elapsed)
+        elapsed += planned_seconds(t)
+    return offsets
+
+
+def animation_end_times(code: str) -> List[float]:
+    """Planned time in seconds at which each top-level animation (``SceneIR.animations``) ends."""
+    ir = parse_scene(code)
+    ends, elapsed, timeline = [], 0.0, iter(ir.timeline)
+    pending = next(timeline, None)
+    for animation in ir.animations:
+        while pending is not None and pending.lineno <= animation.end_lineno:
+            elapsed += planned_seconds(pending)
+            pending = next(timeline, None)
+        ends.append(elapsed)
+    return ends
+
+
+def _offsets(code: str) -> List[int]:
+    starts, total = [], 0
+    for line in code.splitlines(keepends=True):
+        starts.append(total)
+        total += len(line.encode("utf-8"))
+    return starts
+
+
+def _fmt(seconds: float) -> str:
+    return f"{seconds:.2f}".rstrip("0").rstrip(".")
+
+
+def enforce_duration_budget(code: str, quality: str = "l",
+                            budget: Optional[float] = None) -> Tuple[str, dict]:
+    """
+    Clamp and scale ``run_time``/``wait`` values so the scene fits its budget.
+
+    Args:
+        code: Scene source (narration may already be injected).
+        quality: Quality name or manim flag selecting the budget.
+        budget: Explicit budget in seconds, overriding the quality tier.
+
+    Returns:
+        tuple: (code, report) where report has the planned and final durations.
+
+    Raises:
+        DurationBudgetError: If narration alone is longer than the budget, the timeline has no fixed
+            length (a ``while`` loop, a loop over a computed range) or it cannot be brought under the budget.
+    """
+    budget = budget if budget is not None else budget_for(quality)
+    ir = parse_scene(code)
+    timed = ir.timeline
+    narration = sum(planned_seconds(t) for t in timed if t.narration)
+    flexible = [t for t in timed if not t.narration]
+    planned = narration + sum(planned_seconds(t) for t in flexible)
+
+    report = {"quality": quality, "budget": budget, "planned": round(planned, 2),
+              "narration": round(narration, 2), "clamped": 0, "scale": 1.0}
+
+    if narration > budget:
+        report["final"] = report["planned"]
+        raise DurationBudgetError(
+            f"Narration needs {narration:.1f}s, over the {budget:.0f}s budget for quality '{quality}'", report)
+    if ir.unbounded:
+        report["final"] = report["planned"]
+        report["unbounded"] = list(ir.unbounded)
+        raise DurationBudgetError(f"Scene length cannot be planned: {'; '.join(ir.unbounded)}", report)
+
+    # 1. Per-call caps
+    targets = {}
+    for t in flexible:
+        bound = t.upper_bound
+        if bound is None or bound > cap_for(t):
+            report["clamped"] += 1
+        targets[id(t)] = min(current_duration(t), cap_for(t))
+    clamped_total = narration + sum(targets[id(t)] * t.multiplier for t in flexible)
+
+    # 2. Uniform scaling of what remains
+    flexible_total = clamped_total - narration
+    if clamped_total > budget + 0.05 and flexible_total > 0:  # tolerate rounding from an earlier pass
+        scale = (budget - narration) / flexible_total
+        report["scale"] = round(scale, 3)
+        for t in flexible:
+            targets[id(t)] = max(targets[id(t)] * scale, MIN_DURATION)
+
+    edits, edited = [], set()
+    for t in flexible:
+        target = targets[id(t)]
+        # a call in a helper method run from several places is edited once
+        if id(t.call) in edited or t.upper_bound is not None and abs(target - current_duration(t)) < 0.005:
+            continue
+        edited.add(id(t.call))
+        edits.append((t, target))
+
+    final = narration + sum(targets[id(t)] * t.multiplier for t in flexible)
+    report["final"] = round(final, 2)
+    report["edits"] = len(edits)
+    report["within_budget"] = final <= budget + 0.01
+    if not report["within_budget"]:
+        raise DurationBudgetError(
+            f"Scene needs at least {final:.1f}s, over the {budget:.0f}s budget for quality '{quality}'", report)
+    if not edits:
+        return code, report
+    return _apply_edits(code, edits), report
+
+
+def _apply_edits(code: str, edits: List[Tuple[TimedCall, float]]) -> str:
+    data = code.encode("utf-8")
+    starts = _offsets(code)
+
+    def pos(lineno, col):
+        return starts[lineno - 1] + col
+
+    patches = []  # (start, end, replacement bytes)
+    for t, target in edits:
+        node = t.bound_node or t.value_node
+        if node is not None:
+            if t.value is None and t.bound_node is None:
+                source = data[pos(node.lineno, node.col_offset):pos(node.end_lineno, node.end_col_offset)]
+                replacement = f"min({source.decode('utf-8')}, {_fmt(target)})"
+            else:
+                replacement = _fmt(target)
+            patches.append((pos(node.lineno, node.col_offset), pos(node.end_lineno, node.end_col_offset),
+                            replacement.encode("utf-8")))
+        else:
+            # No explicit duration: add one just before the closing parenthesis
+            close = pos(t.call.end_lineno, t.call.end_col_offset) - 1
+            trailing_comma = data[:close].rstrip().endswith(b",")
+            has_args = bool(t.call.args or t.call.keywords) and not trailing_comma
+            keyword = "run_time" if t.kind == "play" else "duration"
+            addition = f"{', ' if has_args else ''}{keyword}={_fmt(target)}"
+            patches.append((close, close, addition.encode("utf-8")))
+
+    for start, end, replacement in sorted(patches, key=lambda p: p[0], reverse=True):
+        data = data[:start] + replacement + data[end:]
+    return data.decode("utf-8")
@@ -3,9 +3,24 @@ from .base_template import BaseTemplate
 
 
 class EquationTransformScene(BaseTemplate):
-    def __init__(self, steps, explanation, **kwargs):
-        self.steps = steps
-        self.explanation = explanation
+    """
+    Step-by-step equation scene.
+
+    ``steps`` is either a list of plain strings, or (from ``math.equations``)
+    a list of dicts with ``tex`` (LaTeX parts) and ``note``. Dict steps morph
+    into each other with TransformMatchingTex, so unchanged terms stay put.
+    Generated scenes subclass this and set ``steps``/``explanation`` as class
+    attributes, so manim can render them without constructor arguments.
+    """
+
+    steps = []
+    explanation = ""
+
+    def __init__(self, steps=None, explanation=None, **kwargs):
+        if steps is not None:
+            self.steps = steps
+        if explanation is not None:
+            self.explanation = explanation
         super().__init__(**kwargs)
 
     def generate_content(self):
@@ -18,6 +33,10 @@ class EquationTransformScene(BaseTemplate):
         # Ensure we have an iterable list of steps
         steps = list(self.steps or [])
 
+        if steps and all(isinstance(step, dict) for step in steps):
+            self.transform_steps(steps)
+            return
+
         # Fallback: if no steps but an explanation exists, show the explanation as a single step
         if not steps and self.explanation:
             steps = [self.explanation]
@@ -29,3 +48,27 @@ class EquationTransformScene(BaseTemplate):
 
         # Single short final pause to avoid abrupt ending
         self.wait(0.5)
+
+    def step_note(self, step):
+        if not step.get("note"):
+            return VGroup()
+        return Text(step["note"], font_size=28, color=DARK_GRAY).to_edge(DOWN, buff=1)
+
+    def transform_steps(self, steps):
+        """One equation on screen, morphed step to step, with the step's note underneath."""
+        equation = MathTex(*steps[0]["tex"], color=BLACK, font_size=56)
+        note = self.step_note(steps[0])
+        self.play(Write(equation), FadeIn(note), run_time=1)
+        self.wait(0.5)
+
+        for step in steps[1:]:
+            target = MathTex(*step["tex"], color=BLACK, font_size=56)
+            next_note = self.step_note(step)
+            self.play(FadeOut(note), FadeIn(next_note), run_time=0.5)
+            self.play(TransformMatchingTex(equation, target), run_time=1)
+            equation, note = target, next_note
+            self.wait(0.5)
+
+        box = SurroundingRectangle(equation, color=BLUE, buff=0.2)
+        self.play(Create(box), run_time=0.5)
+        self.wait(0.5)
@@ -0,0 +1,453 @@
+"""
+Template parameters parsed locally from the concept text.
+
+"graph x^2 - 4x + 3 from -1 to 5" carries everything a template needs: a
+function, its coefficients and a range. ``extract_params`` pulls those out
+without an LLM call:
+
+    expression    Python source of f(x), e.g. "x**2 - 4*x + 3" (whitelisted AST; see to_numpy)
+    latex         LaTeX for the label, e.g. "x^{2} - 4 x + 3"
+    coefficients  [a, b, c] when f is a polynomial of degree <= 2
+    x_range       [lo, hi] from "from a to b" / "between a and b" / "on [a, b]"
+    y_range       [lo, hi] sampled from f over x_range
+    domain        sub-intervals of x_range where f is finite and within y_range
+    point         x0 from "at x = 2" / "at 2"
+    matrix        [[...], ...] from "[[2, 1], [1, 3]]" or "[2 1; 1 3]"
+    vector        [...] from a second bracketed group
+
+``params_key`` gives a short stable signature so caches keyed by concept
+never serve one parameterization's video for another.
+"""
+
+import ast
+import copy
+import hashlib
+import json
+import math
+import re
+from typing import Callable, List, Optional
+
+DEFAULT_X_RANGE = [-4.0, 4.0]
+MAX_ABS_VALUE = 1e6
+# largest constant exponent (in absolute value) an expression may use; x^10 at x = 4 is already ~1e6
+MAX_EXPONENT = 10
+
+# name in the concept -> (python name in the scene (numpy), math-module function, LaTeX)
+FUNCTIONS = {
+    "sin": ("np.sin", math.sin, r"\sin"),
+    "cos": ("np.cos", math.cos, r"\cos"),
+    "tan": ("np.tan", math.tan, r"\tan"),
+    "exp": ("np.exp", math.exp, r"\exp"),
+    "log": ("np.log", math.log, r"\ln"),
+    "ln": ("np.log", math.log, r"\ln"),
+    "sqrt": ("np.sqrt", math.sqrt, r"\sqrt"),
+    "abs": ("np.abs", abs, None),
+}
+CONSTANTS = {"pi": ("PI", math.pi, r"\pi"), "e": ("np.e", math.e, "e")}
+
+_TOKEN_RE = re.compile(r"\s*(\d+(?:\.\d+)?|[a-z]+|\*\*|[\^+\-*/()])")
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_RANGE_RES = [
+    re.compile(rf"\bfrom\s+(?:x\s*=\s*)?({_NUMBER})\s+to\s+(?:x\s*=\s*)?({_NUMBER})"),
+    re.compile(rf"\bbetween\s+({_NUMBER})\s+and\s+({_NUMBER})"),
+    re.compile(rf"\b(?:on|over|in|x\s+in)\s*[\[(]\s*({_NUMBER})\s*,\s*({_NUMBER})\s*[\])]"),
+]
+_POINT_RE = re.compile(rf"\bat\s+(?:x\s*=\s*)?({_NUMBER})")
+_NESTED_MATRIX_RE = re.compile(r"\[\s*(\[[^\[\]]*\](?:\s*,?\s*\[[^\[\]]*\])*)\s*\]")
+_FLAT_BRACKET_RE = re.compile(r"[\[(]([-\d.,;\s]+)[\])]")
+
+
+def _call_parentheses(tokens: List[str]) -> List[str]:
+    """Parenthesize bare function arguments: "sin x" -> "sin ( x )", "cos 2x" -> "cos ( 2 x )"."""
+    out, i = [], 0
+    while i < len(tokens):
+        token = tokens[i]
+        out.append(token)
+        i += 1
+        if token in FUNCTIONS and i < len(tokens) and tokens[i] != "(":
+            argument = []
+            if tokens[i][0].isdigit():
+                argument.append(tokens[i])
+                i += 1
+            if i < len(tokens) and (tokens[i] == "x" or tokens[i] in CONSTANTS):
+                argument.append(tokens[i])
+                i += 1
+            out.extend(["("] + argument + [")"])
+    return out
+
+
+def _implicit_multiplication(tokens: List[str]) -> List[str]:
+    """Insert '*' for 4x, 2sin(x), x(x+1), (x+1)(x-1), 3pi."""
+    out = []
+    tokens = _call_parentheses(tokens)
+    for token in tokens:
+        if out:
+            prev = out[-1]
+            prev_operand = prev == ")" or prev == "x" or prev in CONSTANTS or prev[0].isdigit()
+            starts_operand = token == "(" or token == "x" or token in CONSTANTS or token in FUNCTIONS \
+                or token[0].isdigit()
+            if prev_operand and starts_operand:
+                out.append("*")
+        out.append(token)
+    return out
+
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+                  ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+
+def _validate(tree: ast.Expression) -> bool:
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            return False
+        if isinstance(node, ast.Name) and node.id != "x" and node.id not in FUNCTIONS and node.id not in CONSTANTS:
+            return False
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                           or len(node.args) != 1 or node.keywords):
+            return False
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            return False
+    for node in ast.walk(tree):
+        # "x^9^9" would be evaluated with exact ints in the scene: constant exponents must be small
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow) \
+                and not any(isinstance(n, ast.Name) and n.id == "x" for n in ast.walk(node.right)):
+            exponent = _safe_eval(compile_function(ast.Expression(node.right)), 0.0)
+            if exponent is None or abs(exponent) > MAX_EXPONENT:
+                return False
+    return any(isinstance(n, ast.Name) and n.id == "x" for n in ast.walk(tree))
+
+
+def _candidate_spans(text: str) -> List[List[str]]:
+    """Maximal runs of math tokens (numbers, x, functions, constants, operators)."""
+    spans, current, pos = [], [], 0
+    vocabulary = set(FUNCTIONS) | set(CONSTANTS) | {"x"}
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            if current:
+                spans.append(current)
+            current = []
+            pos += 1
+            continue
+        token = match.group(1)
+        if token.isalpha() and token not in vocabulary:
+            if current:
+                spans.append(current)
+            current = []
+        else:
+            current.append(token)
+        pos = match.end()
+    if current:
+        spans.append(current)
+    return spans
+
+
+def _trim(tokens: List[str]) -> List[str]:
+    """Drop dangling operators and unbalanced parentheses at the span edges."""
+    while tokens and tokens[-1] in "+-*/^(":
+        tokens = tokens[:-1]
+    while tokens and tokens[0] in "+*/^)":
+        tokens = tokens[1:]
+    depth = 0
+    for i, token in enumerate(tokens):
+        depth += (token == "(") - (token == ")")
+        if depth < 0:
+            return tokens[:i]
+    return tokens + [")"] * depth
+
+
+def parse_expression(text: str) -> Optional[ast.Expression]:
+    """The longest well-formed f(x) expression in ``text``, as a validated AST."""
+    best = None
+    for span in _candidate_spans(text.casefold()):
+        span = _trim(span)
+        if "x" not in span or len(span) < 2:  # a lone "x" is a letter in prose, not a function
+            continue
+        source = " ".join(_implicit_multiplication(span)).replace("^", "**")
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError:
+            continue
+        if _validate(tree) and (best is None or len(span) > best[0]):
+            best = (len(span), tree)
+    return best[1] if best else None
+
+
+class _Emitter(ast.NodeVisitor):
+    """Render a validated expression as numpy source or LaTeX."""
+
+    _PRECEDENCE = {ast.Add: 1, ast.Sub: 1, ast.Mult: 2, ast.Div: 2, ast.Pow: 4}
+
+    def __init__(self, mode: str):
+        self.mode = mode  # "plain" (math names), "numpy" (scene code) or "latex"
+        self.latex = mode == "latex"
+
+    def emit(self, node) -> str:
+        return self.visit(node)
+
+    def _prec(self, node) -> int:
+        if isinstance(node, ast.BinOp):
+            return self._PRECEDENCE[type(node.op)]
+        if isinstance(node, ast.UnaryOp):
+            return 3
+        return 5
+
+    def _wrap(self, node, min_prec) -> str:
+        text = self.visit(node)
+        if self._prec(node) < min_prec:
+            return rf"\left({text}\right)" if self.latex else f"({text})"
+        return text
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Constant(self, node):
+        value = node.value
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    def visit_Name(self, node):
+        if node.id in CONSTANTS and self.mode != "plain":
+            return CONSTANTS[node.id][2] if self.latex else CONSTANTS[node.id][0]
+        return node.id
+
+    def visit_UnaryOp(self, node):
+        sign = "-" if isinstance(node.op, ast.USub) else "+"
+        return sign + self._wrap(node.operand, 3)
+
+    def visit_Call(self, node):
+        name = node.func.id
+        arg = self.visit(node.args[0])
+        if self.mode == "plain":
+            return f"{name}({arg})"
+        if self.mode == "numpy":
+            return f"{FUNCTIONS[name][0]}({arg})"
+        if name == "sqrt":
+            return rf"\sqrt{{{arg}}}"
+        if name == "abs":
+            return rf"\left|{arg}\right|"
+        return rf"{FUNCTIONS[name][2]}\left({arg}\right)"
+
+    def visit_BinOp(self, node):
+        prec = self._PRECEDENCE[type(node.op)]
+        if isinstance(node.op, ast.Pow):
+            base = self._wrap(node.left, 5)
+            exponent = self.visit(node.right) if self.latex else self._wrap(node.right, 4)
+            return f"{base}^{{{exponent}}}" if self.latex else f"{base}**{exponent}"
+        left = self._wrap(node.left, prec)
+        right = self._wrap(node.right, prec + (not isinstance(node.op, (ast.Add, ast.Mult))))
+        if isinstance(node.op, ast.Div) and self.latex:
+            return rf"\frac{{{self.visit(node.left)}}}{{{self.visit(node.right)}}}"
+        if isinstance(node.op, ast.Mult):
+            if self.latex:
+                return f"{left} {right}" if not right[:1].isdigit() else rf"{left} \cdot {right}"
+            return f"{left}*{right}"
+        symbol = {ast.Add: "+", ast.Sub: "-", ast.Div: "/"}[type(node.op)]
+        return f"{left} {symbol} {right}"
+
+
+def expression_tree(expression: str) -> ast.Expression:
+    """
+    Parse and validate a stored ``expression`` parameter.
+
+    Raises:
+        ValueError: If it is not a whitelisted f(x) expression.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {expression}") from e
+    if not _validate(tree):
+        raise ValueError(f"Unsupported expression: {expression}")
+    return tree
+
+
+def to_plain(tree: ast.Expression) -> str:
+    return _Emitter("plain").emit(tree)
+
+
+def to_numpy(expression: str) -> str:
+    """Scene-code source (``np.sin``, ``PI``) for a stored expression."""
+    return _Emitter("numpy").emit(expression_tree(expression))
+
+
+def to_latex(tree: ast.Expression) -> str:
+    return _Emitter("latex").emit(tree)
+
+
+class _FloatConstants(ast.NodeTransformer):
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+def compile_function(tree) -> Callable[[float], float]:
+    """A math-module callable for a validated expression tree or stored expression."""
+    if isinstance(tree, str):
+        tree = expression_tree(tree)
+    namespace = {name: spec[1] for name, spec in FUNCTIONS.items()}
+    namespace.update({name: spec[1] for name, spec in CONSTANTS.items()})
+    # float constants, so an oversized power raises OverflowError instead of building a huge int
+    tree = ast.fix_missing_locations(_FloatConstants().visit(copy.deepcopy(tree)))
+    code = compile(tree, "<expression>", "eval")
+    return lambda x: eval(code, {"__builtins__": {}}, {**namespace, "x": float(x)})
+
+
+def _safe_eval(f, x) -> Optional[float]:
+    try:
+        y = f(x)
+    except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+        return None
+    if isinstance(y, complex) or not math.isfinite(y) or abs(y) > MAX_ABS_VALUE:
+        return None
+    return float(y)
+
+
+def quadratic_coefficients(f) -> Optional[List[float]]:
+    """[a, b, c] if f is a polynomial of degree <= 2, else None."""
+    values = [_safe_eval(f, x) for x in (-1.0, 0.0, 1.0, 2.0, -3.0)]
+    if any(v is None for v in values):
+        return None
+    y_m1, c, y_1, y_2, y_m3 = values
+    a = (y_1 + y_m1) / 2 - c
+    b = (y_1 - y_m1) / 2
+    for x, y in ((2.0, y_2), (-3.0, y_m3)):
+        if abs(a * x * x + b * x + c - y) > 1e-6 * max(1.0, abs(y)):
+            return None
+    return [round(a, 6), round(b, 6), round(c, 6)]
+
+
+def nice_step(span: float, ticks: int = 8) -> float:
+    """A 1/2/5 x 10^k tick step giving roughly ``ticks`` ticks over ``span``."""
+    if span <= 0:
+        return 1.0
+    raw = span / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 5, 10):
+        if raw <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+def sample_y_range(f, x_range: List[float], samples: int = 101) -> List[float]:
+    lo, hi = x_range
+    ys = [y for y in (_safe_eval(f, lo + (hi - lo) * i / (samples - 1)) for i in range(samples)) if y is not None]
+    if not ys:
+        return [-1.0, 1.0]
+    y_min, y_max = min(min(ys), 0.0), max(max(ys), 0.0)
+    pad = 0.1 * (y_max - y_min) or 1.0
+    return [round(y_min - pad, 3), round(y_max + pad, 3)]
+
+
+def defined_intervals(f, x_range: List[float], y_range: Optional[List[float]] = None,
+                      samples: int = 201) -> List[List[float]]:
+    """Sub-intervals of ``x_range`` where f is finite and inside ``y_range`` (split at poles and domain edges)."""
+    lo, hi = x_range
+    intervals, start, last = [], None, None
+    for i in range(samples):
+        x = lo + (hi - lo) * i / (samples - 1)
+        y = _safe_eval(f, x)
+        if y is None or (y_range and not y_range[0] <= y <= y_range[1]):
+            if start is not None and last > start:
+                intervals.append([round(start, 4), round(last, 4)])
+            start = None
+        else:
+            if start is None:
+                start = x
+            last = x
+    if start is not None and last > start:
+        intervals.append([round(start, 4), round(last, 4)])
+    return intervals
+
+
+def _parse_numbers(text: str) -> List[float]:
+    return [float(n) for n in re.findall(_NUMBER, text)]
+
+
+def _parse_matrices(text: str):
+    matrix, vector = None, None
+    nested = _NESTED_MATRIX_RE.search(text)
+    if nested:
+        rows = [_parse_numbers(r) for r in re.findall(r"\[([^\[\]]*)\]", nested.group(1))]
+        if rows and all(rows) and len({len(r) for r in rows}) == 1:
+            matrix = rows
+        text = text[:nested.start()] + text[nested.end():]
+    for group in _FLAT_BRACKET_RE.findall(text):
+        if ";" in group and matrix is None:
+            rows = [_parse_numbers(r) for r in group.split(";")]
+            if rows and all(rows) and len({len(r) for r in rows}) == 1:
+                matrix = rows
+        elif matrix is not None and vector is None:
+            values = _parse_numbers(group)
+            if values:
+                vector = values
+    return matrix, vector
+
+
+def extract_params(concept: str) -> dict:
+    """
+    Structured template parameters found in ``concept`` (empty if none).
+
+    Returns:
+        dict: Any of expression, latex, coefficients, x_range, bounds, y_range, domain, point, matrix,
+        vector.
+    """
+    text = concept.casefold()
+    params = {}
+
+    matrix, vector = _parse_matrices(text)
+    if matrix:
+        params["matrix"] = matrix
+        if vector and len(vector) == len(matrix[0]):
+            params["vector"] = vector
+        return params
+
+    x_range = None
+    for pattern in _RANGE_RES:
+        match = pattern.search(text)
+        if match:
+            lo, hi = sorted(float(v) for v in match.groups())
+            if hi > lo:
+                x_range = [lo, hi]
+            text = text[:match.start()] + " " + text[match.end():]
+            break
+    point = _POINT_RE.search(text)
+    if point:
+        params["point"] = float(point.group(1))
+        text = text[:point.start()] + " " + text[point.end():]
+
+    # "y =" / "f(x) =" only name the function
+    text = re.sub(r"\b(?:y|f\s*\(\s*x\s*\))\s*=", " ", text)
+    tree = parse_expression(text)
+    if tree is None:
+        if x_range:
+            params["x_range"] = x_range
+        return params
+
+    f = compile_function(tree)
+    if x_range is not None:
+        params["bounds"] = x_range  # given explicitly, e.g. integration limits
+    params["expression"] = to_plain(tree)
+    params["latex"] = to_latex(tree)
+    coefficients = quadratic_coefficients(f)
+    if coefficients is not None:
+        params["coefficients"] = coefficients
+    if x_range is None:
+        x_range = list(DEFAULT_X_RANGE)
+        if coefficients and coefficients[0]:
+            # Center quadratics on their vertex
+            vertex = -coefficients[1] / (2 * coefficients[0])
+            x_range = [round(vertex - 4, 3), round(vertex + 4, 3)]
+    params["x_range"] = x_range
+    params["y_range"] = sample_y_range(f, x_range)
+    params["domain"] = defined_intervals(f, x_range, params["y_range"])
+    return params
+
+
+def params_key(params: Optional[dict]) -> Optional[str]:
+    """Short stable signature of the parameters that change the rendered scene."""
+    if not params:
+        return None
+    relevant = {k: params[k] for k in ("expression", "x_range", "point", "matrix", "vector") if k in params}
+    if not relevant:
+        return None
+    canonical = json.dumps(relevant, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
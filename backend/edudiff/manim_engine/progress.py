@@ -0,0 +1,117 @@
+"""
+Render progress from manim's console output.
+
+manim draws a tqdm bar per animation on stderr,
+
+    Animation 3: Write(Text('f(x)')):  47%|####7     | 14/30 [00:01<00:01, 12.3it/s]
+
+updated in place with carriage returns, logs ``Animation 3 : Using cached data``
+for animations it skips, and ``Combining to Movie file`` / ``File ready at``
+at the end. ``RenderProgress`` is fed the output as it arrives and keeps the
+current animation, its frames, and an overall fraction and ETA. The number of
+animations comes from the scene's timeline (``count_animations``); calls
+inside loops or branches make it an estimate, so it only ever grows to cover
+what manim reports.
+"""
+
+import re
+import time
+from typing import Dict, Optional
+
+from .scene_ir import parse_scene
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_LINE_SPLIT_RE = re.compile(r"[\r\n]")
+_BAR_RE = re.compile(r"Animation (\d+)\s*:.*?(\d+)%\|[^|]*\|\s*(\d+)/(\d+)")
+_CACHED_RE = re.compile(r"Animation (\d+)\s*:\s*Using cached data")
+_COMBINING_RE = re.compile(r"Combining to Movie file")
+_READY_RE = re.compile(r"File\s+ready\s+at")
+
+# Fraction of the render after which the ETA is extrapolated (earlier guesses are noise)
+MIN_ETA_FRACTION = 0.05
+
+
+def count_animations(code: str) -> Optional[int]:
+    """Number of ``play``/``wait`` calls manim will run for ``code``, or None if it does not parse."""
+    try:
+        return sum(t.multiplier for t in parse_scene(code).timeline) or None
+    except SyntaxError:
+        return None
+
+
+class RenderProgress:
+    """Incremental parser of one render's output."""
+
+    def __init__(self, animations: Optional[int] = None):
+        self.animations = animations
+        self.animation = -1       # index of the current animation, as manim numbers them
+        self.frames = 0           # frames of the current animation written
+        self.frames_total = 0
+        self.phase = "starting"   # starting, rendering, combining, done
+        self.started_at = time.monotonic()
+        self._partial: Dict[str, str] = {}  # unterminated line per stream
+
+    def feed(self, text: str, stream: str = "stderr") -> bool:
+        """
+        Consume a chunk of output.
+
+        Args:
+            text: Output as read.
+            stream: Stream it was read from; each keeps its own unterminated line.
+
+        Returns:
+            bool: True if the progress changed.
+        """
+        lines = _LINE_SPLIT_RE.split(self._partial.get(stream, "") + text)
+        self._partial[stream] = lines.pop()
+        state = self._state()
+        for line in lines:
+            self._parse(_ANSI_RE.sub("", line))
+        return self._state() != state
+
+    def _state(self) -> tuple:
+        return self.animation, self.frames, self.phase
+
+    def _parse(self, line: str):
+        bar = _BAR_RE.search(line)
+        if bar:
+            index, frames, total = int(bar.group(1)), int(bar.group(3)), int(bar.group(4))
+            if index >= self.animation:
+                self.animation, self.frames, self.frames_total = index, frames, total
+                self.phase = "rendering"
+            return
+        cached = _CACHED_RE.search(line)
+        if cached and int(cached.group(1)) >= self.animation:
+            self.animation, self.frames, self.frames_total = int(cached.group(1)), 1, 1
+            self.phase = "rendering"
+        elif _COMBINING_RE.search(line):
+            self.phase = "combining"
+        elif _READY_RE.search(line):
+            self.phase = "done"
+
+    def fraction(self) -> float:
+        """Share of the render done, 0 to 1."""
+        if self.phase in ("combining", "done"):
+            return 1.0
+        if self.animation < 0:
+            return 0.0
+        total = max(self.animations or 0, self.animation + 1)
+        current = self.frames / self.frames_total if self.frames_total else 0.0
+        return min((self.animation + current) / total, 1.0)
+
+    def event(self) -> dict:
+        """The current progress as a job event."""
+        elapsed = time.monotonic() - self.started_at
+        fraction = self.fraction()
+        eta = elapsed * (1 - fraction) / fraction if fraction >= MIN_ETA_FRACTION else None
+        return {
+            "type": "progress",
+            "phase": self.phase,
+            "animation": self.animation + 1 if self.animation >= 0 else 0,
+            "animations": max(self.animations or 0, self.animation + 1) or None,
+            "frames": self.frames,
+            "frames_total": self.frames_total,
+            "fraction": round(fraction, 3),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
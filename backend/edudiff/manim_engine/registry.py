@@ -0,0 +1,214 @@
+"""
+Template registry and keyword matcher.
+
+Templates declare their keywords, tie-break priority, parameterized builder
+and metadata once, at import time, instead of inside ``select_template``.
+All keywords of all templates are compiled into one Aho-Corasick automaton,
+so matching a concept is a single pass over its text no matter how many
+templates are registered.
+
+Keywords match on word boundaries ("sine" does not fire inside "cosine",
+"ode" not inside "code") and tolerate a plural suffix ("derivatives").
+Keywords that begin or end with punctuation ("f'(x)", "x^2") are only
+bounded on their alphanumeric side.
+"""
+
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLURAL_SUFFIXES = ("s", "es")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TemplateSpec:
+    """One registered template and how to pick and build it."""
+
+    __slots__ = ("name", "generator", "keywords", "formula_keywords", "priority", "builder", "requires",
+                 "description", "order")
+
+    def __init__(self, name: str, generator: Optional[Callable[[], str]], keywords, priority: int = 0,
+                 formula_keywords=(), builder: Optional[Callable[[dict], Optional[str]]] = None,
+                 requires: Optional[str] = None, description: str = "", order: int = 0):
+        self.name = name
+        self.generator = generator
+        self.keywords = tuple(k.lower() for k in keywords)
+        self.formula_keywords = frozenset(k.lower() for k in formula_keywords)
+        self.priority = priority
+        self.builder = builder          # params -> code, used when ``requires`` is in the params
+        self.requires = requires
+        self.description = description
+        self.order = order
+
+    def __repr__(self):
+        return f"TemplateSpec({self.name!r}, keywords={len(self.keywords)}, priority={self.priority})"
+
+
+class TemplateMatch:
+    """A template and the keywords of it found in a concept."""
+
+    __slots__ = ("spec", "keywords")
+
+    def __init__(self, spec: TemplateSpec, keywords: set):
+        self.spec = spec
+        self.keywords = keywords
+
+    @property
+    def score(self) -> int:
+        return len(self.keywords)
+
+    def sort_key(self) -> Tuple[int, int, int]:
+        return (-self.score, -self.spec.priority, self.spec.order)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over a fixed set of lowercase keywords."""
+
+    def __init__(self, keywords):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for keyword in keywords:
+            self._insert(keyword)
+        self._link()
+
+    def _insert(self, keyword: str):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        if keyword not in self._out[state]:
+            self._out[state].append(keyword)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                if state:
+                    fail = self._fail[state]
+                    while fail and ch not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        """Yield (keyword, start, end) for every occurrence in ``text``, overlapping ones included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in out[state]:
+                yield keyword, i + 1 - len(keyword), i + 1
+
+
+def _bounded(text: str, keyword: str, start: int, end: int) -> bool:
+    """Whether the occurrence stands on word boundaries (allowing a plural suffix)."""
+    if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if not _is_word_char(keyword[-1]) or end == len(text) or not _is_word_char(text[end]):
+        return True
+    for suffix in PLURAL_SUFFIXES:
+        stop = end + len(suffix)
+        if text.startswith(suffix, end) and (stop == len(text) or not _is_word_char(text[stop])):
+            return True
+    return False
+
+
+class TemplateRegistry:
+    """Named templates plus the compiled keyword automaton used to select one."""
+
+    def __init__(self):
+        self._specs: Dict[str, TemplateSpec] = {}
+        self._owners: Dict[str, List[TemplateSpec]] = {}
+        self._automaton: Optional[KeywordAutomaton] = None
+
+    def register(self, name: str, generator: Optional[Callable[[], str]] = None, keywords=(), **options) -> TemplateSpec:
+        """
+        Add (or replace) a template.
+
+        Args:
+            name: Visualization type reported for the template.
+            generator: Fixed-scene generator, called without arguments.
+            keywords: Phrases that select the template; each distinct one found adds one to its score.
+            **options: priority, formula_keywords, builder, requires, description (see TemplateSpec).
+
+        Returns:
+            TemplateSpec: The registered spec.
+        """
+        previous = self._specs.get(name)
+        order = previous.order if previous else len(self._specs)
+        spec = TemplateSpec(name, generator, keywords, order=order, **options)
+        self._specs[name] = spec
+        self._automaton = None
+        return spec
+
+    def get(self, name: str) -> Optional[TemplateSpec]:
+        return self._specs.get(name)
+
+    def __iter__(self) -> Iterator[TemplateSpec]:
+        return iter(self._specs.values())
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def _compile(self) -> KeywordAutomaton:
+        if self._automaton is None:
+            self._owners = {}
+            for spec in self._specs.values():
+                for keyword in set(spec.keywords):
+                    self._owners.setdefault(keyword, []).append(spec)
+            self._automaton = KeywordAutomaton(self._owners)
+            logger.debug(f"Compiled template matcher: {len(self._specs)} templates, "
+                         f"{len(self._owners)} keywords, {self._automaton.states} states")
+        return self._automaton
+
+    def rank(self, concept: str, skip_formulas: bool = False) -> List[TemplateMatch]:
+        """
+        Templates with at least one keyword in ``concept``, best first.
+
+        Args:
+            concept: Concept text (matched case-insensitively).
+            skip_formulas: Ignore formula keywords ("x^2"), e.g. when the function was parsed.
+
+        Returns:
+            list: TemplateMatch objects ordered by score, then priority, then registration order.
+        """
+        text = concept.lower()
+        automaton = self._compile()
+        found: Dict[str, TemplateMatch] = {}
+        for keyword, start, end in automaton.iter_matches(text):
+            if not _bounded(text, keyword, start, end):
+                continue
+            for spec in self._owners[keyword]:
+                if skip_formulas and keyword in spec.formula_keywords:
+                    continue
+                match = found.get(spec.name)
+                if match is None:
+                    found[spec.name] = TemplateMatch(spec, {keyword})
+                else:
+                    match.keywords.add(keyword)
+        return sorted(found.values(), key=TemplateMatch.sort_key)
+
+    def match(self, concept: str, skip_formulas: bool = False) -> Optional[TemplateMatch]:
+        """The best matching template, or None."""
+        ranked = self.rank(concept, skip_formulas)
+        return ranked[0] if ranked else None
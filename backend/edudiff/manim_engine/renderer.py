@@ -3,9 +3,24 @@ import os
 import sys
 import logging
 
+from ..services.jobs import run_render_process
+from .progress import count_animations
+from ..services.scheduler import get_scheduler
+
 logger = logging.getLogger(__name__)
 
-def render_scene(scene_file, scene_name, output_dir, quality="l"):
+# Directory containing the edudiff package; scenes built on our scene classes import from it
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def render_env():
+    """Environment for manim subprocesses, with the edudiff package importable."""
+    env = os.environ.copy()
+    paths = [PACKAGE_ROOT] + [p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p]
+    env["PYTHONPATH"] = os.pathsep.join(dict.fromkeys(paths))
+    return env
+
+def render_scene(scene_file, scene_name, output_dir, quality="l", tenant="pipeline", lane="batch", cost=1.0,
+                 job=None):
     """
     Renders a specific Manim scene.
     
@@ -14,9 +29,17 @@ def render_scene(scene_file, scene_name, output_dir, quality="l"):
         scene_name (str): Name of the scene class.
         output_dir (str): Directory to save the output video.
         quality (str): Quality flag ('l', 'm', 'h', 'p', 'k'). Default 'l' (low) for speed.
+        tenant (str): Fairness key for the render scheduler.
+        lane (str): Scheduler lane, "interactive" or "batch".
+        cost (float): Estimated render cost (CPU seconds) for fair queuing.
+        job (RenderJob): Job whose cancellation stops the render and which receives its progress, if any.
     
     Returns:
         str: Path to the generated video file.
+
+    Raises:
+        SchedulerRejected: If the render scheduler refuses the render.
+        RenderCancelled: If ``job`` was cancelled.
     """
     
     # Ensure output directory exists
@@ -37,14 +60,22 @@ def render_scene(scene_file, scene_name, output_dir, quality="l"):
     
     logger.info(f"Running command: {' '.join(command)}")
     
+    animations = None
+    if job is not None:
+        with open(scene_file, "r", encoding="utf-8") as f:
+            animations = count_animations(f.read())
+    
     try:
-        result = subprocess.run(
-            command,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=300 # 5 minute timeout
-        )
+        with get_scheduler().slot(tenant, lane, cost=cost, cancelled=job.should_cancel if job else None):
+            # own process group, so a timeout or cancellation also stops manim's ffmpeg children
+            result = run_render_process(
+                command,
+                env=render_env(),
+                timeout=300, # 5 minute timeout
+                job=job,
+                animations=animations
+            )
+        result.check_returncode()
         logger.info("Render successful")
         
         # Manim default output path structure:
@@ -56,9 +87,12 @@ def render_scene(scene_file, scene_name, output_dir, quality="l"):
         # Note: Manim might change these folder names based on exact version and framerate settings.
         # But for standard settings:
         
-        # Let's search for the .mp4 file in the output_dir
+        # Let's search for the .mp4 file, starting with this scene file's own folder
+        # so a shared output_dir never returns another job's video
         video_path = None
-        for root, dirs, files in os.walk(output_dir):
+        scene_video_dir = os.path.join(output_dir, "videos", scene_file_name)
+        search_root = scene_video_dir if os.path.isdir(scene_video_dir) else output_dir
+        for root, dirs, files in os.walk(search_root):
             for file in files:
                 if file.endswith(".mp4") and scene_name in file:
                     video_path = os.path.join(root, file)
@@ -75,9 +109,9 @@ def render_scene(scene_file, scene_name, output_dir, quality="l"):
     except subprocess.CalledProcessError as e:
         logger.error(f"Render failed: {e.stderr}")
         raise RuntimeError(f"Manim render failed: {e.stderr}")
-    except subprocess.TimeoutExpired:
+    except subprocess.TimeoutExpired as e:
         logger.error("Render timed out")
-        raise RuntimeError("Manim render timed out")
+        raise RuntimeError("Manim render timed out") from e
     except FileNotFoundError:
         logger.error("Manim command not found. Ensure Manim is installed and in PATH.")
         raise RuntimeError("Manim command not found. Please ensure 'manim' is installed and available in your environment.")
@@ -0,0 +1,444 @@
+"""
+Error-signature repair cache for generated Manim code.
+
+LLM-written scenes keep failing in the same few ways: hallucinated keyword
+arguments, deprecated (pre-CE / manimgl) names, LaTeX passed to ``Text``.
+This module
+
+1. fingerprints a failure from the stderr/traceback that ``render_scene``,
+   ``/generate`` or the validator already capture,
+2. keeps a library of AST rewrite rules keyed by fingerprint kind (rules
+   patch the source spans they touch, so comments and formatting survive),
+3. applies fixes locally (milliseconds) instead of asking the LLM again, and
+4. records per (fingerprint, rule) success rates so fixes that keep working
+   are applied pre-emptively to new scenes before their first render.
+
+Configuration (environment):
+    REPAIR_STATS_PATH          JSON file with fix statistics (default: tmp/repair_stats.json)
+    REPAIR_PREEMPTIVE_MIN_RATE success rate at which a fix is applied before rendering (default: 0.8)
+    REPAIR_PREEMPTIVE_MIN_USES minimum recorded uses before that (default: 3)
+"""
+
+import ast
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .scene_ir import call_name
+
+logger = logging.getLogger(__name__)
+
+REPAIR_STATS_PATH = os.getenv("REPAIR_STATS_PATH", os.path.join("tmp", "repair_stats.json"))
+REPAIR_PREEMPTIVE_MIN_RATE = float(os.getenv("REPAIR_PREEMPTIVE_MIN_RATE", "0.8"))
+REPAIR_PREEMPTIVE_MIN_USES = int(os.getenv("REPAIR_PREEMPTIVE_MIN_USES", "3"))
+
+# Deprecated / non-CE names -> Manim Community replacements
+RENAMED_CLASSES = {
+    "ShowCreation": "Create",
+    "TextMobject": "Text",
+    "TexMobject": "MathTex",
+    "TexText": "Tex",
+    "ShowCreationThenDestruction": "ShowPassingFlash",
+    "ShowCreationThenFadeOut": "ShowPassingFlash",
+    "FadeInFrom": "FadeIn",
+    "FadeInFromDown": "FadeIn",
+    "FadeOutAndShift": "FadeOut",
+    "CircleIndicate": "Circumscribe",
+}
+RENAMED_METHODS = {
+    "get_graph": "plot",
+    "get_tangent_vector": "get_tangent_line",
+    "add_coordinate_labels": "add_coordinates",
+    "scale_in_place": "scale",
+    "rotate_in_place": "rotate",
+    "set_width": "scale_to_fit_width",
+    "set_height": "scale_to_fit_height",
+}
+
+# MathTex-only methods: calling one on a Text means the text was meant as LaTeX
+MATHTEX_METHODS = {"set_color_by_tex", "get_part_by_tex", "get_parts_by_tex", "index_of_part_by_tex",
+                   "set_color_by_tex_to_color_map", "tex_string"}
+
+LATEX_IN_TEXT_RE = re.compile(r"\\[a-zA-Z]+|[\^_]\{|\$[^$]+\$")
+
+
+# --- fingerprinting ------------------------------------------------------------
+
+_FINGERPRINT_PATTERNS = [
+    ("unexpected_kwarg",
+     re.compile(r"(?:(?P<callee>[\w.]+)\(\) )?got an unexpected keyword argument '(?P<arg>\w+)'")),
+    ("undefined_name", re.compile(r"NameError: name '(?P<name>\w+)' is not defined")),
+    ("missing_attribute",
+     re.compile(r"AttributeError: '(?P<type>\w+)' object has no attribute '(?P<attr>\w+)'")),
+    ("latex_error", re.compile(r"(?:LaTeX compilation error|latex error converting to dvi|"
+                               r"Your (?:LaTeX|TeX) (?:compilation|installation))", re.IGNORECASE)),
+    ("wait_zero", re.compile(r"(?:self\.)?wait\(\) has a duration of 0|"
+                             r"duration of 0 seconds|non-positive run_time", re.IGNORECASE)),
+]
+# Scene frames, in Python ('File "...", line 12, in construct') and rich ('scene.py:12 in construct') tracebacks
+_SCENE_FRAME_RE = re.compile(r"(?:line (\d+), in construct|\.py:(\d+) in construct)")
+
+
+def fingerprint_error(stderr: str) -> Optional[dict]:
+    """
+    Reduce a render/validation failure to a stable signature.
+
+    Returns:
+        dict: ``{"kind", "key", "detail", "lineno"}`` where ``key`` is the cache key
+        (kind plus the offending identifier, no line numbers or paths) and ``lineno``
+        the innermost scene line of the traceback (None if it shows none), or None.
+    """
+    if not stderr:
+        return None
+    frames = _SCENE_FRAME_RE.findall(stderr)
+    lineno = int(next(n for n in frames[-1] if n)) if frames else None
+    # Use the innermost (last) matching line of the traceback
+    for kind, pattern in _FINGERPRINT_PATTERNS:
+        matches = list(pattern.finditer(stderr))
+        if not matches:
+            continue
+        detail = {k: v for k, v in matches[-1].groupdict().items() if v}
+        if kind == "unexpected_kwarg" and "callee" in detail:
+            # "Scene.play()" -> "play"; "Mobject.__init__()" names a base class the
+            # scene never calls directly, so the kwarg alone is the signature
+            callee = detail.pop("callee").split(".")[-1]
+            if callee != "__init__":
+                detail["callee"] = callee
+        ident = ":".join(detail[k] for k in sorted(detail))
+        return {"kind": kind, "key": f"{kind}:{ident}" if ident else kind, "detail": detail, "lineno": lineno}
+
+    last = [l for l in stderr.strip().splitlines() if l.strip()]
+    if not last:
+        return None
+    exc = re.match(r"(\w+(?:Error|Exception))", last[-1].strip())
+    if exc:
+        return {"kind": "other", "key": f"other:{exc.group(1)}", "detail": {}, "lineno": lineno}
+    return None
+
+
+# --- rewrite rules -------------------------------------------------------------
+
+def _start(node) -> Tuple[int, int]:
+    return node.lineno, node.col_offset
+
+
+def _end(node) -> Tuple[int, int]:
+    return node.end_lineno, node.end_col_offset
+
+
+class _Rewriter(ast.NodeVisitor):
+    """
+    Base rule: visits the tree and collects source patches instead of changing it.
+
+    Patches are ((line, col), (end line, end col), replacement) in AST coordinates, applied
+    to the source text by ``_apply`` so comments and formatting elsewhere are kept.
+    """
+
+    def __init__(self):
+        self.patches = []
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.patches)
+
+    def replace(self, node, text: str):
+        self.patches.append((_start(node), _end(node), text))
+
+    def rename_attribute(self, node: ast.Attribute, attr: str):
+        # the attribute name ends the node: "obj . attr"
+        line, col = _end(node)
+        self.patches.append(((line, col - len(node.attr.encode("utf-8"))), (line, col), attr))
+
+    def drop_keywords(self, call: ast.Call, names) -> bool:
+        """Remove the keyword arguments in ``names`` from ``call``, with their separating commas."""
+        items = sorted(call.args + call.keywords, key=_start)
+        dropped = [i for i, item in enumerate(items) if isinstance(item, ast.keyword) and item.arg in names]
+        if not dropped:
+            return False
+        kept = [i for i in range(len(items)) if i not in dropped]
+        if not kept:
+            # everything goes, up to the closing parenthesis (and any trailing comma)
+            line, col = _end(call)
+            self.patches.append((_start(items[0]), (line, col - 1), ""))
+            return True
+        for i in dropped:
+            if i < kept[0]:
+                self.patches.append((_start(items[i]), _start(items[i + 1]), ""))
+            else:
+                self.patches.append((_end(items[i - 1]), _end(items[i]), ""))
+        return True
+
+
+class _DropKwarg(_Rewriter):
+    """Drop ``arg=`` from calls to ``callee``, or from the calls on line ``lineno`` when the callee is unknown."""
+
+    def __init__(self, arg: str, callee: Optional[str] = None, lineno: Optional[int] = None):
+        super().__init__()
+        self.arg = arg
+        self.callee = callee
+        self.lineno = lineno
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if self.callee is not None and call_name(node) != self.callee:
+            return
+        if self.callee is None and not node.lineno <= self.lineno <= node.end_lineno:
+            return
+        self.drop_keywords(node, {self.arg})
+
+
+class _RenameNames(_Rewriter):
+    def __init__(self, classes: Dict[str, str], methods: Dict[str, str]):
+        super().__init__()
+        self.classes = classes
+        self.methods = methods
+
+    def visit_Module(self, node):
+        # a scene that defines or imports one of the old names means its own
+        defined = set()
+        for n in ast.walk(node):
+            if isinstance(n, (ast.ClassDef, ast.FunctionDef)):
+                defined.add(n.name)
+            elif isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store):
+                defined.add(n.id)
+            elif isinstance(n, ast.alias):
+                defined.add((n.asname or n.name).split(".")[0])
+        self.classes = {k: v for k, v in self.classes.items() if k not in defined}
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node.id in self.classes:
+            self.replace(node, self.classes[node.id])
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if node.attr in self.methods:
+            self.rename_attribute(node, self.methods[node.attr])
+
+
+class _TextToMathTex(_Rewriter):
+    """Text("x^{2} + \\frac{1}{2}") -> MathTex(...): LaTeX markup rendered by Pango shows raw."""
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if (isinstance(node.func, ast.Name) and node.func.id == "Text" and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)
+                and LATEX_IN_TEXT_RE.search(node.args[0].value)):
+            self.replace(node.func, "MathTex")
+            if "$" in node.args[0].value:
+                self.replace(node.args[0], repr(node.args[0].value.replace("$", "")))
+            # Text-only options that MathTex rejects
+            self.drop_keywords(node, {"font", "slant", "weight", "t2c", "line_spacing"})
+
+
+class _MathTexToText(_Rewriter):
+    """MathTex("plain words") that fails LaTeX compilation -> Text(...)."""
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if (isinstance(node.func, ast.Name) and node.func.id in ("MathTex", "Tex") and node.args
+                and all(isinstance(a, ast.Constant) and isinstance(a.value, str) for a in node.args)):
+            joined = "".join(a.value for a in node.args)
+            if not LATEX_IN_TEXT_RE.search(joined) and re.search(r"[A-Za-z]{4,}\s+[A-Za-z]{2,}", joined):
+                self.replace(node.func, "Text")
+                if len(node.args) > 1:
+                    self.patches.append((_start(node.args[0]), _end(node.args[-1]), repr(joined)))
+                self.drop_keywords(node, {"tex_template", "substrings_to_isolate"})
+
+
+class _PositiveWaits(_Rewriter):
+    """self.wait(0) or a negative wait -> self.wait(1)."""
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if (isinstance(node.func, ast.Attribute) and node.func.attr == "wait"
+                and isinstance(node.func.value, ast.Name) and node.func.value.id == "self"):
+            if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, (int, float)) \
+                    and node.args[0].value <= 0:
+                self.replace(node.args[0], "1")
+
+
+def _rules_for(fingerprint: dict) -> List[Tuple[str, Callable[[], _Rewriter]]]:
+    """Candidate rewrite rules for a fingerprint, most specific first."""
+    kind, detail = fingerprint["kind"], fingerprint.get("detail", {})
+    if kind == "unexpected_kwarg":
+        arg, callee, lineno = detail.get("arg"), detail.get("callee"), fingerprint.get("lineno")
+        if callee:
+            return [(f"drop_kwarg:{callee}.{arg}", lambda: _DropKwarg(arg, callee))]
+        if lineno:
+            # a base-class __init__ rejected it: only the call on the failing line is known
+            return [(f"drop_kwarg:line.{arg}", lambda: _DropKwarg(arg, lineno=lineno))]
+        return []
+    if kind == "undefined_name" and detail.get("name") in RENAMED_CLASSES:
+        name = detail["name"]
+        return [(f"rename:{name}", lambda: _RenameNames({name: RENAMED_CLASSES[name]}, {}))]
+    if kind == "missing_attribute" and detail.get("type") == "Text" and detail.get("attr") in MATHTEX_METHODS:
+        return [("text_to_mathtex", _TextToMathTex)]
+    if kind == "missing_attribute" and detail.get("attr") in RENAMED_METHODS:
+        attr = detail["attr"]
+        return [(f"rename_method:{attr}", lambda: _RenameNames({}, {attr: RENAMED_METHODS[attr]}))]
+    if kind == "latex_error":
+        return [("mathtex_to_text", _MathTexToText)]
+    if kind == "wait_zero":
+        return [("positive_waits", _PositiveWaits)]
+    return []
+
+
+# Fixes applied before the first render: they only touch code that cannot run in
+# Manim Community (removed class names, non-positive waits). Rewrites of code that
+# runs (method renames, Text -> MathTex) wait for the error that calls for them.
+STATIC_RULES = [
+    ("rename_removed_classes", lambda: _RenameNames(RENAMED_CLASSES, {})),
+    ("positive_waits", _PositiveWaits),
+]
+
+
+def _apply(code: str, factory: Callable[[], _Rewriter]) -> Optional[str]:
+    """Run a rule over ``code`` and patch the source spans it touched; None if nothing changed."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    rewriter = factory()
+    rewriter.visit(tree)
+    if not rewriter.changed:
+        return None
+
+    data = code.encode("utf-8")
+    starts, total = [], 0
+    for line in code.splitlines(keepends=True):
+        starts.append(total)
+        total += len(line.encode("utf-8"))
+
+    def pos(point):
+        return starts[point[0] - 1] + point[1]
+
+    # A patch inside another (a renamed name in a dropped keyword) is covered by the outer one
+    patches, covered_to = [], 0
+    for start, end, text in sorted(((pos(a), pos(b), t) for a, b, t in rewriter.patches),
+                                   key=lambda p: (p[0], -p[1])):
+        if start >= covered_to:
+            patches.append((start, end, text))
+            covered_to = end
+    # Last first, so earlier offsets stay valid
+    for start, end, text in reversed(patches):
+        data = data[:start] + text.encode("utf-8") + data[end:]
+    fixed = data.decode("utf-8")
+    try:
+        ast.parse(fixed)
+    except SyntaxError:
+        logger.warning("Repair produced invalid source; discarding it")
+        return None
+    return fixed
+
+
+# --- statistics ----------------------------------------------------------------
+
+class RepairCache:
+    """Fingerprint -> rule statistics, persisted as JSON."""
+
+    def __init__(self, path: str = REPAIR_STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.stats = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _rate(self, entry: Dict[str, int]) -> float:
+        return entry["success"] / entry["attempts"] if entry["attempts"] else 0.0
+
+    def record(self, fingerprint_key: str, rule_id: str, success: bool):
+        with self._lock:
+            entry = self.stats.setdefault(fingerprint_key, {}).setdefault(rule_id, {"attempts": 0, "success": 0})
+            entry["attempts"] += 1
+            entry["success"] += int(success)
+            self._save()
+
+    def repair(self, code: str, stderr: str) -> Optional[Tuple[str, dict, str]]:
+        """
+        Try to fix ``code`` for the failure described by ``stderr``.
+
+        Returns:
+            tuple: (fixed_code, fingerprint, rule_id), or None if no rule applies.
+            Call ``record`` with the outcome of the next render.
+        """
+        fp = fingerprint_error(stderr)
+        if fp is None:
+            return None
+        candidates = _rules_for(fp)
+        known = self.stats.get(fp["key"], {})
+        # Best historical success rate first; untried rules keep library order
+        candidates.sort(key=lambda r: -self._rate(known[r[0]]) if r[0] in known else 0.0)
+        for rule_id, factory in candidates:
+            if rule_id in known and known[rule_id]["attempts"] >= REPAIR_PREEMPTIVE_MIN_USES \
+                    and self._rate(known[rule_id]) == 0.0:
+                continue
+            fixed = _apply(code, factory)
+            if fixed is not None:
+                logger.info(f"Repair rule '{rule_id}' applied for {fp['key']}")
+                return fixed, fp, rule_id
+        logger.info(f"No repair rule applies for {fp['key']}")
+        return None
+
+    def preemptive_fixes(self, code: str) -> Tuple[str, List[str]]:
+        """
+        Apply static fixes plus every learned fix whose success rate is proven.
+
+        Returns:
+            tuple: (code, list of applied rule ids)
+        """
+        applied = []
+        rules = list(STATIC_RULES)
+        with self._lock:
+            for fp_key, rules_stats in self.stats.items():
+                kind, _, ident = fp_key.partition(":")
+                for rule_id, entry in rules_stats.items():
+                    if entry["attempts"] >= REPAIR_PREEMPTIVE_MIN_USES and self._rate(entry) >= REPAIR_PREEMPTIVE_MIN_RATE:
+                        detail = _detail_from_key(kind, ident)
+                        for candidate_id, factory in _rules_for({"kind": kind, "detail": detail}):
+                            if candidate_id == rule_id:
+                                rules.append((rule_id, factory))
+        for rule_id, factory in rules:
+            fixed = _apply(code, factory)
+            if fixed is not None:
+                code = fixed
+                applied.append(rule_id)
+        if applied:
+            logger.info(f"Pre-emptive repairs applied: {applied}")
+        return code, applied
+
+
+def _detail_from_key(kind: str, ident: str) -> dict:
+    """Invert the ``key`` built by ``fingerprint_error`` (detail keys are joined in sorted order)."""
+    parts = ident.split(":") if ident else []
+    names = {
+        "unexpected_kwarg": ["arg", "callee"],
+        "undefined_name": ["name"],
+        "missing_attribute": ["attr", "type"],
+    }.get(kind, [])
+    if kind == "unexpected_kwarg" and len(parts) == 1:
+        return {"arg": parts[0]}
+    return dict(zip(names, parts))
+
+
+_cache = None
+
+
+def get_repair_cache() -> RepairCache:
+    global _cache
+    if _cache is None:
+        _cache = RepairCache()
+    return _cache
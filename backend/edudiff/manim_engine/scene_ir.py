@@ -0,0 +1,419 @@
+"""
+Parsed representation of a generated scene, shared by the pipeline stages.
+
+Audio injection, validation, the narration summary, the duration budget and
+the cost estimate all need the same facts about a scene: its class and base
+classes, the ordered ``self.play``/``self.add`` calls with their line spans,
+the timeline of run times and waits, and the TeX it compiles. ``parse_scene``
+parses the source once and memoizes the result by source text, so every stage
+of a job reuses one tree instead of re-parsing.
+
+The IR is read-only: stages that rewrite code (repair, duration budget,
+injection) produce new source text, which is parsed on its next use.
+"""
+
+import ast
+import functools
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+DEFAULT_RUN_TIME = 1.0  # manim's default for self.play and self.wait
+ANIMATION_METHODS = ("play", "add")
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex"}
+
+# Marks the wait that holds the screen for narration segment N when the narration
+# is muxed after rendering: a bare string statement, a no-op for manim
+NARRATION_MARKER = "narration {index}"
+_NARRATION_MARKER_RE = re.compile(r"^narration (\d+)$")
+
+
+def self_call(node: Optional[ast.AST], attrs=None) -> Optional[ast.Call]:
+    """The call in an ``self.<attr>(...)`` expression statement, optionally restricted to ``attrs``."""
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+        func = node.value.func
+        if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                and func.value.id == "self" and (attrs is None or func.attr in attrs)):
+            return node.value
+    return None
+
+
+def narration_marker(node: Optional[ast.AST]) -> Optional[int]:
+    """The segment index of a ``"narration N"`` marker statement, else None."""
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        match = _NARRATION_MARKER_RE.match(node.value.value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def call_name(node: ast.Call) -> Optional[str]:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+class AnimationCall:
+    """A top-level ``self.play``/``self.add`` in construct(), numbered as narration segments refer to it."""
+
+    __slots__ = ("index", "method", "call", "lineno", "end_lineno")
+
+    def __init__(self, index: int, method: str, stmt: ast.Expr):
+        self.index = index
+        self.method = method
+        self.call = stmt.value
+        self.lineno = stmt.lineno
+        self.end_lineno = stmt.end_lineno
+
+
+# Animations that run their sub-animations one after another / together
+SEQUENTIAL_ANIMATIONS = {"Succession"}
+GROUP_ANIMATIONS = {"AnimationGroup", "LaggedStart", "LaggedStartMap"}
+
+# Animations whose default run_time is not DEFAULT_RUN_TIME
+ANIMATION_RUN_TIMES = {"DrawBorderThenFill": 2.0, "FocusOn": 2.0, "Wiggle": 2.0, "ApplyWave": 2.0,
+                       "Homotopy": 3.0, "Rotating": 5.0}
+# Write/Unwrite take 1 s for fewer than WRITE_LONG_GLYPHS glyphs and 2 s otherwise;
+# AddTextLetterByLetter takes LETTER_SECONDS per glyph
+WRITE_ANIMATIONS = {"Write", "Unwrite"}
+LETTER_ANIMATIONS = {"AddTextLetterByLetter", "RemoveTextLetterByLetter"}
+WRITE_LONG_GLYPHS = 15
+LETTER_SECONDS = 0.1
+
+TEXT_CLASSES = {"Text", "MarkupText", "Paragraph"}
+GROUP_CLASSES = {"VGroup", "Group"}
+_TEX_COMMAND_RE = re.compile(r"\\[a-zA-Z]+")
+_MARKUP_TAG_RE = re.compile(r"<[^>]*>")
+_NOT_A_GLYPH_RE = re.compile(r"[\s{}^_&\\]")
+
+
+def _constant_number(node: Optional[ast.AST]) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return None
+
+
+def glyph_count(node: Optional[ast.AST], constants: Optional[Dict[str, ast.expr]] = None,
+                depth: int = 0) -> Optional[int]:
+    """
+    Glyphs a text mobject draws, from its literal strings.
+
+    TeX commands count as one glyph each (``\\frac`` draws its bar); braces,
+    script markers and whitespace count as none.
+
+    Returns:
+        int: The glyph count, or None if the mobject is not literal text.
+    """
+    constants = constants or {}
+    if isinstance(node, ast.Name) and node.id in constants and depth < 8:
+        return glyph_count(constants[node.id], constants, depth + 1)
+    if not isinstance(node, ast.Call):
+        return None
+    name = call_name(node)
+    if name in GROUP_CLASSES:
+        counts = [glyph_count(a, constants, depth + 1) for a in node.args]
+        return None if not counts or None in counts else sum(counts)
+    strings = [a.value for a in node.args if isinstance(a, ast.Constant) and isinstance(a.value, str)]
+    if not strings or len(strings) != len(node.args):
+        return None
+    text = "".join(strings)
+    if name in TEX_CLASSES:
+        text = _TEX_COMMAND_RE.sub("#", text)
+    elif name == "MarkupText":
+        text = _MARKUP_TAG_RE.sub("", text)
+    elif name not in TEXT_CLASSES:
+        return None
+    return len(_NOT_A_GLYPH_RE.sub("", text))
+
+
+def animation_seconds(node: ast.AST, constants: Optional[Dict[str, ast.expr]] = None) -> Optional[float]:
+    """
+    Run time of an animation argument of ``self.play`` when the play sets none.
+
+    Args:
+        node: The animation expression.
+        constants: Names assigned once in the scene, to find the text a ``Write`` draws.
+
+    Returns:
+        float: Its ``run_time=`` (for groups: of its parts), else manim's default for the
+        animation; None if computed at runtime.
+    """
+    if not isinstance(node, ast.Call):
+        return DEFAULT_RUN_TIME
+    for kw in node.keywords:
+        if kw.arg == "run_time":
+            return _constant_number(kw.value)
+    name = call_name(node)
+    if name in SEQUENTIAL_ANIMATIONS or name in GROUP_ANIMATIONS:
+        parts = [animation_seconds(a, constants) for a in node.args if not isinstance(a, ast.Starred)]
+        if not parts:
+            return DEFAULT_RUN_TIME
+        if any(p is None for p in parts):
+            return None
+        return sum(parts) if name in SEQUENTIAL_ANIMATIONS else max(parts)
+    if name in WRITE_ANIMATIONS or name in LETTER_ANIMATIONS:
+        glyphs = glyph_count(node.args[0], constants) if node.args else None
+        if glyphs is not None and name in LETTER_ANIMATIONS:
+            return round(max(glyphs, 1) * LETTER_SECONDS, 2)
+        if glyphs is not None and glyphs >= WRITE_LONG_GLYPHS:
+            return 2.0
+        return DEFAULT_RUN_TIME
+    return ANIMATION_RUN_TIMES.get(name, DEFAULT_RUN_TIME)
+
+
+class TimedCall:
+    """A ``self.play``/``self.wait`` call that contributes to the timeline."""
+
+    def __init__(self, call: ast.Call, kind: str, multiplier: int, narration: bool,
+                 segment: Optional[int] = None, lineno: Optional[int] = None,
+                 constants: Optional[Dict[str, ast.expr]] = None):
+        self.call = call
+        self.kind = kind
+        self.multiplier = multiplier  # iterations of enclosing constant loops
+        self.narration = narration    # a wait directly after self.add_sound or a narration marker
+        self.segment = segment        # narration segment index, from the marker
+        self.lineno = lineno or call.lineno  # where it runs in construct() (the call site, for helper methods)
+        self._constants = constants
+        self.value_node = self._duration_node()
+        if self.value_node is None:
+            self.value = self._animations_seconds() if kind == "play" else DEFAULT_RUN_TIME
+        else:
+            self.value = _constant_number(self.value_node)  # None: computed at runtime
+        self.bound_node = self._bound_node()
+
+    def _duration_node(self) -> Optional[ast.AST]:
+        name = "run_time" if self.kind == "play" else "duration"
+        for kw in self.call.keywords:
+            if kw.arg == name:
+                return kw.value
+        if self.kind == "wait" and self.call.args:
+            return self.call.args[0]
+        return None
+
+    def _animations_seconds(self) -> Optional[float]:
+        """Without a play-level run_time the play lasts as long as its longest animation."""
+        seconds = [animation_seconds(a, self._constants) for a in self.call.args if not isinstance(a, ast.Starred)]
+        if any(s is None for s in seconds):
+            return None
+        return max(seconds, default=DEFAULT_RUN_TIME)
+
+    def _bound_node(self) -> Optional[ast.Constant]:
+        """The numeric constant in ``min(expr, <const>)``, e.g. from an earlier budget pass."""
+        node = self.value_node
+        if self.value is None and isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id == "min" and not node.keywords:
+            for arg in node.args:
+                if _constant_number(arg) is not None:
+                    return arg
+        return None
+
+    @property
+    def upper_bound(self) -> Optional[float]:
+        """Known duration, or the bound of a runtime one; None if unbounded."""
+        if self.value is not None:
+            return self.value
+        if self.bound_node is not None:
+            return float(self.bound_node.value)
+        return None
+
+
+class _TimelineBuilder:
+    """
+    Collects the timed calls of construct() in execution order, following the
+    scene's own helper methods (``self.show_step(...)``) and constant loops.
+
+    Loops whose iteration count is not known from the source (``while``,
+    ``for i in range(n)`` with a computed n) and recursive helpers are recorded
+    in ``unbounded`` when they contain timed calls: their length cannot be planned.
+    """
+
+    def __init__(self, scene_class: Optional[ast.ClassDef]):
+        self.methods = {}
+        self.constants: Dict[str, ast.expr] = {}
+        if scene_class is not None:
+            self.methods = {n.name: n for n in scene_class.body if isinstance(n, ast.FunctionDef)}
+            assigned = Counter()
+            for node in ast.walk(scene_class):
+                if isinstance(node, ast.Assign):
+                    for target in node.targets:
+                        if isinstance(target, ast.Name):
+                            assigned[target.id] += 1
+                            self.constants[target.id] = node.value
+                elif isinstance(node, (ast.AugAssign, ast.AnnAssign)) and isinstance(node.target, ast.Name):
+                    assigned[node.target.id] += 2
+            # a name assigned more than once has no single value
+            self.constants = {k: v for k, v in self.constants.items() if assigned[k] == 1}
+        self.timeline: List[TimedCall] = []
+        self.unbounded: List[str] = []
+        self._stack: List[str] = []
+
+    def _count(self, node: ast.expr) -> Optional[int]:
+        """Items an iterable yields, if the source fixes it."""
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self._count(self.constants[node.id])
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return None if any(isinstance(e, ast.Starred) for e in node.elts) else len(node.elts)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name, args = node.func.id, node.args
+            if name == "range" and 1 <= len(args) <= 3:
+                values = [self._int(a) for a in args]
+                return None if None in values or values[-1] == 0 and len(values) == 3 else len(range(*values))
+            if name in ("enumerate", "reversed", "sorted", "list", "tuple") and len(args) == 1:
+                return self._count(args[0])
+            if name == "zip" and args:
+                counts = [c for c in (self._count(a) for a in args) if c is not None]
+                return min(counts) if counts else None
+        return None
+
+    def _int(self, node: ast.expr) -> Optional[int]:
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self._int(self.constants[node.id])
+        if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value = self._int(node.operand)
+            return None if value is None else -value
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len" \
+                and len(node.args) == 1:
+            return self._count(node.args[0])
+        return None
+
+    def _is_helper_call(self, node: ast.AST) -> bool:
+        return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name) and node.func.value.id == "self"
+                and node.func.attr in self.methods and node.func.attr not in ("play", "wait"))
+
+    def _helper_calls(self, stmt: ast.stmt) -> List[ast.Call]:
+        """Calls of the scene's own methods in a simple statement, in source order."""
+        calls = [n for n in ast.walk(stmt) if self._is_helper_call(n)]
+        return sorted(calls, key=lambda n: (n.lineno, n.col_offset))
+
+    def _has_timed_calls(self, body: List[ast.stmt]) -> bool:
+        return any(self_call(n, ("play", "wait")) is not None or self._is_helper_call(n)
+                   for stmt in body for n in ast.walk(stmt))
+
+    def method(self, name: str, multiplier: int, site: Optional[int]):
+        if name in self._stack:
+            self.unbounded.append(f"recursive call of {name}() on line {site}")
+            return
+        self._stack.append(name)
+        self.collect(self.methods[name].body, multiplier, site)
+        self._stack.pop()
+
+    def collect(self, body: List[ast.stmt], multiplier: int, site: Optional[int] = None):
+        previous = None
+        for stmt in body:
+            call = self_call(stmt, ("play", "wait"))
+            if call is not None:
+                segment = narration_marker(previous) if call.func.attr == "wait" else None
+                narration = call.func.attr == "wait" and (
+                    segment is not None or self_call(previous, ("add_sound",)) is not None)
+                self.timeline.append(TimedCall(call, call.func.attr, multiplier, narration, segment, site,
+                                               self.constants))
+            elif isinstance(stmt, (ast.For, ast.While)):
+                count = self._count(stmt.iter) if isinstance(stmt, ast.For) else None
+                if count is None and self._has_timed_calls(stmt.body):
+                    kind = "for" if isinstance(stmt, ast.For) else "while"
+                    self.unbounded.append(f"{kind} loop with no fixed iteration count on line {stmt.lineno}")
+                self.collect(stmt.body, multiplier * (count if count is not None else 1), site)
+                self.collect(stmt.orelse, multiplier, site)
+            elif isinstance(stmt, (ast.If, ast.With, ast.Try)):
+                for block in ("body", "orelse", "finalbody"):
+                    self.collect(getattr(stmt, block, []), multiplier, site)
+                for handler in getattr(stmt, "handlers", []):
+                    self.collect(handler.body, multiplier, site)
+            elif not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                for helper in self._helper_calls(stmt):
+                    self.method(helper.func.attr, multiplier, site or helper.lineno)
+            previous = stmt
+
+
+def base_name(node: ast.expr) -> Optional[str]:
+    return node.id if isinstance(node, ast.Name) else getattr(node, "attr", None)
+
+
+class SceneIR:
+    """Facts about one scene source, extracted in a single walk of its AST."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tree = ast.parse(source)
+        self.classes = [n for n in self.tree.body if isinstance(n, ast.ClassDef)]
+
+        self.construct: Optional[ast.FunctionDef] = None
+        self.scene_class: Optional[ast.ClassDef] = None
+        self.call_names: Counter = Counter()
+        self.tex_strings: List[str] = []
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.FunctionDef) and node.name == "construct" and self.construct is None:
+                self.construct = node
+            elif isinstance(node, ast.Call):
+                name = call_name(node)
+                if name:
+                    self.call_names[name] += 1
+                if name in TEX_CLASSES:
+                    self.tex_strings.extend(a.value for a in node.args
+                                            if isinstance(a, ast.Constant) and isinstance(a.value, str))
+        if self.construct is not None:
+            self.scene_class = next((c for c in self.classes if self.construct in c.body), None)
+        if self.scene_class is None and self.classes:
+            self.scene_class = self.classes[0]
+
+        self.animations: List[AnimationCall] = []
+        self.timeline: List[TimedCall] = []
+        self.unbounded: List[str] = []  # why the timeline cannot be planned (see _TimelineBuilder)
+        if self.construct is not None:
+            for stmt in self.construct.body:
+                call = self_call(stmt, ANIMATION_METHODS)
+                if call is not None:
+                    self.animations.append(AnimationCall(len(self.animations), call.func.attr, stmt))
+            builder = _TimelineBuilder(self.scene_class)
+            if builder.methods.get("construct") is self.construct:
+                builder.method("construct", 1, None)
+            else:
+                builder.collect(self.construct.body, 1)
+            self.timeline, self.unbounded = builder.timeline, builder.unbounded
+
+    @property
+    def class_name(self) -> Optional[str]:
+        return self.scene_class.name if self.scene_class is not None else None
+
+    @property
+    def base_names(self) -> List[str]:
+        if self.scene_class is None:
+            return []
+        return [base_name(b) for b in self.scene_class.bases]
+
+    @property
+    def all_base_names(self) -> set:
+        """Base class names across every class in the module."""
+        return {base_name(b) for c in self.classes for b in c.bases}
+
+    @property
+    def waits(self) -> List[TimedCall]:
+        return [t for t in self.timeline if t.kind == "wait"]
+
+    def assignments(self) -> Dict[str, ast.expr]:
+        """Variable name -> its (last) constructor or constant expression in construct()."""
+        defs = {}
+        if self.construct is None:
+            return defs
+        for node in ast.walk(self.construct):
+            if isinstance(node, ast.Assign) and isinstance(node.value, (ast.Call, ast.Constant)):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        defs[target.id] = node.value
+        return defs
+
+
+@functools.lru_cache(maxsize=32)
+def parse_scene(source: str) -> SceneIR:
+    """
+    Parse a scene once per distinct source text.
+
+    Raises:
+        SyntaxError: If the source does not parse.
+    """
+    return SceneIR(source)
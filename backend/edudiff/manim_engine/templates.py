@@ -1,10 +1,19 @@
+import os
 import re
 import logging
 from manim import *
 import numpy as np
 
+from .params import (compile_function, defined_intervals, extract_params, nice_step, sample_y_range,
+                     to_numpy)
+from .registry import TemplateRegistry
+from ..math.equations import DEFINITION_EQUALS_RE
+
 logger = logging.getLogger(__name__)
 
+# Serve the in-place updater variants of animation-heavy templates
+TEMPLATE_UPDATERS = os.getenv("TEMPLATE_UPDATERS", "1") not in ("0", "false", "False")
+
 # --- LaTeX helpers -----------------------------------------------------------
 LATEX_COMMAND_HINTS = [
     r"\\frac", r"\\sum", r"\\int", r"\\sqrt", r"\\alpha", r"\\beta",
@@ -812,10 +821,709 @@ class MainScene(Scene):
         self.wait()
 '''
 
-def select_template(concept):
+# --- In-place updater variants -----------------------------------------------
+# always_redraw builds a brand-new mobject (and, for text, re-typesets it) on
+# every frame. These variants create each mobject once and move or reshape it
+# with add_updater, which renders the same frames at a fraction of the cost.
+# benchmarks/template_updaters.py measures both and compares their frames.
+
+def generate_tangent_slope_updater_code():
+    """'derivative as slope of tangent' with mobjects updated in place."""
+    return '''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+        axes = Axes(
+            x_range=[-3, 3],
+            y_range=[-1, 8],
+            axis_config={"include_tip": True}
+        )
+        
+        # Add labels
+        labels = axes.get_axis_labels(x_label="x", y_label="f(x)")
+        
+        # Create function f(x) = x^2
+        def func(x):
+            return x**2
+            
+        graph = axes.plot(func, color=BLUE)
+        graph_label = axes.get_graph_label(graph, "x^2")
+        
+        # Create tracker for x value
+        x_tracker = ValueTracker(-2)
+        
+        def tangent_ends():
+            x = x_tracker.get_value()
+            return (
+                axes.c2p(x - 1, func(x) - 2 * x),
+                axes.c2p(x + 1, func(x) + 2 * x),
+            )
+        
+        def tangency_point():
+            x = x_tracker.get_value()
+            return axes.c2p(x, func(x))
+        
+        # Tangent line, reshaped in place
+        tangent = Line(*tangent_ends(), color=RED, stroke_width=4)
+        tangent.add_updater(lambda m: m.set_points_by_ends(*tangent_ends()))
+        
+        # Dot at point of tangency, moved in place
+        dot = Dot(tangency_point(), color=RED)
+        dot.add_updater(lambda m: m.move_to(tangency_point()))
+        
+        # Slope label: the number is updated and the group repositioned in one updater
+        slope_label = DecimalNumber(
+            2 * x_tracker.get_value(),
+            num_decimal_places=2,
+            include_sign=True
+        ).next_to(dot, UR)
+        slope_text = Text("Slope: ").next_to(slope_label, LEFT)
+        slope_group = VGroup(slope_text, slope_label).next_to(dot, UR, buff=0.2)
+        
+        def update_slope(group):
+            slope_label.set_value(2 * x_tracker.get_value())
+            group.next_to(dot, UR, buff=0.2)
+        slope_group.add_updater(update_slope)
+        
+        # Add everything to scene
+        self.play(Create(axes), Write(labels))
+        self.play(Create(graph), Write(graph_label))
+        self.wait()
+        
+        self.play(Create(tangent), Create(dot), Write(slope_group))
+        self.wait()
+        
+        # Animate x value moving
+        self.play(
+            x_tracker.animate.set_value(2),
+            run_time=6,
+            rate_func=there_and_back
+        )
+        self.wait()'''
+
+def generate_trig_updater_code():
+    """Unit circle sine/cosine with mobjects updated in place."""
+    return '''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate plane
+        plane = NumberPlane(
+            x_range=[-4, 4],
+            y_range=[-2, 2],
+            axis_config={"include_tip": True}
+        )
+        
+        # Add custom labels
+        x_label = Text("x").next_to(plane.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(plane.y_axis.get_end(), UP)
+        
+        # Create unit circle
+        circle = Circle(radius=1, color=BLUE)
+        
+        # Create angle tracker
+        theta = ValueTracker(0)
+        
+        def circle_point():
+            return circle.point_at_angle(theta.get_value())
+        
+        # Dot that moves around the circle
+        dot = Dot(circle_point(), color=YELLOW)
+        dot.add_updater(lambda m: m.move_to(circle_point()))
+        
+        # Lines showing sine and cosine, reshaped in place
+        def x_line_ends():
+            p = circle_point()
+            return [p[0], 0, 0], p
+        
+        def y_line_ends():
+            return [0, 0, 0], [circle_point()[0], 0, 0]
+        
+        x_line = Line(*x_line_ends(), color=GREEN)
+        x_line.add_updater(lambda m: m.set_points_by_ends(*x_line_ends()))
+        y_line = Line(*y_line_ends(), color=RED)
+        y_line.add_updater(lambda m: m.set_points_by_ends(*y_line_ends()))
+        
+        # Create labels
+        sin_label = Text("sin(θ)").next_to(x_line).set_color(GREEN)
+        cos_label = Text("cos(θ)").next_to(y_line).set_color(RED)
+        
+        # Add everything to scene
+        self.play(Create(plane), Write(x_label), Write(y_label))
+        self.play(Create(circle))
+        self.play(Create(dot))
+        self.play(Create(x_line), Create(y_line))
+        self.play(Write(sin_label), Write(cos_label))
+        
+        # Animate angle
+        self.play(
+            theta.animate.set_value(2*PI),
+            run_time=4,
+            rate_func=linear
+        )
+        self.wait()'''
+
+def generate_quadratic_updater_code():
+    """Quadratic tracer with the dot updated in place.
+
+    The dashed guide lines are still redrawn (a dashed line's dash count
+    depends on its length), but from ``c2p`` instead of the much slower
+    ``input_to_graph_point`` search.
+    """
+    return '''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+        axes = Axes(
+            x_range=[-4, 4],
+            y_range=[-2, 8],
+            axis_config={"include_tip": True}
+        )
+        
+        # Add custom labels
+        x_label = Text("x").next_to(axes.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(axes.y_axis.get_end(), UP)
+        
+        # Create quadratic function
+        def func(x):
+            return x**2
+            
+        graph = axes.plot(
+            func,
+            color=BLUE,
+            x_range=[-3, 3]
+        )
+        
+        # Create labels and equation
+        equation = Text("f(x) = x²").to_corner(UL)
+        
+        # Create dot and value tracker
+        x = ValueTracker(-3)
+        
+        def graph_point():
+            return axes.c2p(x.get_value(), func(x.get_value()))
+        
+        dot = Dot(graph_point(), color=YELLOW)
+        dot.add_updater(lambda m: m.move_to(graph_point()))
+        
+        # Create lines to show x and y values
+        v_line = always_redraw(
+            lambda: axes.get_vertical_line(graph_point(), color=RED)
+        )
+        h_line = always_redraw(
+            lambda: axes.get_horizontal_line(graph_point(), color=GREEN)
+        )
+        
+        # Add everything to scene
+        self.play(Create(axes), Write(x_label), Write(y_label))
+        self.play(Create(graph))
+        self.play(Write(equation))
+        self.play(Create(dot), Create(v_line), Create(h_line))
+        
+        # Animate x value
+        self.play(
+            x.animate.set_value(3),
+            run_time=6,
+            rate_func=there_and_back
+        )
+        self.wait()'''
+
+# Redraw-based template -> in-place updater variant
+UPDATER_VARIANTS = {
+    generate_tangent_slope_code: generate_tangent_slope_updater_code,
+    generate_trig_code: generate_trig_updater_code,
+    generate_quadratic_code: generate_quadratic_updater_code,
+}
+
+
+# --- Parameterized templates -------------------------------------------------
+# Built from values parsed out of the concept by params.extract_params, so
+# "graph x^2 - 4x + 3" or "multiply [[2, 1], [1, 3]] by [1, 2]" get a scene
+# for that exact function or matrix without an LLM call.
+
+def _fmt_number(value):
+    return str(int(value)) if float(value).is_integer() else f"{value:.3g}"
+
+def _axes_source(x_range, y_range, indent="        "):
+    x_step = nice_step(x_range[1] - x_range[0])
+    y_step = nice_step(y_range[1] - y_range[0])
+    return (f"{indent}axes = Axes(\n"
+            f"{indent}    x_range=[{x_range[0]}, {x_range[1]}, {x_step}],\n"
+            f"{indent}    y_range=[{y_range[0]}, {y_range[1]}, {y_step}],\n"
+            f"{indent}    axis_config={{\"include_tip\": True}}\n"
+            f"{indent})")
+
+def _graph_source(params, name="graph", color="BLUE", indent="        "):
+    """Plot f over each interval of its domain (poles and undefined regions are skipped)."""
+    pieces = ", ".join(f"axes.plot(func, x_range=[{lo}, {hi}], color={color})" for lo, hi in params["domain"])
+    return f"{indent}{name} = VGroup({pieces})"
+
+def _function_source(params, indent="        "):
+    return (f"{indent}def func(x):\n"
+            f"{indent}    return {to_numpy(params['expression'])}")
+
+def _sweep_range(params, margin=0.1):
+    """Tracker start/end inside the widest interval where f is defined."""
+    lo, hi = max(params["domain"], key=lambda iv: iv[1] - iv[0])
+    pad = (hi - lo) * margin
+    return round(lo + pad, 3), round(hi - pad, 3)
+
+def generate_function_graph_code(params):
+    """Plot an arbitrary f(x) parsed from the concept, with a dot tracing the curve."""
+    start, end = _sweep_range(params)
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+{_axes_source(params["x_range"], params["y_range"])}
+        
+        # Add custom labels
+        x_label = Text("x").next_to(axes.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(axes.y_axis.get_end(), UP)
+        
+        # Create function
+{_function_source(params)}
+            
+{_graph_source(params)}
+        equation = MathTex(r"f(x) = {params["latex"]}").to_corner(UL)
+        
+        # Dot tracing the curve, moved in place
+        x = ValueTracker({start})
+        dot = Dot(axes.c2p({start}, func({start})), color=YELLOW)
+        dot.add_updater(lambda m: m.move_to(axes.c2p(x.get_value(), func(x.get_value()))))
+        
+        # Add everything to scene
+        self.play(Create(axes), Write(x_label), Write(y_label))
+        self.play(Create(graph), Write(equation))
+        self.play(Create(dot))
+        
+        # Trace the function
+        self.play(
+            x.animate.set_value({end}),
+            run_time=5,
+            rate_func=there_and_back
+        )
+        self.wait()'''
+
+def generate_quadratic_param_code(params):
+    """Quadratic with its own coefficients: graph, vertex, real roots and a tracer."""
+    a, b, c = params["coefficients"]
+    if not a:
+        return generate_function_graph_code(params)
+    lo, hi = params["x_range"]
+    vx = -b / (2 * a)
+    vy = a * vx * vx + b * vx + c
+    disc = b * b - 4 * a * c
+    roots = []
+    if disc >= 0:
+        roots = sorted({round((-b - disc ** 0.5) / (2 * a), 4), round((-b + disc ** 0.5) / (2 * a), 4)})
+    roots = [r for r in roots if lo <= r <= hi]
+    start, end = _sweep_range(params)
+
+    lines = []
+    if lo <= vx <= hi:
+        side = "DOWN" if a > 0 else "UP"
+        lines.append(f'''        # Vertex
+        vertex = Dot(axes.c2p({round(vx, 4)}, {round(vy, 4)}), color=ORANGE)
+        vertex_label = Text("vertex ({_fmt_number(vx)}, {_fmt_number(vy)})", font_size=24).next_to(vertex, {side})
+        self.play(FadeIn(vertex), Write(vertex_label))''')
+    if roots:
+        root_dots = ", ".join(f"Dot(axes.c2p({r}, 0), color=GREEN)" for r in roots)
+        root_text = ", ".join(f"x = {_fmt_number(r)}" for r in roots)
+        lines.append(f'''        # Real roots
+        roots = VGroup({root_dots})
+        roots_label = Text("roots: {root_text}", font_size=24).next_to(equation, DOWN, aligned_edge=LEFT)
+        self.play(FadeIn(roots), Write(roots_label))''')
+    features = "\n        \n".join(lines)
+
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+{_axes_source(params["x_range"], params["y_range"])}
+        
+        # Add custom labels
+        x_label = Text("x").next_to(axes.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(axes.y_axis.get_end(), UP)
+        
+        # Create quadratic function
+{_function_source(params)}
+            
+{_graph_source(params)}
+        
+        # Create labels and equation
+        equation = MathTex(r"f(x) = {params["latex"]}").to_corner(UL)
+        
+        # Create dot and value tracker
+        x = ValueTracker({start})
+        
+        def graph_point():
+            return axes.c2p(x.get_value(), func(x.get_value()))
+        
+        dot = Dot(graph_point(), color=YELLOW)
+        dot.add_updater(lambda m: m.move_to(graph_point()))
+        
+        # Create lines to show x and y values
+        v_line = always_redraw(
+            lambda: axes.get_vertical_line(graph_point(), color=RED)
+        )
+        h_line = always_redraw(
+            lambda: axes.get_horizontal_line(graph_point(), color=GREEN)
+        )
+        
+        # Add everything to scene
+        self.play(Create(axes), Write(x_label), Write(y_label))
+        self.play(Create(graph))
+        self.play(Write(equation))
+        
+{features}
+        
+        self.play(Create(dot), Create(v_line), Create(h_line))
+        
+        # Animate x value
+        self.play(
+            x.animate.set_value({end}),
+            run_time=6,
+            rate_func=there_and_back
+        )
+        self.wait()'''
+
+def generate_tangent_slope_param_code(params):
+    """Tangent line sliding along f(x); stops at the requested point when one is given."""
+    start, end = _sweep_range(params, margin=0.15)
+    point = params.get("point")
+    if point is not None and start <= point <= end:
+        motion = f'''        # Move to the requested point
+        self.play(
+            x_tracker.animate.set_value({point}),
+            run_time=4,
+            rate_func=smooth
+        )'''
+    else:
+        motion = f'''        # Animate x value moving
+        self.play(
+            x_tracker.animate.set_value({end}),
+            run_time=6,
+            rate_func=there_and_back
+        )'''
+
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+{_axes_source(params["x_range"], params["y_range"])}
+        
+        # Add labels
+        labels = axes.get_axis_labels(x_label="x", y_label="f(x)")
+        
+        # Create function and its numerical derivative
+{_function_source(params)}
+        
+        def slope(x):
+            return (func(x + 1e-4) - func(x - 1e-4)) / 2e-4
+            
+{_graph_source(params)}
+        graph_label = MathTex(r"f(x) = {params["latex"]}").to_corner(UL)
+        
+        # Create tracker for x value
+        x_tracker = ValueTracker({start})
+        
+        def tangent_ends():
+            x = x_tracker.get_value()
+            m = slope(x)
+            return (
+                axes.c2p(x - 1, func(x) - m),
+                axes.c2p(x + 1, func(x) + m),
+            )
+        
+        def tangency_point():
+            x = x_tracker.get_value()
+            return axes.c2p(x, func(x))
+        
+        # Tangent line, reshaped in place
+        tangent = Line(*tangent_ends(), color=RED, stroke_width=4)
+        tangent.add_updater(lambda m: m.set_points_by_ends(*tangent_ends()))
+        
+        # Dot at point of tangency, moved in place
+        dot = Dot(tangency_point(), color=RED)
+        dot.add_updater(lambda m: m.move_to(tangency_point()))
+        
+        # Slope label: the number is updated and the group repositioned in one updater
+        slope_label = DecimalNumber(
+            slope(x_tracker.get_value()),
+            num_decimal_places=2,
+            include_sign=True
+        ).next_to(dot, UR)
+        slope_text = Text("Slope: ").next_to(slope_label, LEFT)
+        slope_group = VGroup(slope_text, slope_label).next_to(dot, UR, buff=0.2)
+        
+        def update_slope(group):
+            slope_label.set_value(slope(x_tracker.get_value()))
+            group.next_to(dot, UR, buff=0.2)
+        slope_group.add_updater(update_slope)
+        
+        # Add everything to scene
+        self.play(Create(axes), Write(labels))
+        self.play(Create(graph), Write(graph_label))
+        self.wait()
+        
+        self.play(Create(tangent), Create(dot), Write(slope_group))
+        self.wait()
+        
+{motion}
+        self.wait()'''
+
+def generate_derivative_function_param_code(params):
+    """f(x) and its numerically computed derivative f'(x) on the same axes."""
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+{_axes_source(params["x_range"], params["y_range"])}
+        
+        # Add custom labels
+        x_label = Text("x").next_to(axes.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(axes.y_axis.get_end(), UP)
+        
+        # Create function
+{_function_source(params)}
+            
+{_graph_source(params)}
+        
+        # Create derivative function (central difference)
+        def deriv(x):
+            return (func(x + 1e-4) - func(x - 1e-4)) / 2e-4
+            
+{_graph_source(params, name="derivative", color="RED").replace("func,", "deriv,")}
+        
+        # Create labels
+        func_label = MathTex(r"f(x) = {params["latex"]}").set_color(BLUE)
+        deriv_label = MathTex(r"f'(x)").set_color(RED)
+        
+        # Position labels
+        func_label.to_corner(UL)
+        deriv_label.next_to(func_label, DOWN, aligned_edge=LEFT)
+        
+        # Create animations
+        self.play(Create(axes), Write(x_label), Write(y_label))
+        self.play(Create(graph), Write(func_label))
+        self.wait()
+        self.play(Create(derivative), Write(deriv_label))
+        self.wait()'''
+
+def _simpson(f, lo, hi, n=200):
+    h = (hi - lo) / n
+    total = f(lo) + f(hi)
+    for i in range(1, n):
+        total += (4 if i % 2 else 2) * f(lo + i * h)
+    return total * h / 3
+
+def generate_integral_param_code(params):
+    """Area under f(x) between the requested bounds, with its value computed locally."""
+    lo, hi = params.get("bounds") or (0, 1)
+    pad = max(1.0, 0.25 * (hi - lo))
+    axes_x = [round(lo - pad, 3), round(hi + pad, 3)]
+    f = compile_function(params["expression"])
+    try:
+        area = _simpson(f, lo, hi)
+        area_text = f"Area ≈ {area:.4g}"
+    except (ValueError, ZeroDivisionError, OverflowError):
+        return None
+    view = dict(params, x_range=axes_x)
+    view["y_range"] = sample_y_range(f, axes_x)
+    view["domain"] = defined_intervals(f, axes_x, view["y_range"])
+
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create coordinate system
+{_axes_source(view["x_range"], view["y_range"])}
+        
+        # Add custom labels
+        x_label = Text("x").next_to(axes.x_axis.get_end(), RIGHT)
+        y_label = Text("y").next_to(axes.y_axis.get_end(), UP)
+        
+        # Create function
+{_function_source(view)}
+            
+{_graph_source(view)}
+        
+        # Create area
+        area = axes.get_area(
+            axes.plot(func, x_range=[{lo}, {hi}]),
+            x_range=[{lo}, {hi}],
+            color=YELLOW,
+            opacity=0.3
+        )
+        
+        # Create labels
+        func_label = MathTex(r"\\int_{{{_fmt_number(lo)}}}^{{{_fmt_number(hi)}}} {params["latex"]} \\, dx").set_color(BLUE)
+        integral_label = Text("{area_text}").set_color(YELLOW)
+        
+        # Position labels
+        func_label.to_corner(UL)
+        integral_label.next_to(func_label, DOWN, aligned_edge=LEFT)
+        
+        # Create animations
+        self.play(Create(axes), Write(x_label), Write(y_label))
+        self.play(Create(graph), Write(func_label))
+        self.wait()
+        self.play(FadeIn(area), Write(integral_label))
+        self.wait()'''
+
+def generate_matrix_param_code(params):
+    """Matrix-vector product for the matrix (and vector) given in the concept."""
+    matrix = params["matrix"]
+    vector = params.get("vector") or [float(i + 1) for i in range(len(matrix[0]))]
+    result = [sum(a * v for a, v in zip(row, vector)) for row in matrix]
+
+    def column(values):
+        rows = ", ".join(f'Text("{_fmt_number(v)}")' for v in values)
+        return f"VGroup({rows}).arrange(DOWN)"
+
+    matrix_rows = ", ".join('Text("' + "  ".join(_fmt_number(v) for v in row) + '")' for row in matrix)
+    calc_rows = []
+    for row, value in zip(matrix, result):
+        terms = " + ".join(f"{_fmt_number(a)}({_fmt_number(v)})" for a, v in zip(row, vector))
+        calc_rows.append(f"{terms} = {_fmt_number(value)}")
+    calcs = ", ".join(f'Text("{row}", font_size=32)' for row in calc_rows)
+
+    return f'''from manim import *
+
+class MainScene(Scene):
+    def construct(self):
+        # Create matrices
+        matrix_a = VGroup({matrix_rows}).arrange(DOWN)
+        matrix_a.add(SurroundingRectangle(matrix_a))
+        
+        matrix_b = {column(vector)}
+        matrix_b.add(SurroundingRectangle(matrix_b))
+        
+        # Create multiplication symbol and equals sign
+        times = Text("×")
+        equals = Text("=")
+        
+        # Create result matrix
+        result = {column(result)}
+        result.add(SurroundingRectangle(result))
+        
+        # Position everything
+        equation = VGroup(
+            matrix_a, times, matrix_b,
+            equals, result
+        ).arrange(RIGHT)
+        equation.to_edge(UP, buff=1)
+        
+        # Create step-by-step calculations, one per row
+        calcs = VGroup({calcs}).arrange(DOWN)
+        calcs.next_to(equation, DOWN, buff=1)
+        
+        # Create animations
+        self.play(Create(matrix_a))
+        self.play(Create(matrix_b))
+        self.play(Write(times), Write(equals))
+        self.wait()
+        
+        for calc in calcs:
+            self.play(Write(calc))
+        self.play(Create(result))
+        self.wait()'''
+
+# --- Template registry -------------------------------------------------------
+# Keywords are matched on word boundaries; each distinct keyword found scores one
+# point, ties go to the higher priority and then to the earlier registration.
+
+REGISTRY = TemplateRegistry()
+
+REGISTRY.register(
+    'derivative_as_tangent', generate_tangent_slope_code,
+    keywords=['slope of tangent', 'tangent', 'instantaneous rate', 'slope at a point'],
+    builder=generate_tangent_slope_param_code, requires='expression',
+    description="Tangent line sliding along a curve with its slope")
+REGISTRY.register(
+    'derivative_as_function', generate_derivative_function_code,
+    keywords=['derivative function', 'differentiation', 'f\'(x)', 'derivative graph'],
+    builder=generate_derivative_function_param_code, requires='expression',
+    description="A function and its derivative on the same axes")
+REGISTRY.register(
+    'pythagorean', generate_pythagorean_code,
+    keywords=['pythagoras', 'pythagorean', 'right triangle', 'hypotenuse'],
+    description="Right triangle with squares on its sides")
+REGISTRY.register(
+    'quadratic', generate_quadratic_code,
+    keywords=['quadratic', 'parabola', 'x squared', 'x^2'],
+    formula_keywords=['x squared', 'x^2'],
+    builder=generate_quadratic_param_code, requires='coefficients',
+    description="Parabola with a point tracing it")
+REGISTRY.register(
+    'trigonometry', generate_trig_code,
+    keywords=['sine', 'cosine', 'trigonometry', 'trigonometric', 'trig', 'unit circle'],
+    builder=generate_function_graph_code, requires='expression',
+    description="Unit circle driving the sine curve")
+REGISTRY.register(
+    '3d_surface', generate_3d_surface_code,
+    keywords=['3d surface', 'surface plot', '3d plot', 'three dimensional'],
+    description="Rotating 3D surface plot")
+REGISTRY.register(
+    'sphere', generate_sphere_code,
+    keywords=['sphere', 'ball', 'spherical'],
+    description="Sphere with radius and surface area")
+REGISTRY.register(
+    'cube', generate_cube_code,
+    keywords=['cube', 'cubic', 'box'],
+    description="Cube with edge length and volume")
+# General backup for 'derivative' when neither the tangent nor the function view is asked for
+REGISTRY.register(
+    'derivative_general', generate_derivative_function_code,
+    keywords=['derivative'], priority=-1,
+    builder=generate_derivative_function_param_code, requires='expression',
+    description="A function and its derivative on the same axes")
+REGISTRY.register(
+    'integral', generate_integral_code,
+    keywords=['integration', 'integral', 'area under curve', 'antiderivative'],
+    builder=generate_integral_param_code, requires='expression',
+    description="Shaded area under a curve")
+REGISTRY.register(
+    'matrix', generate_matrix_code,
+    keywords=['matrix', 'matrices', 'linear transformation'],
+    builder=generate_matrix_param_code, requires='matrix',
+    description="Matrix-vector multiplication step by step")
+REGISTRY.register(
+    'eigenvalue', generate_eigenvalue_code,
+    keywords=['eigenvalue', 'eigenvector', 'characteristic'],
+    description="Eigenvectors kept on their span by a transformation")
+REGISTRY.register(
+    'complex', generate_complex_code,
+    keywords=['complex', 'imaginary', 'complex plane'],
+    description="Complex numbers on the complex plane")
+REGISTRY.register(
+    'differential_equation', generate_diff_eq_code,
+    keywords=['differential equation', 'ode', 'pde'],
+    description="Slope field with a solution curve")
+# Only reached through explicit values in the concept (see select_template)
+REGISTRY.register(
+    'function_graph', None,
+    builder=generate_function_graph_code, requires='expression',
+    description="Graph of the function given in the concept")
+
+# Words asking for a plot of an explicit function
+GRAPH_WORDS = ("graph", "plot", "sketch", "draw", "curve")
+
+def select_template(concept, params=None):
     """
     Select appropriate template based on the concept.
     
+    Args:
+        concept: The user's concept text.
+        params: Parameters from ``params.extract_params``; extracted here if not given.
+    
     Returns:
         tuple: (code_string, visualization_type_string) or None
     """
@@ -823,93 +1531,41 @@ def select_template(concept):
 
     # CRITICAL: Bypass templates if the user wants to SOLVE an equation
     solve_indicators = ['solve', '=', 'calculate', 'simplify', 'find', 'step-by-step']
-    if any(ind in concept for ind in solve_indicators):
+    if any(ind in DEFINITION_EQUALS_RE.sub(' ', concept) for ind in solve_indicators):
         return None
     
-    # Define template mappings with keywords
-    template_mappings = {
-        'derivative_as_tangent': {
-            'keywords': ['slope of tangent', 'tangent', 'instantaneous rate', 'slope at a point'],
-            'generator': generate_tangent_slope_code
-        },
-        'derivative_as_function': {
-            'keywords': ['derivative function', 'differentiation', 'f\'(x)', 'derivative graph'],
-            'generator': generate_derivative_function_code
-        },
-        'pythagorean': {
-            'keywords': ['pythagoras', 'pythagorean', 'right triangle', 'hypotenuse'],
-            'generator': generate_pythagorean_code
-        },
-        'quadratic': {
-            'keywords': ['quadratic', 'parabola', 'x squared', 'x^2'],
-            'generator': generate_quadratic_code
-        },
-        'trigonometry': {
-            'keywords': ['sine', 'cosine', 'trigonometry', 'trig', 'unit circle'],
-            'generator': generate_trig_code
-        },
-        '3d_surface': {
-            'keywords': ['3d surface', 'surface plot', '3d plot', 'three dimensional'],
-            'generator': generate_3d_surface_code
-        },
-        'sphere': {
-            'keywords': ['sphere', 'ball', 'spherical'],
-            'generator': generate_sphere_code
-        },
-        'cube': {
-            'keywords': ['cube', 'cubic', 'box'],
-            'generator': generate_cube_code
-        },
-        # General backup for 'derivative' if not caught by tangent/function specifics above
-        'derivative_general': {
-            'keywords': ['derivative'],
-            # Default to function visualization if unspecified, or maybe tangent?
-            # User wants distinction. Let's default to function if they just say "derivative"
-            # but usually "derivative" implies the concept. 
-            # Let's map it to function for now, or check generic keywords last.
-            'generator': generate_derivative_function_code
-        },
-        'integral': {
-            'keywords': ['integration', 'integral', 'area under curve', 'antiderivative'],
-            'generator': generate_integral_code
-        },
-        'matrix': {
-            'keywords': ['matrix', 'matrices', 'linear transformation'],
-            'generator': generate_matrix_code
-        },
-        'eigenvalue': {
-            'keywords': ['eigenvalue', 'eigenvector', 'characteristic'],
-            'generator': generate_eigenvalue_code
-        },
-        'complex': {
-            'keywords': ['complex', 'imaginary', 'complex plane'],
-            'generator': generate_complex_code
-        },
-        'differential_equation': {
-            'keywords': ['differential equation', 'ode', 'pde'],
-            'generator': generate_diff_eq_code
-        }
-    }
+    if params is None:
+        params = extract_params(concept)
     
-    # Find best matching template
-    best_match_key = None
-    best_match_gen = None
-    max_matches = 0
+    # Find best matching template; formula keywords ('x^2') defer to the parsed function
+    match = REGISTRY.match(concept, skip_formulas=bool(params.get('expression')))
+    spec = match.spec if match else None
     
-    for template_name, template_info in template_mappings.items():
-        matches = sum(1 for keyword in template_info['keywords'] if keyword in concept)
-        if matches > max_matches:
-            max_matches = matches
-            best_match_key = template_name
-            best_match_gen = template_info['generator']
+    # Explicit values that no topic keyword claimed: a function to graph, or a matrix product
+    graph_request = any(w in concept for w in GRAPH_WORDS) or REGISTRY.match(concept) is not None
+    if spec is None and params.get('expression') and graph_request:
+        quadratic = params.get('coefficients') and params['coefficients'][0]
+        spec = REGISTRY.get('quadratic' if quadratic else 'function_graph')
+    elif spec is None and params.get('matrix'):
+        spec = REGISTRY.get('matrix')
     
-    # Return best matching template code AND type
-    if best_match_gen and max_matches > 0:
-        try:
-            return best_match_gen(), best_match_key
-        except Exception as e:
-            logger.error(f"Error generating template {best_match_gen.__name__}: {str(e)}")
-            return None
+    if spec is None:
+        # Default to None to trigger AI generation
+        return None
     
-    # Default to None to trigger AI generation
-    return None
+    # Return best matching template code AND type
+    try:
+        if spec.builder and spec.requires in params:
+            code = spec.builder(params)
+            if code:
+                return code, spec.name
+        elif spec.builder and spec.requires == 'coefficients' and params.get('expression'):
+            # A keyword like 'parabola' matched but the function is not quadratic
+            return generate_function_graph_code(params), 'function_graph'
+        generator = spec.generator
+        if TEMPLATE_UPDATERS:
+            generator = UPDATER_VARIANTS.get(generator, generator)
+        return generator(), spec.name
+    except Exception as e:
+        logger.error(f"Error generating template {spec.name}: {str(e)}")
+        return None
@@ -0,0 +1,374 @@
+"""
+Fast pre-render validation for generated Manim scenes.
+
+Two stages, cheapest first:
+
+1. Static AST checks (microseconds): the code parses, defines a Scene
+   subclass with ``construct()``, and every name it reads is defined locally,
+   imported, a builtin, or exported by manim.
+2. Dry run (typically well under a second): ``construct()`` is executed in a
+   warm worker process that has already imported manim, with a renderer that
+   skips animations and a config that writes no files, so runtime errors
+   (bad kwargs, wrong argument types, missing attributes) surface before any
+   frame is rendered or encoded.
+
+Failures raise ``SceneValidationError`` carrying a structured description
+(``kind``, ``message``, ``lineno``, ``name``) the pipeline can act on. A dry
+run that times out, crashes its worker or finds every worker busy proves
+nothing about the scene: it is logged and the scene goes on to the render,
+whose own timeout still applies.
+
+Configuration (environment):
+    VALIDATOR_DRY_RUN   run the dry-run stage (default: 1)
+    VALIDATOR_TIMEOUT   dry-run timeout in seconds (default: 20)
+    VALIDATOR_WORKERS   dry-run worker processes (default: 2)
+"""
+
+import ast
+import builtins
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+from typing import Optional, Set
+
+from .scene_ir import base_name, parse_scene
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_DRY_RUN = os.getenv("VALIDATOR_DRY_RUN", "1") not in ("0", "false", "False")
+VALIDATOR_TIMEOUT = float(os.getenv("VALIDATOR_TIMEOUT", "20"))
+VALIDATOR_WORKERS = max(1, int(os.getenv("VALIDATOR_WORKERS", "2")))
+
+# Dry-run outcomes that say nothing about the scene itself
+INCONCLUSIVE_KINDS = ("timeout", "crash", "busy")
+
+SCENE_BASES = {
+    "Scene", "ThreeDScene", "MovingCameraScene", "ZoomedScene", "VectorScene",
+    "LinearTransformationScene", "SpecialThreeDScene",
+}
+
+SCENE_FILENAME = "<scene>"
+
+
+class SceneValidationError(ValueError):
+    """A generated scene failed validation."""
+
+    def __init__(self, kind: str, message: str, lineno: Optional[int] = None,
+                 name: Optional[str] = None, error_type: Optional[str] = None):
+        self.kind = kind
+        self.message = message
+        self.lineno = lineno
+        self.name = name
+        self.error_type = error_type
+        location = f" (line {lineno})" if lineno else ""
+        super().__init__(f"{kind}: {message}{location}")
+
+    def as_stderr(self) -> str:
+        """Render the error the way a Python traceback tail would, for repair fingerprinting."""
+        frame = f'  File "scene.py", line {self.lineno}, in construct\n' if self.lineno else ""
+        if self.kind in ("undefined_name", "unknown_manim_name") and self.name:
+            return f"{frame}NameError: name '{self.name}' is not defined"
+        return f"{frame}{self.error_type or type(self).__name__}: {self.message}"
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "lineno": self.lineno,
+            "name": self.name,
+            "error_type": self.error_type,
+        }
+
+
+_manim_names: Optional[Set[str]] = None
+
+
+def manim_names() -> Optional[Set[str]]:
+    """Names exported by ``from manim import *``, or None if manim is not importable here."""
+    global _manim_names
+    if _manim_names is None:
+        try:
+            import manim
+        except ImportError:
+            return None
+        exported = getattr(manim, "__all__", None)
+        _manim_names = set(exported) if exported else {n for n in dir(manim) if not n.startswith("_")}
+    return _manim_names
+
+
+# --- static checks -------------------------------------------------------------
+
+def _bound_names(node: ast.AST) -> Set[str]:
+    """Names bound anywhere directly inside a scope node (not inside nested scopes)."""
+    bound = set()
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = node.args
+        for a in args.posonlyargs + args.args + args.kwonlyargs:
+            bound.add(a.arg)
+        if args.vararg:
+            bound.add(args.vararg.arg)
+        if args.kwarg:
+            bound.add(args.kwarg.arg)
+
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+        stack = [gen.target for gen in node.generators]
+    else:
+        stack = list(node.body) if isinstance(node.body, list) else [node.body]
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(child.name)
+            stack.extend(child.decorator_list)
+            continue
+        if isinstance(child, (ast.Lambda, ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            continue
+        if isinstance(child, ast.Name) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            bound.add(child.id)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                if alias.name != "*":
+                    bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            bound.add(child.name)
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            bound.update(child.names)
+        stack.extend(ast.iter_child_nodes(child))
+    return bound
+
+
+class _NameChecker(ast.NodeVisitor):
+    def __init__(self, known: Set[str]):
+        self.scopes = [known]
+        self.undefined = []
+
+    def _visit_scope(self, node):
+        self.scopes.append(_bound_names(node))
+        self.generic_visit(node)
+        self.scopes.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_scope
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_scope
+
+    def visit_ClassDef(self, node):
+        for base in node.bases + node.decorator_list:
+            self.visit(base)
+        self.scopes.append(_bound_names(node))
+        for stmt in node.body:
+            self.visit(stmt)
+        self.scopes.pop()
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and not any(node.id in scope for scope in self.scopes):
+            self.undefined.append(node)
+
+
+def _scene_class(tree: ast.Module, scene_name: Optional[str]) -> ast.ClassDef:
+    classes = [n for n in tree.body if isinstance(n, ast.ClassDef)]
+    local_scene_classes = set()
+    for cls in classes:
+        base_names = {base_name(b) for b in cls.bases}
+        if base_names & (SCENE_BASES | local_scene_classes) or any(
+                n and n.endswith("Scene") for n in base_names):
+            local_scene_classes.add(cls.name)
+
+    if scene_name:
+        match = next((c for c in classes if c.name == scene_name), None)
+        if match is None:
+            raise SceneValidationError("no_scene", f"Scene class '{scene_name}' is not defined", name=scene_name)
+    else:
+        match = next((c for c in classes if c.name in local_scene_classes), None)
+        if match is None:
+            raise SceneValidationError("no_scene", "No Scene subclass is defined")
+
+    if match.name not in local_scene_classes:
+        raise SceneValidationError("no_scene", f"Class '{match.name}' does not derive from a Manim Scene",
+                                   lineno=match.lineno, name=match.name)
+    # construct() may be inherited from a local or imported (template) base class
+    def defines_construct(cls):
+        return any(isinstance(n, ast.FunctionDef) and n.name == "construct" for n in cls.body)
+    by_name = {c.name: c for c in classes}
+    base_names = [base_name(b) for b in match.bases]
+    inherited = any(n not in SCENE_BASES and (n not in by_name or defines_construct(by_name[n]))
+                    for n in base_names)
+    if not defines_construct(match) and not inherited:
+        raise SceneValidationError("no_construct", f"Scene '{match.name}' has no construct() method",
+                                   lineno=match.lineno, name=match.name)
+    return match
+
+
+def check_ast(code: str, scene_name: Optional[str] = None) -> str:
+    """
+    Static validation of a generated scene.
+
+    Returns:
+        str: The scene class name to render.
+
+    Raises:
+        SceneValidationError: On syntax errors, a missing scene class/construct, or undefined names.
+    """
+    try:
+        tree = parse_scene(code).tree
+    except SyntaxError as e:
+        raise SceneValidationError("syntax", e.msg, lineno=e.lineno) from e
+
+    scene = _scene_class(tree, scene_name)
+
+    star_modules = {n.module for n in ast.walk(tree) if isinstance(n, ast.ImportFrom)
+                    and any(a.name == "*" for a in n.names)}
+    known = set(dir(builtins)) | {"__name__", "__file__"}
+    known |= _bound_names(tree)
+
+    exported = manim_names()
+    if star_modules - {"manim"} or (star_modules and exported is None):
+        # Names pulled in by a star import we cannot enumerate: only the scene checks apply
+        return scene.name
+    if exported:
+        known |= exported
+
+    checker = _NameChecker(known)
+    checker.visit(tree)
+    if checker.undefined:
+        node = checker.undefined[0]
+        kind = "unknown_manim_name" if node.id[:1].isupper() else "undefined_name"
+        raise SceneValidationError(kind, f"Name '{node.id}' is not defined", lineno=node.lineno, name=node.id)
+    return scene.name
+
+
+# --- dry run -------------------------------------------------------------------
+
+def _dry_run_in_worker(code: str, scene_name: str, media_dir: str) -> dict:
+    """Execute construct() with animations skipped. Runs inside the worker process."""
+    from manim import tempconfig
+    from manim.renderer.cairo_renderer import CairoRenderer
+
+    try:
+        compiled = compile(code, SCENE_FILENAME, "exec")
+        namespace = {"__name__": "__edudiff_scene__"}
+        exec(compiled, namespace)
+        scene_cls = namespace[scene_name]
+        with tempconfig({"dry_run": True, "disable_caching": True, "media_dir": media_dir,
+                         "quality": "low_quality", "progress_bar": "none", "verbosity": "ERROR"}):
+            scene = scene_cls(renderer=CairoRenderer(skip_animations=True))
+            scene.render()
+        return {"ok": True}
+    except Exception as e:
+        lineno = None
+        for frame in traceback.extract_tb(e.__traceback__):
+            if frame.filename == SCENE_FILENAME:
+                lineno = frame.lineno
+        return {"ok": False, "kind": "runtime", "error_type": type(e).__name__,
+                "message": str(e)[:2000], "lineno": lineno}
+
+
+def _worker_main(conn):
+    import tempfile
+
+    import manim  # noqa: F401  (warm the import once for every request this worker serves)
+
+    media_dir = tempfile.mkdtemp(prefix="edudiff_validate_")
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        code, scene_name = request
+        conn.send(_dry_run_in_worker(code, scene_name, media_dir))
+
+
+class DryRunWorker:
+    """A long-lived process with manim imported, serving dry-run requests one at a time."""
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(target=_worker_main, args=(child_conn,), daemon=True,
+                                          name="manim-dry-run")
+        self._process.start()
+        self._conn = parent_conn
+
+    def _restart(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join(timeout=5)
+        self._process = None
+
+    def run(self, code: str, scene_name: str, timeout: float = VALIDATOR_TIMEOUT) -> dict:
+        with self._lock:
+            self._ensure_started()
+            self._conn.send((code, scene_name))
+            if not self._conn.poll(timeout):
+                self._restart()
+                return {"ok": False, "kind": "timeout", "error_type": "TimeoutError",
+                        "message": f"Dry run exceeded {timeout:.0f}s", "lineno": None}
+            try:
+                return self._conn.recv()
+            except EOFError:
+                self._restart()
+                return {"ok": False, "kind": "crash", "error_type": "WorkerCrash",
+                        "message": "Dry-run worker exited unexpectedly", "lineno": None}
+
+
+class DryRunPool:
+    """A few ``DryRunWorker`` processes, so one slow scene does not hold up every other validation."""
+
+    def __init__(self, size: int = VALIDATOR_WORKERS):
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(DryRunWorker())
+
+    def run(self, code: str, scene_name: str, timeout: float = VALIDATOR_TIMEOUT) -> dict:
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return {"ok": False, "kind": "busy", "error_type": "TimeoutError",
+                    "message": f"No dry-run worker free within {timeout:.0f}s", "lineno": None}
+        try:
+            return worker.run(code, scene_name, timeout)
+        finally:
+            self._idle.put(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_dry_run_pool() -> DryRunPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DryRunPool()
+        return _pool
+
+
+def validate_scene(code: str, scene_name: Optional[str] = None, dry_run: Optional[bool] = None) -> str:
+    """
+    Validate a generated scene before rendering.
+
+    Returns:
+        str: The scene class name.
+
+    Raises:
+        SceneValidationError: With a structured description of the first problem found.
+    """
+    scene_name = check_ast(code, scene_name)
+
+    if dry_run if dry_run is not None else VALIDATOR_DRY_RUN:
+        result = get_dry_run_pool().run(code, scene_name)
+        if not result["ok"] and result["kind"] in INCONCLUSIVE_KINDS:
+            logger.warning(f"Dry run inconclusive ({result['message']}); leaving {scene_name} to the render")
+        elif not result["ok"]:
+            raise SceneValidationError(result["kind"], result["message"], lineno=result.get("lineno"),
+                                       name=scene_name, error_type=result.get("error_type"))
+    return scene_name
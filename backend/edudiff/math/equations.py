@@ -0,0 +1,418 @@
+"""
+Local solver for linear and quadratic equations in one variable.
+
+``solve_equation("solve 2(x + 1) = 3x - 4")`` parses the equation, works it
+out with exact rational arithmetic and returns the algebraic steps, each as
+LaTeX parts (so consecutive steps can be morphed with TransformMatchingTex)
+plus a one-line note. ``scene_code`` turns a solution into a scene built on
+``manim_engine.equation_transform.EquationTransformScene``: the scene class is
+fixed, only the step data changes, so there is no LLM call and nothing to
+validate or repair beyond a data literal.
+
+Anything that is not a single-variable polynomial equation of degree 1 or 2
+returns None and takes the regular path.
+"""
+
+import ast
+import math
+import re
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+# Highest degree the local path solves
+MAX_DEGREE = 2
+# Largest constant (literal or folded power, e.g. "2^10"), in bits of numerator and denominator
+MAX_CONSTANT_BITS = 40
+# Square factors tried when simplifying a root; larger ones stay under the radical
+MAX_SQRT_FACTOR = 1000
+
+# "y = ...", "f(x) = ..." and "at x = 2" define things; they do not make the concept an equation to solve
+DEFINITION_EQUALS_RE = re.compile(r"\b(?:y|f\s*\(\s*x\s*\))\s*=|\b(?:at|from|to)\s+x\s*=")
+
+_TOKEN_RE = re.compile(r"\s*(\d+(?:\.\d+)?|\.\d+|[a-z]+|\*\*|[-+*/^()²³])", re.IGNORECASE)
+_SUPERSCRIPTS = {"²": "^2", "³": "^3"}
+
+Poly = Dict[int, Fraction]
+
+
+class EquationError(ValueError):
+    """The text is not a polynomial equation the local solver handles."""
+
+
+# --- parsing -------------------------------------------------------------------
+
+def _side_tokens(text: str, start: int, step: int) -> List[str]:
+    """Math tokens next to the '=' at ``start``, read outwards (step -1: leftwards)."""
+    if step < 0:
+        # Tokenize the whole prefix, then keep the trailing run of math tokens
+        tokens, pos = [], 0
+        prefix = text[:start]
+        while pos < len(prefix):
+            match = _TOKEN_RE.match(prefix, pos)
+            if match is None:
+                if not prefix[pos].isspace():
+                    tokens.append(None)
+                pos += 1
+                continue
+            tokens.append(match.group(1))
+            pos = match.end()
+        run = []
+        for token in reversed(tokens):
+            if token is None or (token.isalpha() and len(token) > 1):
+                break
+            run.append(token)
+        return run[::-1]
+
+    run, pos = [], start + 1
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            if text[pos].isspace():
+                pos += 1
+                continue
+            break
+        token = match.group(1)
+        if token.isalpha() and len(token) > 1:
+            break
+        run.append(token)
+        pos = match.end()
+    return run
+
+
+def _to_source(tokens: List[str], variable: str) -> str:
+    """Python source for a token run, with implicit multiplication made explicit."""
+    out = []
+    for token in tokens:
+        token = _SUPERSCRIPTS.get(token, token)
+        if token in ("^", "^2", "^3"):
+            out.append("**" + token[1:] if len(token) > 1 else "**")
+            continue
+        value_like = token[0].isdigit() or token[0] == "." or token == variable or token == "("
+        if out and value_like and (out[-1][-1].isdigit() or out[-1] in (variable, ")")):
+            out.append("*")
+        out.append(token)
+    return " ".join(out)
+
+
+def _poly_mul(a: Poly, b: Poly) -> Poly:
+    out: Poly = {}
+    for da, ca in a.items():
+        for db, cb in b.items():
+            out[da + db] = out.get(da + db, Fraction(0)) + ca * cb
+    return {d: c for d, c in out.items() if c}
+
+
+def _poly_add(a: Poly, b: Poly, sign: int = 1) -> Poly:
+    out = dict(a)
+    for d, c in b.items():
+        out[d] = out.get(d, Fraction(0)) + sign * c
+    return {d: c for d, c in out.items() if c}
+
+
+def _degree(p: Poly) -> int:
+    return max(p) if p else 0
+
+
+def _bits(value: Fraction) -> int:
+    return max(abs(value.numerator).bit_length(), value.denominator.bit_length())
+
+
+def _evaluate(node: ast.AST, variable: str) -> Poly:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, variable)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = Fraction(str(node.value))
+        if _bits(value) > MAX_CONSTANT_BITS:
+            raise EquationError("constant too large")
+        return {0: value} if value else {}
+    if isinstance(node, ast.Name) and node.id == variable:
+        return {1: Fraction(1)}
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _evaluate(node.operand, variable)
+        return {d: -c for d, c in operand.items()} if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(node.left, variable)
+        if isinstance(node.op, ast.Pow):
+            exponent = _evaluate(node.right, variable)
+            if set(exponent) - {0} or exponent.get(0, Fraction(0)).denominator != 1:
+                raise EquationError("exponents must be whole numbers")
+            power = int(exponent.get(0, 0))
+            if power < 0:
+                raise EquationError("negative exponent")
+            if _degree(left) == 0:
+                base = left.get(0, Fraction(0))
+                if power * _bits(base) > MAX_CONSTANT_BITS:
+                    raise EquationError("constant too large")
+                value = base ** power
+                return {0: value} if value else {}
+            if power > MAX_DEGREE + 1 or power * _degree(left) > MAX_DEGREE + 1:
+                raise EquationError("degree too high")
+            result: Poly = {0: Fraction(1)}
+            for _ in range(power):
+                result = _poly_mul(result, left)
+            return result
+        right = _evaluate(node.right, variable)
+        if isinstance(node.op, ast.Add):
+            return _poly_add(left, right)
+        if isinstance(node.op, ast.Sub):
+            return _poly_add(left, right, -1)
+        if isinstance(node.op, ast.Mult):
+            return _poly_mul(left, right)
+        if isinstance(node.op, ast.Div):
+            if set(right) != {0}:
+                raise EquationError("division by an expression in the variable")
+            return {d: c / right[0] for d, c in left.items()}
+    raise EquationError("unsupported expression")
+
+
+def parse_equation(text: str) -> Optional[Tuple[str, str, str, Poly, Poly]]:
+    """
+    Find a single-variable polynomial equation in ``text``.
+
+    Returns:
+        tuple: (variable, left source, right source, left poly, right poly), or None.
+    """
+    text = text.casefold()
+    if text.count("=") != 1 or "==" in text:
+        return None
+    split = text.index("=")
+    if any(m.end() == split + 1 for m in DEFINITION_EQUALS_RE.finditer(text)):
+        return None  # a function definition or a point / bound: "at x = 2", "f(x) = x^2"
+    left = _side_tokens(text, split, -1)
+    right = _side_tokens(text, split, 1)
+    while right and right[-1] in ("+", "-", "*", "/", "^", "**"):
+        right.pop()
+    if not left or not right:
+        return None
+
+    letters = {t for t in left + right if t.isalpha()}
+    if len(letters) != 1:
+        return None
+    variable = letters.pop()
+    if [variable] in (left, right) and variable not in (right if left == [variable] else left):
+        return None  # already solved: "r = 5" gives a value, it does not ask for one
+
+    try:
+        lhs = _evaluate(ast.parse(_to_source(left, variable), mode="eval"), variable)
+        rhs = _evaluate(ast.parse(_to_source(right, variable), mode="eval"), variable)
+    except (SyntaxError, EquationError, ZeroDivisionError):
+        return None
+    moved = _poly_add(lhs, rhs, -1)
+    if not 1 <= _degree(moved) <= MAX_DEGREE:
+        return None
+    return variable, " ".join(left), " ".join(right), lhs, rhs
+
+
+# --- LaTeX ---------------------------------------------------------------------
+
+def _number(value: Fraction) -> str:
+    if value.denominator == 1:
+        return str(value.numerator)
+    sign = "-" if value < 0 else ""
+    return f"{sign}\\frac{{{abs(value.numerator)}}}{{{value.denominator}}}"
+
+
+def _term(coefficient: Fraction, degree: int, variable: str) -> str:
+    """One term without its sign."""
+    magnitude = abs(coefficient)
+    power = "" if degree == 0 else variable if degree == 1 else f"{variable}^{{{degree}}}"
+    if degree and magnitude == 1:
+        return power
+    return _number(magnitude) + power
+
+
+def poly_parts(p: Poly, variable: str) -> List[str]:
+    """LaTeX parts for a polynomial, highest degree first: ['2x', '+', '3']."""
+    if not p:
+        return ["0"]
+    parts = []
+    for degree in sorted(p, reverse=True):
+        c = p[degree]
+        if parts:
+            parts.extend(["-" if c < 0 else "+", _term(c, degree, variable)])
+        else:
+            parts.append(("-" if c < 0 else "") + _term(c, degree, variable))
+    return parts
+
+
+def _source_tex(source: str) -> str:
+    """How the user wrote a side, as LaTeX."""
+    tex = source.replace("**", "^").replace(" * ", " \\cdot ").replace(" ", "")
+    tex = re.sub(r"\^(\d+)", r"^{\1}", tex)
+    for sym, repl in _SUPERSCRIPTS.items():
+        tex = tex.replace(sym, "^{" + repl[1:] + "}")
+    return tex
+
+
+def _plain(value: Fraction) -> str:
+    return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+def _sqrt_tex(value: Fraction) -> str:
+    """Simplified square root of a positive rational: 2\\sqrt{3}, \\frac{\\sqrt{5}}{2}."""
+    num, den = value.numerator * value.denominator, value.denominator  # rationalize: sqrt(n/d) = sqrt(n*d)/d
+    outside, inside = 1, num
+    k = 2
+    while k <= MAX_SQRT_FACTOR and k * k <= inside:
+        while inside % (k * k) == 0:
+            inside //= k * k
+            outside *= k
+        k += 1
+    g = math.gcd(outside, den)
+    outside, den = outside // g, den // g
+    root = ("" if outside == 1 else str(outside)) + (f"\\sqrt{{{inside}}}" if inside != 1 else "")
+    root = root or "1"
+    return root if den == 1 else f"\\frac{{{root}}}{{{den}}}"
+
+
+def _exact_sqrt(value: Fraction) -> Optional[Fraction]:
+    if value < 0:
+        return None
+    n, d = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if n * n == value.numerator and d * d == value.denominator:
+        return Fraction(n, d)
+    return None
+
+
+def _signed(value: Fraction) -> List[str]:
+    """'- 3' / '+ 3' parts for a binomial like (x - 3)."""
+    return ["-" if value > 0 else "+", _number(abs(value))]
+
+
+# --- solving -------------------------------------------------------------------
+
+def _step(parts: List[str], note: str) -> dict:
+    return {"tex": parts, "note": note}
+
+
+def _solve_linear(variable: str, lhs: Poly, rhs: Poly, steps: List[dict]) -> List[Tuple[str, str]]:
+    if not lhs.get(1):
+        lhs, rhs = rhs, lhs
+        steps.append(_step(poly_parts(lhs, variable) + ["="] + poly_parts(rhs, variable), "Swap the two sides"))
+    a, b = lhs.get(1, Fraction(0)), lhs.get(0, Fraction(0))
+    c, d = rhs.get(1, Fraction(0)), rhs.get(0, Fraction(0))
+    if c:
+        a -= c
+        verb = "Subtract" if c > 0 else "Add"
+        steps.append(_step(poly_parts({1: a, 0: b} if b else {1: a}, variable) + ["="] +
+                           poly_parts({0: d}, variable), f"{verb} {_term(c, 1, variable)} on both sides"))
+    if b:
+        d -= b
+        verb = "Subtract" if b > 0 else "Add"
+        steps.append(_step(poly_parts({1: a}, variable) + ["="] + poly_parts({0: d}, variable),
+                           f"{verb} {_number(abs(b))} on both sides"))
+    solution = d / a
+    if a != 1:
+        steps.append(_step([variable, "=", _number(solution)], f"Divide both sides by {_number(a)}"))
+    return [(_number(solution), _plain(solution))]
+
+
+def _solve_quadratic(variable: str, moved: Poly, steps: List[dict]) -> List[Tuple[str, str]]:
+    a, b, c = (moved.get(k, Fraction(0)) for k in (2, 1, 0))
+    if a < 0:
+        a, b, c = -a, -b, -c
+        moved = {k: -v for k, v in moved.items()}
+        steps.append(_step(poly_parts(moved, variable) + ["=", "0"], "Multiply both sides by -1"))
+    x = variable
+    disc = b * b - 4 * a * c
+    root = _exact_sqrt(disc)
+
+    if root is not None:
+        r1, r2 = (-b - root) / (2 * a), (-b + root) / (2 * a)
+        lead = [] if a == 1 else [_number(a)]
+        if r1 == r2:
+            steps.append(_step(lead + ["(", x] + _signed(r1) + [")^{2}", "=", "0"], "Factor as a perfect square"))
+            steps.append(_step([x, "=", _number(r1)], "Set the square to zero"))
+            return [(_number(r1), _plain(r1))]
+        if not c:
+            steps.append(_step(lead + [x, "(", x] + _signed(r2) + [")", "=", "0"], f"Factor out {x}"))
+        else:
+            steps.append(_step(lead + ["(", x] + _signed(r1) + [")", "(", x] + _signed(r2) + [")", "=", "0"],
+                               "Factor"))
+        steps.append(_step([x, "=", _number(r1), r"\text{ or }", x, "=", _number(r2)],
+                           "Set each factor to zero"))
+        return [(_number(r1), _plain(r1)), (_number(r2), _plain(r2))]
+
+    steps.append(_step([x, "=", r"\frac{-b \pm \sqrt{b^{2} - 4ac}}{2a}"], "Use the quadratic formula"))
+    steps.append(_step([x, "=", f"\\frac{{{_number(-b)} \\pm \\sqrt{{{_number(disc)}}}}}{{{_number(2 * a)}}}"],
+                       f"Substitute a = {_number(a)}, b = {_number(b)}, c = {_number(c)}"))
+    if disc < 0:
+        steps.append(_step([r"b^{2} - 4ac", "=", _number(disc), "<", "0"],
+                           "The discriminant is negative: no real solutions"))
+        return []
+    centre, spread = -b / (2 * a), _sqrt_tex(disc / (4 * a * a))
+    centre_tex = f"{_number(centre)} " if centre else ""
+    steps.append(_step([x, "=", f"{centre_tex}\\pm {spread}"], "Simplify"))
+    half = math.sqrt(disc / (4 * a * a))
+    r1, r2 = float(centre) - half, float(centre) + half
+    steps.append(_step([x, r"\approx", f"{r1:.3f}", r"\text{ or }", x, r"\approx", f"{r2:.3f}"], "Approximate"))
+    return [(f"{centre_tex}- {spread}".strip(), f"{r1:.3f}"), (f"{centre_tex}+ {spread}" if centre else spread, f"{r2:.3f}")]
+
+
+def solve_equation(text: str) -> Optional[dict]:
+    """
+    Solve a linear or quadratic equation in one variable, showing the steps.
+
+    Args:
+        text: A concept or question containing the equation, e.g. "solve 3x - 4 = 11".
+
+    Returns:
+        dict: equation, variable, kind ('linear'/'quadratic'), steps (tex parts + note),
+        solutions (LaTeX) and a plain-text explanation; None if no supported equation is found.
+    """
+    parsed = parse_equation(text)
+    if parsed is None:
+        return None
+    variable, left_src, right_src, lhs, rhs = parsed
+    moved = _poly_add(lhs, rhs, -1)
+    kind = "quadratic" if _degree(moved) == 2 else "linear"
+
+    original = [_source_tex(left_src), "=", _source_tex(right_src)]
+    simplified = poly_parts(lhs, variable) + ["="] + poly_parts(rhs, variable)
+    if "".join(simplified) == "".join(original):
+        steps = [_step(simplified, "Start with the equation")]
+    else:
+        steps = [_step(original, "Start with the equation"), _step(simplified, "Expand and combine like terms")]
+
+    if kind == "linear":
+        solutions = _solve_linear(variable, lhs, rhs, steps)
+    else:
+        if rhs:
+            steps.append(_step(poly_parts(moved, variable) + ["=", "0"], "Move every term to the left side"))
+        solutions = _solve_quadratic(variable, moved, steps)
+
+    equation = f"{left_src} = {right_src}".replace(" ", "")
+    exact = all("sqrt" not in tex for tex, _plain_value in solutions)
+    if solutions:
+        relation = "=" if exact else "≈"
+        answer = " or ".join(f"{variable} {relation} {value}" for _tex, value in solutions)
+        explanation = f"Solving {equation} for {variable} gives {answer}."
+    else:
+        explanation = f"{equation} has no real solutions."
+    return {
+        "equation": equation,
+        "variable": variable,
+        "kind": kind,
+        "steps": steps,
+        "solutions": [f"{variable} = {tex}" for tex, _plain_value in solutions],
+        "explanation": explanation,
+    }
+
+
+def step_lines(solution: dict) -> List[str]:
+    """The steps as plain text lines (the shape of ``math.steps.generate_math_steps`` output)."""
+    return [f"{step['note']}: {' '.join(step['tex'])}" for step in solution["steps"]]
+
+
+def scene_code(solution: dict) -> str:
+    """Scene source rendering ``solution`` with EquationTransformScene."""
+    steps = "".join(f"        {{'tex': {step['tex']!r}, 'note': {step['note']!r}}},\n" for step in solution["steps"])
+    return f'''from manim import *
+from edudiff.manim_engine.equation_transform import EquationTransformScene
+
+
+class MainScene(EquationTransformScene):
+    steps = [
+{steps}    ]
+    explanation = {solution["explanation"]!r}
+'''
@@ -0,0 +1,204 @@
+"""
+Per-job stage checkpoints for the generate_video pipeline.
+
+Each stage output is persisted under ``<root>/<job_key>/`` as soon as it is
+produced, so a retry (or a "fix and re-render" request) resumes from the first
+incomplete stage instead of repeating the LLM and TTS calls.
+
+Stages, in order:
+    steps   -> steps.json   (math tutor output)
+    code    -> code.py      (generated Manim code)
+    voice   -> voice.json   (narration script)
+    audio   -> audio.json   (segment index -> WAV path, files linked into audio/)
+    script  -> scene.py     (code with narration injected)
+    video   -> video.json   (path of the rendered video)
+
+The key covers the question and the settings that shape the outputs, so a
+change of narration mode or quality starts a fresh job. Two requests for the
+same job do not interleave: ``locked`` holds the job directory for a run, and
+the second one resumes from what the first produced. Stages older than
+PIPELINE_CHECKPOINT_TTL, or written by an older checkpoint format, are
+treated as missing.
+
+Configuration (environment):
+    PIPELINE_JOBS_DIR         checkpoint root (default: tmp/jobs)
+    PIPELINE_CHECKPOINT_TTL   seconds a completed stage is reused (default: 604800, one week)
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+from ..audio.cache import link_or_copy
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("steps", "code", "voice", "audio", "script", "video")
+
+JOBS_DIR = os.getenv("PIPELINE_JOBS_DIR", os.path.join("tmp", "jobs"))
+CHECKPOINT_TTL = float(os.getenv("PIPELINE_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+
+# Bumped when stage contents change shape; checkpoints of other versions are ignored
+CHECKPOINT_VERSION = 2
+
+_STAGE_FILES = {
+    "steps": "steps.json",
+    "code": "code.py",
+    "voice": "voice.json",
+    "audio": "audio.json",
+    "script": "scene.py",
+    "video": "video.json",
+}
+
+
+def job_key_for(question: str, settings: Optional[dict] = None) -> str:
+    """
+    Default job key: a short hash of the whitespace/case-normalized question and ``settings``.
+
+    Args:
+        question: The pipeline question.
+        settings: Render settings the stage outputs depend on (e.g. narration mode, quality).
+    """
+    normalized = " ".join(question.lower().split())
+    if settings:
+        normalized += "\n" + json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_write(path: str, content: str):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class JobCheckpoint:
+    """Stage store for a single pipeline job."""
+
+    def __init__(self, job_key: str, root: Optional[str] = None):
+        self.job_key = job_key
+        self.dir = os.path.abspath(os.path.join(root or JOBS_DIR, job_key))
+        self.audio_dir = os.path.join(self.dir, "audio")
+        os.makedirs(self.dir, exist_ok=True)
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self.meta = self._read_meta()
+
+    # --- metadata ------------------------------------------------------------
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        if not meta or meta.get("version") != CHECKPOINT_VERSION:
+            meta = {"job_key": self.job_key, "version": CHECKPOINT_VERSION, "stages": {}}
+        return meta
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Hold the job directory for one run; another run of the same job waits here.
+
+        The metadata is re-read once the lock is held, so the waiting run sees the stages the
+        previous one completed.
+        """
+        fd = os.open(os.path.join(self.dir, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info(f"Job {self.job_key}: waiting for another run of the same job")
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            self.meta = self._read_meta()
+            yield self
+        finally:
+            os.close(fd)
+
+    def _write_meta(self):
+        _atomic_write(self._meta_path, json.dumps(self.meta, indent=2))
+
+    def update_meta(self, **fields):
+        """Store extra job metadata (e.g. last error, render settings)."""
+        self.meta.update(fields)
+        self._write_meta()
+
+    # --- stages --------------------------------------------------------------
+
+    def _path(self, stage: str) -> str:
+        return os.path.join(self.dir, _STAGE_FILES[stage])
+
+    def has(self, stage: str) -> bool:
+        if stage not in self.meta["stages"] or not os.path.exists(self._path(stage)):
+            return False
+        if time.time() - self.meta["stages"][stage].get("completed_at", 0) > CHECKPOINT_TTL:
+            return False
+        if stage == "audio":
+            return all(os.path.exists(p) for p in self.load("audio").values())
+        if stage == "video":
+            return bool(self.load("video")) and os.path.exists(self.load("video"))
+        return True
+
+    def load(self, stage: str):
+        with open(self._path(stage), "r", encoding="utf-8") as f:
+            content = f.read()
+        if stage in ("code", "script"):
+            return content
+        data = json.loads(content)
+        if stage == "audio":
+            return {int(k): v for k, v in data.items()}
+        if stage == "video":
+            return data.get("path")
+        return data
+
+    def save(self, stage: str, value):
+        """Persist a stage output and mark the stage complete."""
+        if stage in ("code", "script"):
+            content = value
+        elif stage == "audio":
+            value = self._adopt_audio(value)
+            content = json.dumps({str(k): v for k, v in value.items()}, indent=2)
+        elif stage == "video":
+            content = json.dumps({"path": value})
+        else:
+            content = json.dumps(value, indent=2)
+
+        _atomic_write(self._path(stage), content)
+        self.meta["stages"][stage] = {"completed_at": time.time()}
+        self._write_meta()
+        return value
+
+    def _adopt_audio(self, audio_files: dict) -> dict:
+        """Link (or copy) segment WAVs into the job directory so they outlive tmp/audio cleanup."""
+        os.makedirs(self.audio_dir, exist_ok=True)
+        adopted = {}
+        for index, path in audio_files.items():
+            target = os.path.join(self.audio_dir, f"segment_{index}.wav")
+            if os.path.abspath(path) != target:
+                with contextlib.suppress(OSError):
+                    os.remove(target)
+                link_or_copy(path, target)
+            adopted[index] = target
+        return adopted
+
+    def invalidate_from(self, stage: str):
+        """Mark ``stage`` and every later stage incomplete."""
+        for later in STAGES[STAGES.index(stage):]:
+            self.meta["stages"].pop(later, None)
+        self._write_meta()
+
+    def first_incomplete(self) -> Optional[str]:
+        for stage in STAGES:
+            if not self.has(stage):
+                return stage
+        return None
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -1,27 +1,76 @@
 import os
-import uuid
-import ast
+import tempfile
+import time
 import wave
 import contextlib
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 
 from ..math.steps import generate_math_steps
+from ..math.equations import scene_code, solve_equation, step_lines
 from ..prompts.manim_prompt import generate_manim_code
 from ..prompts.voice_prompt import generate_voice_script
-from ..audio.tts import generate_audio_segment
+from ..audio.tts import synthesize_segments
+from ..audio.cache import get_tts_cache
+from ..audio.track import build_narration_track, mux_narration, mux_narration_with_holds
+from ..audio.narration_packs import get_pack
 from ..manim_engine.renderer import render_scene
+from ..manim_engine.validator import SceneValidationError, validate_scene
+from ..manim_engine.repair import get_repair_cache
+from ..manim_engine.duration import (DurationBudgetError, animation_end_times, enforce_duration_budget,
+                                     narration_offsets)
+from ..manim_engine.cost import SceneCostError, check_admission, estimate_cost
+from ..manim_engine.scene_ir import NARRATION_MARKER, parse_scene
+from ..manim_engine.templates import select_template
+from ..services.jobs import RenderCancelled
+from ..services.scheduler import SchedulerRejected
+from .checkpoint import JobCheckpoint, STAGES, job_key_for
 
 logger = logging.getLogger(__name__)
 
+# Local repair attempts (validation + render) before a failure is surfaced
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+
+# Manim quality flag for pipeline renders; also selects the duration budget
+RENDER_QUALITY = "l"
+
+# "mux": render silent and mux one narration track with ffmpeg afterwards;
+# "overlap": as "mux", but the scene renders while the voice script and TTS run,
+# and the narration pauses are inserted into the video afterwards;
+# "inline": manim mixes a self.add_sound per segment during the render
+NARRATION_MODE = os.getenv("NARRATION_MODE", "mux").lower()
+
+# Silent renders running alongside narration in "overlap" mode
+silent_render_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("OVERLAP_RENDER_WORKERS", "2")),
+    thread_name_prefix="silent-render"
+)
+
 def get_wav_duration(file_path: str) -> float:
-    """Returns duration of a wav file in seconds."""
+    """Returns duration of a wav file in seconds (from the TTS cache index when it knows the file)."""
+    cache = get_tts_cache()
+    duration = cache.duration(file_path) if cache is not None else None
+    if duration is not None:
+        return duration
     with contextlib.closing(wave.open(file_path, 'r')) as f:
         frames = f.getnframes()
         rate = f.getframerate()
         return frames / float(rate)
 
-def inject_audio_into_script(script_content: str, voice_data: dict, audio_files: Dict[int, str]) -> str:
+def narration_hold(audio_path: str) -> float:
+    """Seconds the scene holds for a narration segment: its length plus a pause, at least 2s."""
+    try:
+        duration = get_wav_duration(audio_path)
+        # Add a small buffer as requested ("Add self.wait(2) minimum")
+        padding = 0.5
+        return max(duration + padding, 2.0)
+    except Exception as e:
+        logger.error(f"Failed to get duration for {audio_path}: {e}")
+        return 2.0 # Fallback
+
+def inject_audio_into_script(script_content: str, voice_data: dict, audio_files: Dict[int, str],
+                             mode: Optional[str] = None) -> str:
     """
     Injects audio playback and wait calls into the Manim script using AST.
     
@@ -29,34 +78,25 @@ def inject_audio_into_script(script_content: str, voice_data: dict, audio_files:
         script_content: The original Python script.
         voice_data: The JSON voice data containing segments.
         audio_files: Dict mapping segment index to audio file path.
+        mode: "inline" injects ``self.add_sound``; "mux" (default: NARRATION_MODE) injects
+            only a ``"narration N"`` marker, and the audio is muxed by ``narrate_video``.
     """
+    mode = mode or NARRATION_MODE
+    if not voice_data.get("segments"):
+        # Nothing to narrate (e.g. locally solved equations)
+        return script_content
+
     try:
-        tree = ast.parse(script_content)
+        ir = parse_scene(script_content)
     except SyntaxError as e:
         logger.error(f"Failed to parse generated Manim code for audio injection: {e}")
         raise RuntimeError(f"Manim code generation failed: Syntactically invalid Python code. Error: {e}") from e
 
-    # Find the construct method
-    construct_node = None
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef) and node.name == 'construct':
-            construct_node = node
-            break
-    
-    if not construct_node:
+    if ir.construct is None:
         raise RuntimeError("Manim audio injection failed: No 'construct' method found in generated scene.")
 
-    # Identify animation steps (self.play, self.add)
-    # Map animation_index -> node.end_lineno
-    animation_end_lines = []
-    
-    for node in construct_node.body:
-        # Check for self.play or self.add calls
-        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
-            call = node.value
-            if isinstance(call.func, ast.Attribute) and isinstance(call.func.value, ast.Name) and call.func.value.id == 'self':
-                if call.func.attr in ['play', 'add']:
-                    animation_end_lines.append(node.end_lineno)
+    # Animation steps (top-level self.play / self.add), in the order voice segments index them
+    animation_end_lines = [animation.end_lineno for animation in ir.animations]
     
     lines = script_content.splitlines()
     insertions = [] # List of (line_index, code_lines)
@@ -74,22 +114,17 @@ def inject_audio_into_script(script_content: str, voice_data: dict, audio_files:
             logger.warning(f"Voice segment {i} has no corresponding audio file. Skipping injection.")
             continue
             
-        # Get duration
-        duration = 0.0
-        try:
-            duration = get_wav_duration(audio_path)
-            # Add a small buffer as requested ("Add self.wait(2) minimum")
-            padding = 0.5
-            wait_time = max(duration + padding, 2.0)
-        except Exception as e:
-            logger.error(f"Failed to get duration for {audio_path}: {e}")
-            wait_time = 2.0 # Fallback
-
-        # Escape path for python string
-        safe_path = audio_path.replace("\\", "/")
+        wait_time = narration_hold(audio_path)
+
+        if mode == "inline":
+            # Escape path for python string
+            safe_path = audio_path.replace("\\", "/")
+            sound_line = f"        self.add_sound('{safe_path}')"
+        else:
+            sound_line = f"        {NARRATION_MARKER.format(index=i)!r}"
         
         injection_code = [
-            f"        self.add_sound('{safe_path}')",
+            sound_line,
             f"        self.wait({wait_time:.2f})"
         ]
 
@@ -127,28 +162,190 @@ def inject_audio_into_script(script_content: str, voice_data: dict, audio_files:
 
     final_content = "\n".join(lines)
     
-    # Verification: Confirm string "add_sound" exists if we expected insertions
-    if voice_segments and "add_sound" not in final_content:
-        raise RuntimeError("Audio injection verification failed: 'add_sound' not found in final script string.")
+    # Verification: Confirm the sound call (or marker) exists if we expected insertions
+    expected = "add_sound" if mode == "inline" else "'narration "
+    if voice_segments and insertions and expected not in final_content:
+        raise RuntimeError(f"Audio injection verification failed: {expected!r} not found in final script string.")
         
     return final_content
 
+def narrate_video(video_path: str, script_content: str, audio_files: Dict[int, str],
+                  output_path: Optional[str] = None) -> str:
+    """
+    Mux the narration of a silently rendered scene onto its video.
+
+    Segments are placed at the planned start of their marked waits in
+    ``script_content`` (the script that was rendered).
+
+    Args:
+        video_path: Silent render.
+        script_content: Scene source with narration markers (``inject_audio_into_script``, mode "mux").
+        audio_files: Segment index -> WAV path.
+        output_path: Narrated video (default: ``<video>_narrated.mp4`` next to the render).
+
+    Returns:
+        str: Path of the narrated video, or ``video_path`` if the script has no narration.
+    """
+    offsets = narration_offsets(script_content)
+    clips = [(offsets[i], path) for i, path in audio_files.items() if i in offsets]
+    if not clips:
+        return video_path
+    output_path = output_path or f"{os.path.splitext(video_path)[0]}_narrated.mp4"
+    with tempfile.TemporaryDirectory(prefix="narration_") as work_dir:
+        track_path = build_narration_track(clips, os.path.join(work_dir, "narration.wav"))
+        mux_narration(video_path, track_path, output_path)
+    logger.info(f"Muxed {len(clips)} narration segment(s) onto {output_path}")
+    return output_path
+
 
-def generate_video(question: str, output_dir: str = "static/videos"):
+def reconcile_narration(video_path: str, script_content: str, voice_data: dict, audio_files: Dict[int, str],
+                        output_path: Optional[str] = None) -> str:
+    """
+    Narrate a scene that was rendered without narration waits.
+
+    Each segment gets the hold ``inject_audio_into_script`` would have given it,
+    as a frozen frame at the end of its animation, and plays from the start of
+    that hold.
+
+    Args:
+        video_path: Render of ``script_content``.
+        script_content: The rendered scene source (no narration injected).
+        voice_data: Voice JSON whose segments index ``script_content``'s animations.
+        audio_files: Segment index -> WAV path.
+        output_path: Narrated video (default: ``<video>_narrated.mp4`` next to the render).
+
+    Returns:
+        str: Path of the narrated video, or ``video_path`` if nothing is narrated.
+    """
+    ends = animation_end_times(script_content)
+    if not ends:
+        return video_path
+    holds, clips, shift = [], [], 0.0
+    for i, segment in enumerate(voice_data.get("segments", [])):
+        if not audio_files.get(i):
+            continue
+        index = segment.get("start_after_animation", 0)
+        at = ends[index] if 0 <= index < len(ends) else ends[-1]
+        hold = narration_hold(audio_files[i])
+        if holds and at < holds[-1][0]:
+            at = holds[-1][0]  # segments play in order, even if their animations do not
+        if holds and at == holds[-1][0]:
+            holds[-1] = (at, holds[-1][1] + hold)
+        else:
+            holds.append((at, hold))
+        clips.append((at + shift, audio_files[i]))
+        shift += hold
+    if not clips:
+        return video_path
+    output_path = output_path or f"{os.path.splitext(video_path)[0]}_narrated.mp4"
+    with tempfile.TemporaryDirectory(prefix="narration_") as work_dir:
+        track_path = build_narration_track(clips, os.path.join(work_dir, "narration.wav"))
+        mux_narration_with_holds(video_path, track_path, holds, output_path)
+    logger.info(f"Held {len(holds)} frame(s) for {shift:.1f}s and muxed {len(clips)} narration segment(s) "
+                f"onto {output_path}")
+    return output_path
+
+
+def _remove_intermediate(path: Optional[str], final: Optional[str]):
+    """Delete an intermediate render once the narrated video (``final``) replaces it."""
+    if path and path != final:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+
+def _abandon_render(future):
+    """Cancel a background render nobody will use; one already running has its video deleted when it ends."""
+    if future.cancel():
+        return
+
+    def discard(done):
+        if done.exception() is None:
+            _remove_intermediate(done.result(), None)
+
+    future.add_done_callback(discard)
+
+
+def generate_video(question: str, output_dir: str = "static/videos", job_key: Optional[str] = None,
+                   resume: bool = True, code_override: Optional[str] = None,
+                   script_override: Optional[str] = None):
     """
     Generates a Manim video for the given math question using Gemini for code and voice.
+
+    Every stage output is checkpointed under ``job_key`` (default: a hash of the
+    question and render settings). With ``resume`` a retry continues from the
+    first incomplete stage; a concurrent run of the same job waits for this one.
+
+    Args:
+        question: The math question.
+        output_dir: Directory the rendered video is written to.
+        job_key: Checkpoint key; defaults to ``job_key_for(question, settings)``.
+        resume: Reuse completed stages from a previous attempt.
+        code_override: Fixed Manim code; replaces the code stage and redoes voice, audio and injection.
+        script_override: Fixed final script; replaces the injected script and only re-renders.
     """
-    # 1. Generate Math Steps (Text)
-    logger.info(f"Generating math steps for: {question}")
-    steps_data = generate_math_steps(question)
-    
-    # Format a concept string for the Manim coder
-    if isinstance(steps_data["steps"], list):
-        steps_text = "\n".join(steps_data["steps"])
-    else:
-        steps_text = str(steps_data["steps"])
-        
-    full_concept = f"""
+    settings = {"narration": NARRATION_MODE, "quality": RENDER_QUALITY}
+    ckpt = JobCheckpoint(job_key or job_key_for(question, settings))
+    with ckpt.locked():
+        return _run_pipeline(ckpt, question, output_dir, resume, code_override, script_override)
+
+
+def _run_pipeline(ckpt: JobCheckpoint, question: str, output_dir: str, resume: bool,
+                  code_override: Optional[str], script_override: Optional[str]):
+    """``generate_video`` for a job whose checkpoint directory is held."""
+    if not resume:
+        ckpt.invalidate_from(STAGES[0])
+    if code_override is not None:
+        ckpt.save("code", code_override)
+        ckpt.invalidate_from("voice")
+    if script_override is not None:
+        ckpt.save("script", script_override)
+        ckpt.invalidate_from("video")
+
+    if ckpt.has("video"):
+        logger.info(f"Job {ckpt.job_key}: already rendered, returning checkpointed video")
+        return ckpt.load("video")
+    logger.info(f"Job {ckpt.job_key}: resuming from stage '{ckpt.first_incomplete()}'")
+
+    def produce(stage, compute):
+        """Load a checkpointed stage, or compute it and invalidate everything downstream."""
+        if ckpt.has(stage):
+            return ckpt.load(stage)
+        value = ckpt.save(stage, compute())
+        next_index = STAGES.index(stage) + 1
+        if next_index < len(STAGES):
+            ckpt.invalidate_from(STAGES[next_index])
+        return value
+
+    # Linear and quadratic equations are solved locally: no LLM steps, code or voice script
+    solution = solve_equation(question)
+
+    def build_code():
+        if solution is not None:
+            logger.info(f"Job {ckpt.job_key}: solving {solution['equation']} locally")
+            produce("steps", lambda: {"steps": step_lines(solution), "explanation": solution["explanation"],
+                                      "solution": solution})
+            return scene_code(solution)
+
+        # Built-in templates need no LLM code (and are narrated from their narration pack)
+        template = select_template(question)
+        if template is not None:
+            code, viz_type = template
+            logger.info(f"Job {ckpt.job_key}: using template '{viz_type}'")
+            return code
+
+        # 1. Generate Math Steps (Text)
+        def build_steps():
+            logger.info(f"Generating math steps for: {question}")
+            return generate_math_steps(question)
+        steps_data = produce("steps", build_steps)
+
+        # Format a concept string for the Manim coder
+        if isinstance(steps_data["steps"], list):
+            steps_text = "\n".join(steps_data["steps"])
+        else:
+            steps_text = str(steps_data["steps"])
+            
+        full_concept = f"""
     Topic: {question}
     
     Explanation Steps:
@@ -157,72 +354,221 @@ def generate_video(question: str, output_dir: str = "static/videos"):
     Detailed Explanation:
     {steps_data["explanation"]}
     """
-    
-    # 2. Generate Manim Code
-    logger.info("Generating Manim code...")
-    manim_code = generate_manim_code(full_concept)
-    
+        logger.info("Generating Manim code...")
+        return generate_manim_code(full_concept)
+
+    def build_audio():
+        pack = get_pack(manim_code)
+        if pack is not None and pack["voice"] == voice_data:
+            return dict(pack["audio"])
+        logger.info("Synthesizing audio...")
+        tmp_audio_dir = os.path.join("tmp", "audio")
+        texts = [segment.get("text", "") for segment in voice_data.get("segments", [])]
+        audio_file_map, errors = synthesize_segments(texts, tmp_audio_dir)  # segment_index -> absolute path
+        if errors:
+            ckpt.update_meta(tts_errors={str(i): error for i, error in errors.items()})
+            if not audio_file_map:
+                raise RuntimeError(f"TTS failed for every narration segment: {next(iter(errors.values()))}")
+            logger.warning(f"Job {ckpt.job_key}: {len(errors)} narration segment(s) left silent")
+        return audio_file_map
+
+    def build_script():
+        logger.info("Injecting audio into script...")
+        script = inject_audio_into_script(manim_code, voice_data, audio_file_map)
+        try:
+            script, report = enforce_duration_budget(script, RENDER_QUALITY)
+        except DurationBudgetError as e:
+            ckpt.update_meta(last_error=str(e), last_failed_stage="script", duration=e.report)
+            raise
+        if report["edits"]:
+            logger.info(f"Job {ckpt.job_key}: scene shortened from {report['planned']}s to "
+                        f"{report['final']}s (budget {report['budget']}s)")
+        ckpt.update_meta(duration=report)
+        return script
+
+    # 2. Generate Manim Code (step 1 only runs if the code is not checkpointed)
+    manim_code = produce("code", build_code)
+
+    # Known fixes from the repair cache are applied before the first render.
+    # Repairs never add or remove animations, so voice and audio stay valid.
+    repair_cache = get_repair_cache()
+    pending_fix = None  # (fingerprint key, rule id) awaiting the next outcome
+
+    def apply_code_fix(fixed_code):
+        nonlocal manim_code
+        manim_code = ckpt.save("code", fixed_code)
+        ckpt.invalidate_from("script")
+
+    fixed_code, applied = repair_cache.preemptive_fixes(manim_code)
+    if applied:
+        apply_code_fix(fixed_code)
+
+    def try_repair(stderr, stage):
+        """Apply a cached fix for the failure, or return False if none applies / attempts are used up."""
+        nonlocal pending_fix
+        if pending_fix:
+            repair_cache.record(*pending_fix, success=False)
+            pending_fix = None
+        if repairs_used >= REPAIR_MAX_ATTEMPTS:
+            return False
+        fix = repair_cache.repair(manim_code, stderr)
+        if fix is None:
+            return False
+        fixed_code, fingerprint, rule_id = fix
+        logger.info(f"Job {ckpt.job_key}: {stage} failure {fingerprint['key']} repaired locally with '{rule_id}'")
+        apply_code_fix(fixed_code)
+        pending_fix = (fingerprint["key"], rule_id)
+        return True
+
+    # 2b. Validate before spending voice/TTS/render time on it. A rejected scene
+    # drops the code checkpoint so a retry regenerates it (steps are kept).
+    repairs_used = 0
+    while True:
+        try:
+            scene_name = validate_scene(manim_code)
+            break
+        except SceneValidationError as e:
+            if try_repair(e.as_stderr(), "validation"):
+                repairs_used += 1
+                continue
+            logger.error(f"Job {ckpt.job_key}: generated scene rejected: {e}")
+            ckpt.invalidate_from("code")
+            ckpt.update_meta(last_error=str(e), last_failed_stage="validate", validation=e.to_dict())
+            raise
+
+    abs_output_dir = os.path.abspath(output_dir)
+
+    def start_silent_render():
+        """Render the scene without narration in the background; None if it would not be admitted."""
+        try:
+            silent_script, _ = enforce_duration_budget(manim_code, RENDER_QUALITY)
+            silent_estimate = estimate_cost(silent_script, RENDER_QUALITY)
+            check_admission(silent_estimate)
+        except (DurationBudgetError, SceneCostError) as e:
+            logger.info(f"Job {ckpt.job_key}: not overlapping the render ({e})")
+            return None
+        silent_path = os.path.abspath(os.path.join(ckpt.dir, f"silent_scene_{ckpt.job_key}.py"))
+        with open(silent_path, "w", encoding="utf-8") as f:
+            f.write(silent_script)
+        logger.info(f"Job {ckpt.job_key}: rendering silently while narration is prepared")
+        future = silent_render_executor.submit(render_scene, scene_file=silent_path, scene_name=scene_name,
+                                               output_dir=abs_output_dir, quality=RENDER_QUALITY,
+                                               cost=silent_estimate["cpu_seconds"])
+        return future, silent_script, time.monotonic()
+
+    def finish_silent_render(future, silent_script, started):
+        """Narrate the overlapped render; None if it failed (the regular render loop takes over)."""
+        narration_ready = time.monotonic()
+        try:
+            silent_video = future.result()
+        except (RuntimeError, SchedulerRejected, RenderCancelled) as e:
+            logger.warning(f"Job {ckpt.job_key}: overlapped render failed, rendering again with repairs: {e}")
+            return None
+        if not silent_video:
+            return None
+        ckpt.update_meta(overlap={
+            "narration_seconds": round(narration_ready - started, 2),
+            "render_wait_seconds": round(time.monotonic() - narration_ready, 2),
+        })
+        narrated = None
+        try:
+            narrated = reconcile_narration(silent_video, silent_script, voice_data, audio_file_map)
+            return narrated
+        except (RuntimeError, OSError, EOFError, wave.Error) as e:
+            ckpt.update_meta(last_error=str(e), last_failed_stage="video")
+            raise RuntimeError(f"Narration mux failed: {e}") from e
+        finally:
+            _remove_intermediate(silent_video, narrated)
+
+    # In overlap mode the silent render runs while the voice script and TTS are produced
+    overlapped = None
+    if NARRATION_MODE == "overlap" and solution is None and not ckpt.has("script"):
+        overlapped = start_silent_render()
+
     # 3. Generate Voice Script
-    logger.info("Generating Voice script...")
-    voice_data = generate_voice_script(manim_code)
-    
-    # 4. Synthesize Audio
-    logger.info("Synthesizing audio...")
-    tmp_audio_dir = os.path.join("tmp", "audio")
-    audio_file_map = {} # segment_index -> absolute path
-    
-    segments = voice_data.get("segments", [])
-    for i, segment in enumerate(segments):
-        text = segment.get("text", "")
-        if text:
-            path = generate_audio_segment(text, tmp_audio_dir)
-            audio_file_map[i] = path
+    def build_voice():
+        if solution is not None:
+            return {"segments": []}
+        pack = get_pack(manim_code)
+        if pack is not None:
+            logger.info(f"Job {ckpt.job_key}: narration from the '{pack['voice']['title']}' pack")
+            return pack["voice"]
+        logger.info("Generating Voice script...")
+        return generate_voice_script(manim_code)
+    try:
+        voice_data = produce("voice", build_voice)
+
+        # 4. Synthesize Audio
+        audio_file_map = produce("audio", build_audio)
+    except BaseException:
+        if overlapped is not None:
+            _abandon_render(overlapped[0])
+        raise
+
+    if overlapped is not None:
+        video_path = finish_silent_render(*overlapped)
+        if video_path:
+            if pending_fix:
+                repair_cache.record(*pending_fix, success=True)
+            ckpt.save("video", video_path)
+            ckpt.update_meta(last_error=None, last_failed_stage=None)
+            return video_path
+
+    while True:
+        # 5. Inject Audio into Code
+        final_script = produce("script", build_script)
+
+        # Admission check on the estimated render cost (also the job's ETA)
+        estimate = estimate_cost(final_script, RENDER_QUALITY)
+        ckpt.update_meta(cost=estimate)
+        try:
+            check_admission(estimate)
+        except SceneCostError as e:
+            ckpt.update_meta(last_error=str(e), last_failed_stage="script")
+            raise
+        logger.info(f"Job {ckpt.job_key}: estimated render {estimate['cpu_seconds']} CPU s, "
+                    f"{estimate['memory_mb']} MB, ETA {estimate['eta_seconds']}s")
+        
+        # 6. Write to File
+        scene_file_path = os.path.join(ckpt.dir, f"scene_{ckpt.job_key}.py")
+        with open(scene_file_path, "w", encoding="utf-8") as f:
+            f.write(final_script)
             
-    # 5. Inject Audio into Code
-    logger.info("Injecting audio into script...")
-    final_script = inject_audio_into_script(manim_code, voice_data, audio_file_map)
-    
-    # 6. Write to File
-    unique_id = str(uuid.uuid4())
-    scene_file_name = f"scene_{unique_id}.py"
-    scene_file_path = os.path.join("tmp", scene_file_name)
-    os.makedirs("tmp", exist_ok=True)
-    
-    with open(scene_file_path, "w", encoding="utf-8") as f:
-        f.write(final_script)
+        # 7. Render
+        logger.info(f"Rendering scene from {scene_file_path}...")
+        abs_scene_path = os.path.abspath(scene_file_path)
         
-    # 7. Render
-    logger.info(f"Rendering scene from {scene_file_path}...")
-    abs_scene_path = os.path.abspath(scene_file_path)
-    abs_output_dir = os.path.abspath(output_dir)
-    
-    # Detect scene class name? 
-    # Usually we need to know it. The Prompt doesn't enforce a specific name, 
-    # but Manim CLI works if we pass the file. If multiple scenes, we need to pick one.
-    # We can parse it from AST or just let Manim render all (but render_scene function takes scene_name).
-    # Let's extract the first class that inherits from Scene or similar.
-    
-    scene_name = "Scene" # Default fallback
-    try:
-        tree = ast.parse(final_script)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                scene_name = node.name
-                break # Take the first class
-    except:
-        pass
+        try:
+            video_path = render_scene(
+                scene_file=abs_scene_path,
+                scene_name=scene_name,
+                output_dir=abs_output_dir,
+                quality=RENDER_QUALITY,
+                cost=estimate["cpu_seconds"]
+            )
+            break
+        except RuntimeError as e:
+            if try_repair(str(e), "render"):
+                repairs_used += 1
+                continue
+            ckpt.update_meta(last_error=str(e)[-4000:], last_failed_stage="video")
+            logger.error(f"Job {ckpt.job_key}: render failed; stages up to 'script' are kept for retry")
+            raise
 
-    try:
-        video_path = render_scene(
-            scene_file=abs_scene_path,
-            scene_name=scene_name,
-            output_dir=abs_output_dir,
-            quality="l" 
-        )
-        return video_path
-    finally:
-        # Cleanup code file (optional, maybe keep for debug)
-        # if os.path.exists(scene_file_path):
-        #    os.remove(scene_file_path)
-        pass
+    # 8. Mux the narration track onto the silent render
+    if video_path and NARRATION_MODE in ("mux", "overlap"):
+        silent_video, video_path = video_path, None
+        try:
+            video_path = narrate_video(silent_video, final_script, audio_file_map)
+        except (RuntimeError, OSError, EOFError, wave.Error) as e:
+            ckpt.update_meta(last_error=str(e), last_failed_stage="video")
+            raise RuntimeError(f"Narration mux failed: {e}") from e
+        finally:
+            _remove_intermediate(silent_video, video_path)
 
+    if pending_fix:
+        repair_cache.record(*pending_fix, success=bool(video_path))
+    if video_path:
+        ckpt.save("video", video_path)
+        ckpt.update_meta(last_error=None, last_failed_stage=None)
+    return video_path
@@ -1,6 +1,7 @@
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from ..llm.providers import get_provider
+from .variants import pick
 
 load_dotenv()
 
@@ -56,30 +57,30 @@ Code must run without runtime errors
 The output should start immediately with imports, or `class ...`. Do not use markdown backticks.
 """
 
-def _get_genai_client() -> genai.GenerativeModel:
-    key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not key:
-        raise RuntimeError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable is not set.")
-    genai.configure(api_key=key)
-    return genai.GenerativeModel(
-        model_name="gemini-2.5-flash",
-        system_instruction=SYSTEM_PROMPT,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.2, # Low temperature for code
-        ),
-    )
-
-model = _get_genai_client()
+SYSTEM_PROMPT_COMPACT = """
+You write executable Manim Community v0.18+ Python code.
+Rules:
+- Pass only Mobjects to Manim APIs. Raw points/np arrays may only build Line or Polygon; never animate or group them.
+- RightAngle takes exactly two Line objects (never Polygon, VGroup or points).
+- Express all geometry with explicit Manim objects.
+- Use only documented Manim classes/methods; if unsure, use the simplest valid construction.
+- Define every variable before use. The scene must run with: manim -ql scene.py SceneName
+Output only Python code, starting with imports. No markdown, no prose.
+"""
 
-def generate_manim_code(concept: str) -> str:
+def generate_manim_code(concept: str, variant: str = None) -> str:
     """
     Generates strict Manim Python code for the given concept.
     """
     if not isinstance(concept, str) or not concept.strip():
         raise ValueError("concept must be a non-empty string")
 
-    response = model.generate_content(concept.strip())
-    content = getattr(response, "text", "")
+    content = get_provider().generate(
+        concept.strip(),
+        purpose="manim_code",
+        system_instruction=pick(SYSTEM_PROMPT, SYSTEM_PROMPT_COMPACT, variant),
+        temperature=0.2, # Low temperature for code
+    )
     
     # Strip markdown code blocks if present (LLMs often do this despite instructions)
     content = content.strip()
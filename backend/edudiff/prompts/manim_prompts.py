@@ -1,9 +1,15 @@
-def generate_manim_prompt(concept):
+from .variants import prompt_variant
+
+
+def generate_manim_prompt(concept, variant=None):
     """Generate a strict, deterministic prompt for Gemini to create Manim code"""
     # Detect if this is an equation-solving problem
     concept_lower = concept.lower()
     is_equation = any(keyword in concept_lower for keyword in ["solve", "=", "equation", "find x", "find y"])
     
+    if prompt_variant(variant) == "compact":
+        return _generate_compact_manim_prompt(concept, is_equation)
+
     equation_context = ""
     if is_equation:
         equation_context = """
@@ -89,3 +95,21 @@ Solve the following problem visually using Manim:
 
 {concept}
 """
+
+
+def _generate_compact_manim_prompt(concept, is_equation):
+    """Same contract as the full prompt with a fraction of the input tokens."""
+    equation_rules = ""
+    if is_equation:
+        equation_rules = (
+            "This is an equation: show each algebraic step as MathTex, animate between steps with "
+            "TransformMatchingTex, and box the final answer.\n"
+        )
+    return f"""Output ONLY executable Python Manim code (no markdown, no prose).
+Structure: `from manim import *`, `class MainScene(Scene)`, `def construct(self)`.
+Show each step as MathTex; go from step to step with TransformMatchingTex; self.wait(1) after each;
+finish with SurroundingRectangle on the answer and self.wait(0.5).
+Forbidden: Axes, NumberPlane, plot(, GraphScene, begin_ambient_camera_rotation, while True, self.wait() without a duration.
+{equation_rules}
+Problem: {concept}
+"""
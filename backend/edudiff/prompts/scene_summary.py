@@ -0,0 +1,69 @@
+"""
+Compact textual summary of a Manim scene for the voice-script prompt.
+
+Sending the whole generated scene to the narration model costs hundreds of
+input tokens that carry no narration-relevant information (imports, layout
+calls, helper functions). The summary keeps only what the narrator may talk
+about: the objects that get animated and the ordered, indexed animations,
+numbered exactly as ``inject_audio_into_script`` counts them.
+"""
+
+import ast
+from typing import List
+
+from ..manim_engine.scene_ir import parse_scene, self_call
+
+MAX_EXPR_CHARS = 90
+
+
+def _shorten(text: str, limit: int = MAX_EXPR_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def summarize_scene(manim_code: str) -> str:
+    """
+    Summarize a Manim scene as objects + indexed animations.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+        ValueError: If no construct() method is found.
+    """
+    ir = parse_scene(manim_code)
+    if ir.construct is None:
+        raise ValueError("No 'construct' method found in scene")
+
+    scene_line = ""
+    if ir.classes:
+        # The first class, which is the scene in generated code
+        first = ir.classes[0]
+        scene_line = f"Scene: {first.name}({', '.join(ast.unparse(b) for b in first.bases)})"
+
+    defs = ir.assignments()
+    referenced: List[str] = []
+    animations: List[str] = []
+    animation_calls = {id(a.call): a for a in ir.animations}
+
+    for stmt in ir.construct.body:
+        call = self_call(stmt)
+        if call is None:
+            continue
+        animation = animation_calls.get(id(call))
+        if animation is not None:
+            parts = [ast.unparse(a) for a in call.args]
+            parts += [f"{k.arg}={ast.unparse(k.value)}" for k in call.keywords if k.arg]
+            animations.append(f"{animation.index}: {animation.method} {_shorten(', '.join(parts))}")
+            for name_node in ast.walk(call):
+                if isinstance(name_node, ast.Name) and name_node.id in defs and name_node.id not in referenced:
+                    referenced.append(name_node.id)
+        elif call.func.attr == 'wait':
+            duration = ast.unparse(call.args[0]) if call.args else "1"
+            animations.append(f"   wait {duration}")
+
+    lines = [scene_line] if scene_line else []
+    if referenced:
+        lines.append("Objects:")
+        lines.extend(f"  {name} = {_shorten(ast.unparse(defs[name]))}" for name in referenced)
+    lines.append("Animations (0-indexed):")
+    lines.extend(f"  {a}" for a in animations)
+    return "\n".join(lines)
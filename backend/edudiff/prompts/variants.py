@@ -0,0 +1,23 @@
+"""
+Prompt variant selection.
+
+Every system prompt ships in a "full" and a "compact" variant. The compact
+variants keep the same rules with far fewer input tokens; which one is sent
+is controlled by PROMPT_VARIANT (full | compact), or per call.
+"""
+
+import os
+from typing import Optional
+
+VARIANTS = ("full", "compact")
+
+
+def prompt_variant(variant: Optional[str] = None) -> str:
+    """Resolve the variant to use, falling back to PROMPT_VARIANT and then 'full'."""
+    v = (variant or os.getenv("PROMPT_VARIANT", "full")).strip().lower()
+    return v if v in VARIANTS else "full"
+
+
+def pick(full: str, compact: str, variant: Optional[str] = None) -> str:
+    """Return ``compact`` if the resolved variant is compact, else ``full``."""
+    return compact if prompt_variant(variant) == "compact" else full
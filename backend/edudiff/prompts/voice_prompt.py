@@ -1,20 +1,27 @@
 import os
 import json
+import logging
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from ..llm.providers import get_provider
+from .scene_summary import summarize_scene
+from .variants import pick
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 VOICE_SYSTEM_PROMPT = """
 You are an expert educational narration writer.
 
-You are given Manim Python code.
+You are given a Manim scene: either its Python code, or a summary listing its
+objects and its numbered animations.
 Your task is to generate a spoken narration script that matches the visuals exactly.
 
 🔴 ABSOLUTE RULES (NON-NEGOTIABLE)
 
 Manim Code Is the Source of Truth
-You may ONLY describe objects, equations, and steps that explicitly exist in the provided Manim code.
+You may ONLY describe objects, equations, and steps that explicitly exist in the provided scene.
 ❌ Do NOT invent visuals, steps, or equations.
 
 Visual Synchronization
@@ -23,7 +30,7 @@ Use short, clear sentences suitable for TTS.
 
 No Visual Assumptions
 ❌ Do not say “as you can see” unless the object is explicitly created.
-❌ Do not describe colors, positions, or highlights unless present in code.
+❌ Do not describe colors, positions, or highlights unless present in the scene.
 
 Educational Tone
 Simple
@@ -57,23 +64,28 @@ No emojis.
 No extra text.
 """
 
-def _get_genai_client() -> genai.GenerativeModel:
-    key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not key:
-        raise RuntimeError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable is not set.")
-    genai.configure(api_key=key)
-    return genai.GenerativeModel(
-        model_name="gemini-2.5-flash",
-        system_instruction=VOICE_SYSTEM_PROMPT,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.3,
-            response_mime_type="application/json",
-        ),
-    )
+VOICE_SYSTEM_PROMPT_COMPACT = """
+Write a TTS narration for the given Manim scene (code, or a summary of objects and numbered animations).
+Describe only what the scene contains, in animation order, using short, calm, student-friendly sentences.
+Do not invent visuals; do not mention colors or positions unless present.
+Output only JSON: {"title": "...", "segments": [{"start_after_animation": 0, "text": "..."}]}
+start_after_animation is the 0-based index of the self.play/self.add the segment follows.
+"""
+
+# What the narration model receives: "summary" (objects + indexed animations) or "code"
+VOICE_INPUT = os.getenv("VOICE_INPUT", "summary").lower()
 
-model = _get_genai_client()
+def build_voice_input(manim_code: str, mode: str = None) -> str:
+    """Return the user message for the voice-script call: a scene summary, or the raw code."""
+    mode = (mode or VOICE_INPUT).lower()
+    if mode == "summary":
+        try:
+            return summarize_scene(manim_code)
+        except (SyntaxError, ValueError) as e:
+            logger.warning(f"Scene summary failed ({e}); sending raw code to voice model")
+    return manim_code.strip()
 
-def generate_voice_script(manim_code: str) -> dict:
+def generate_voice_script(manim_code: str, variant: str = None, input_mode: str = None) -> dict:
     """
     Generates a synchronized voice script for the given Manim code.
     Returns a dict with 'title' and 'segments'.
@@ -81,8 +93,13 @@ def generate_voice_script(manim_code: str) -> dict:
     if not isinstance(manim_code, str) or not manim_code.strip():
         raise ValueError("manim_code must be a non-empty string")
 
-    response = model.generate_content(manim_code.strip())
-    content = getattr(response, "text", "")
+    content = get_provider().generate(
+        build_voice_input(manim_code, input_mode),
+        purpose="voice_script",
+        system_instruction=pick(VOICE_SYSTEM_PROMPT, VOICE_SYSTEM_PROMPT_COMPACT, variant),
+        temperature=0.3,
+        response_mime_type="application/json",
+    )
     
     try:
         data = json.loads(content)
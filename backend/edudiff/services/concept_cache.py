@@ -0,0 +1,288 @@
+"""
+Concept normalization and near-duplicate result lookup.
+
+``sanitize_input`` only collapses whitespace, so "What is the Pythagorean
+theorem?" and "explain pythagoras theorem" never share a cached result.
+``normalize_concept`` folds case, drops punctuation and question filler
+words, and maps spelling variants of the ``select_template`` keywords onto
+one canonical form. ``ConceptIndex`` keeps previously generated results and
+finds near-duplicates by TF-IDF cosine similarity over the normalized terms.
+
+Configuration (environment):
+    CONCEPT_INDEX_PATH        JSON file backing the index (default: tmp/concept_index.json)
+    CONCEPT_MATCH_THRESHOLD   minimum cosine similarity for a near-duplicate hit (default: 0.8)
+    CONCEPT_INDEX_MAX         maximum stored entries; least recently used are evicted (default: 2000)
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset("""
+a an the is are was were be been being of to in on for with by at as and or
+what whats which who how why when where does do did can could would should
+explain explanation show me please tell about describe visualize visualise
+illustrate give understand help i we you my our this that these those it
+concept idea meaning mean means define definition using use its s
+""".split())
+
+# Spelling/morphological variants of the select_template keywords -> canonical term.
+# Multi-word phrases are replaced before tokenization, longest first.
+SYNONYMS = {
+    "pythagoras": "pythagorean",
+    "pythagorus": "pythagorean",
+    "differentiation": "derivative",
+    "differentiate": "derivative",
+    "derivatives": "derivative",
+    "f'(x)": "derivative",
+    "integration": "integral",
+    "integrate": "integral",
+    "integrals": "integral",
+    "antiderivative": "integral",
+    "matrices": "matrix",
+    "eigenvalues": "eigenvalue",
+    "eigenvectors": "eigenvector",
+    "trig": "trigonometry",
+    "trigonometric": "trigonometry",
+    "sin": "sine",
+    "cos": "cosine",
+    "x squared": "x^2",
+    "x²": "x^2",
+    "spherical": "sphere",
+    "three dimensional": "3d",
+    "three-dimensional": "3d",
+    "ode": "differential equation",
+    "odes": "differential equation",
+    "imaginary numbers": "complex",
+    "complex numbers": "complex",
+    "complex number": "complex",
+    "slope of the tangent": "slope of tangent",
+    "parabolas": "parabola",
+    "triangles": "triangle",
+}
+
+_PHRASES = sorted((k for k in SYNONYMS if " " in k or not k.isalpha()), key=len, reverse=True)
+_WORD_SYNONYMS = {k: v for k, v in SYNONYMS.items() if k not in _PHRASES}
+# Operators are kept as terms so "x^2 - 4x + 3" and "x^2 + 4x + 3" stay distinct
+_TOKEN_RE = re.compile(r"\d+(?:\.\d+)?[a-z0-9^]*|[a-z][a-z0-9^]*|[+\-=*/<>]")
+
+# Response fields that belong to the request that generated a result, not to the result
+REQUEST_FIELDS = frozenset({"job_id"})
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Case-fold, apply synonyms, drop stopwords; returns the ordered term list."""
+    t = " " + text.casefold().strip() + " "
+    for phrase in _PHRASES:
+        if phrase in t:
+            t = t.replace(phrase, " " + SYNONYMS[phrase] + " ")
+
+    tokens = []
+    for token in _TOKEN_RE.findall(t):
+        token = _WORD_SYNONYMS.get(token, token)
+        if token in STOPWORDS:
+            continue
+        # Cheap plural folding ("parabolas" -> "parabola"), leaving short words and "-ss" alone
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = _WORD_SYNONYMS.get(token[:-1], token[:-1])
+        tokens.append(token)
+    return tokens
+
+
+def normalize_concept(text: str) -> str:
+    """Canonical string form of a concept, suitable as an exact cache key."""
+    return " ".join(normalize_tokens(text))
+
+
+def _terms(tokens: List[str]) -> Counter:
+    """Unigram + bigram term counts."""
+    terms = Counter(tokens)
+    terms.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return terms
+
+
+class ConceptIndex:
+    """
+    Persistent near-duplicate index over generated concepts.
+
+    Entries are keyed by (normalized concept, quality, parameter signature).
+    Explanation-only results (no video) match any quality. Concepts carrying
+    explicit values ("graph x^2 - 4x + 3") only match entries with the same
+    values, however similar the wording.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.path = path or os.getenv("CONCEPT_INDEX_PATH", os.path.join("tmp", "concept_index.json"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("CONCEPT_MATCH_THRESHOLD", "0.8"))
+        self.max_entries = max_entries or int(os.getenv("CONCEPT_INDEX_MAX", "2000"))
+        self._entries: Dict[str, dict] = {}
+        self._df: Counter = Counter()
+        self._vectors: Dict[str, Dict[str, float]] = {}  # entry key -> vector under the current df
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence ---------------------------------------------------------
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load concept index {self.path}: {e}")
+            return
+        self._mtime = mtime
+        self._vectors.clear()
+        self._df = Counter()
+        for entry in self._entries.values():
+            self._df.update(set(_terms(entry["tokens"])))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    # --- similarity ----------------------------------------------------------
+
+    def _vector(self, terms: Counter) -> Dict[str, float]:
+        n = len(self._entries) + 1
+        vec = {t: c * (1.0 + math.log(n / (1 + self._df.get(t, 0)))) for t, c in terms.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    def _entry_vector(self, key: str) -> Dict[str, float]:
+        """Vector of a stored entry; cached until an add or eviction changes the document frequencies."""
+        vec = self._vectors.get(key)
+        if vec is None:
+            vec = self._vectors[key] = self._vector(_terms(self._entries[key]["tokens"]))
+        return vec
+
+    @staticmethod
+    def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+    @staticmethod
+    def _key(normalized: str, quality: Optional[str], params_key: Optional[str] = None) -> str:
+        key = f"{quality or '*'}|{normalized}"
+        return f"{key}|{params_key}" if params_key else key
+
+    # --- public API ----------------------------------------------------------
+
+    def lookup(self, concept: str, quality: Optional[str] = None,
+               params_key: Optional[str] = None, any_quality: bool = False) -> Optional[dict]:
+        """
+        Find a stored result for ``concept`` (exact normalized match first, then nearest neighbour).
+
+        Args:
+            concept: The user's concept text.
+            quality: Requested render quality.
+            params_key: Signature of the values parsed from the concept (``params.params_key``).
+            any_quality: Also accept a video of another quality (under load), preferring the requested one.
+
+        Returns:
+            dict: The stored result plus ``matched_concept`` and ``similarity``, or None.
+        """
+        tokens = normalize_tokens(concept)
+        if not tokens:
+            return None
+        normalized = " ".join(tokens)
+
+        with self._lock:
+            self._load()
+            qualities = [quality, None]
+            if any_quality:
+                qualities += [q for q in ("high", "medium", "low") if q != quality]
+            candidates = [self._key(normalized, q, params_key) for q in qualities]
+            best, best_score = None, 0.0
+            for key in candidates:
+                if key in self._entries and self._video_exists(self._entries[key]):
+                    best, best_score = self._entries[key], 1.0
+                    break
+
+            if best is None:
+                query = self._vector(_terms(tokens))
+                for key, entry in self._entries.items():
+                    if entry.get("params_key") != params_key:
+                        continue
+                    if not any_quality and entry.get("quality") not in (quality, None):
+                        continue
+                    score = self._cosine(query, self._entry_vector(key))
+                    # the requested quality wins a tie with another quality
+                    if score > best_score or (score == best_score and best is not None
+                                              and entry.get("quality") == quality != best.get("quality")):
+                        best, best_score = entry, score
+
+            if best is None or best_score < self.threshold or not self._video_exists(best):
+                return None
+
+            best["last_hit"] = time.time()
+            result = {k: v for k, v in best["result"].items() if k not in REQUEST_FIELDS}
+            result["matched_concept"] = best["concept"]
+            result["similarity"] = round(best_score, 3)
+            return result
+
+    @staticmethod
+    def _video_exists(entry: dict) -> bool:
+        return not entry.get("video_path") or os.path.exists(entry["video_path"])
+
+    def add(self, concept: str, result: dict, quality: Optional[str] = None,
+            video_path: Optional[str] = None, params_key: Optional[str] = None):
+        """Store a generated result. ``quality`` is None for explanation-only results."""
+        tokens = normalize_tokens(concept)
+        if not tokens:
+            return
+        key = self._key(" ".join(tokens), quality, params_key)
+        with self._lock:
+            self._load()
+            if key in self._entries:
+                self._df.subtract(set(_terms(self._entries[key]["tokens"])))
+            self._entries[key] = {
+                "concept": concept,
+                "tokens": tokens,
+                "quality": quality,
+                "params_key": params_key,
+                "video_path": video_path,
+                "result": {k: v for k, v in result.items() if k not in REQUEST_FIELDS},
+                "last_hit": time.time(),
+            }
+            self._df.update(set(_terms(tokens)))
+            self._vectors.clear()
+            self._evict()
+            self._save()
+
+    def _evict(self):
+        overflow = len(self._entries) - self.max_entries
+        if overflow <= 0:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_hit"])[:overflow]:
+            self._df.subtract(set(_terms(self._entries.pop(key)["tokens"])))
+
+
+_index = None
+
+
+def get_concept_index() -> ConceptIndex:
+    global _index
+    if _index is None:
+        _index = ConceptIndex()
+    return _index
@@ -0,0 +1,125 @@
+"""
+Load-adaptive quality degradation for ``/generate``.
+
+Under a spike a 480p video in ten seconds beats a 1080p one in two minutes.
+The governor reads the interactive queue depth (the render scheduler's, plus
+the render queue's when renders go to workers) and the p95 latency (queue wait
+plus render) of recent renders and picks a level:
+
+    0  as requested
+    1  one quality step down (high -> medium -> low), scene durations scaled
+       by DEGRADE_DURATION_SCALE, cached videos of any quality served first
+    2  two steps down, durations scaled twice
+
+Level 1 starts at DEGRADE_QUEUE_DEPTH waiting renders or a p95 of
+DEGRADE_P95_SECONDS, level 2 at twice either. Levels rise as soon as a
+threshold is crossed and fall one step at a time, once load has stayed below
+DEGRADE_RECOVERY of the thresholds for DEGRADE_HOLD_SECONDS, so quality does
+not flap at a boundary.
+
+Configuration (environment):
+    DEGRADE                  adapt quality to load (default: 1)
+    DEGRADE_QUEUE_DEPTH      waiting interactive renders for level 1 (default: RENDER_SLOTS)
+    DEGRADE_P95_SECONDS      p95 render latency for level 1 (default: 60)
+    DEGRADE_WINDOW_SECONDS   window of the p95 (default: 300)
+    DEGRADE_DURATION_SCALE   duration budget factor per level (default: 0.6)
+    DEGRADE_RECOVERY         share of the thresholds to fall below before recovering (default: 0.7)
+    DEGRADE_HOLD_SECONDS     minimum time between level changes downwards (default: 30)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from .render_queue import RENDER_QUEUE, get_render_queue
+from .scheduler import RENDER_SLOTS, RenderScheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEGRADE = os.getenv("DEGRADE", "1") not in ("0", "false", "False")
+DEGRADE_QUEUE_DEPTH = int(os.getenv("DEGRADE_QUEUE_DEPTH", str(RENDER_SLOTS)))
+DEGRADE_P95_SECONDS = float(os.getenv("DEGRADE_P95_SECONDS", "60"))
+DEGRADE_WINDOW_SECONDS = float(os.getenv("DEGRADE_WINDOW_SECONDS", "300"))
+DEGRADE_DURATION_SCALE = float(os.getenv("DEGRADE_DURATION_SCALE", "0.6"))
+DEGRADE_RECOVERY = float(os.getenv("DEGRADE_RECOVERY", "0.7"))
+DEGRADE_HOLD_SECONDS = float(os.getenv("DEGRADE_HOLD_SECONDS", "30"))
+
+QUALITIES = ("low", "medium", "high")
+MAX_LEVEL = 2
+
+
+class LoadGovernor:
+    """Maps current render load to a degradation level, with hysteresis."""
+
+    def __init__(self, scheduler: Optional[RenderScheduler] = None, queue_depth: int = DEGRADE_QUEUE_DEPTH,
+                 p95_seconds: float = DEGRADE_P95_SECONDS, window: float = DEGRADE_WINDOW_SECONDS,
+                 recovery: float = DEGRADE_RECOVERY, hold: float = DEGRADE_HOLD_SECONDS):
+        self.scheduler = scheduler
+        self.queue_depth = max(1, queue_depth)
+        self.p95_seconds = p95_seconds
+        self.window = window
+        self.recovery = recovery
+        self.hold = hold
+        self._level = 0
+        self._changed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _target(self, depth: int, p95: Optional[float], factor: float = 1.0) -> int:
+        level = 0
+        for n in range(1, MAX_LEVEL + 1):
+            if depth >= n * self.queue_depth * factor or (p95 is not None and p95 >= n * self.p95_seconds * factor):
+                level = n
+        return level
+
+    def level(self) -> int:
+        """Current degradation level (0 = none), updated from the scheduler's load."""
+        scheduler = self.scheduler or get_scheduler()
+        depth = scheduler.queued("interactive")
+        if RENDER_QUEUE:
+            depth += get_render_queue().depth("interactive")
+        p95 = scheduler.p95_latency_seconds(self.window)
+        now = time.monotonic()
+        load = f"queue {depth}, p95 {p95:.0f}s" if p95 is not None else f"queue {depth}"
+        with self._lock:
+            target = self._target(depth, p95)
+            if target > self._level:
+                self._level, self._changed_at = target, now
+                logger.warning(f"Render load high ({load}): degrading quality, level {target}")
+            elif (self._level > 0 and now - self._changed_at >= self.hold
+                  and self._target(depth, p95, self.recovery) < self._level):
+                self._level, self._changed_at = self._level - 1, now
+                logger.info(f"Render load easing ({load}): degradation level {self._level}")
+            return self._level
+
+    def plan(self, quality: str) -> dict:
+        """
+        What to deliver for a request at ``quality`` under the current load.
+
+        Returns:
+            dict: ``requested`` and effective ``quality``, ``level``, ``duration_scale``
+            (factor for the duration budget) and ``prefer_cached`` (serve a cached video of any quality).
+        """
+        level = self.level() if DEGRADE else 0
+        index = QUALITIES.index(quality) if quality in QUALITIES else 0
+        return {
+            "requested": quality,
+            "quality": QUALITIES[max(0, index - level)],
+            "level": level,
+            "duration_scale": DEGRADE_DURATION_SCALE ** level,
+            "prefer_cached": level > 0,
+        }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> LoadGovernor:
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = LoadGovernor()
+    return _governor
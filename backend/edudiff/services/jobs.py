@@ -0,0 +1,483 @@
+"""
+Render jobs: cancellable manim processes.
+
+Each render runs in its own session (``start_new_session``), so its process
+group holds manim and every ffmpeg/LaTeX process it starts. Cancelling a job,
+or its timeout, signals the whole group (SIGTERM, then SIGKILL after
+JOB_KILL_GRACE_SECONDS) instead of only the direct child, and the render's
+slot is given back as soon as the group is gone.
+
+A job is cancelled when:
+    - ``DELETE /jobs/<id>`` is called by the tenant that started it. The
+      request may land on another gunicorn worker, so cancellation is a marker
+      file in JOBS_DIR that the owning worker polls;
+    - the client disconnects while waiting (closed tab, aborted fetch), seen
+      by peeking at the request socket.
+
+Both are checked while the job waits for a render slot and every
+JOB_POLL_SECONDS while it renders.
+
+Render output is read as it is written and parsed into progress events
+(``manim_engine.progress``). A job's events (queued, started, progress,
+then one of done/failed/cancelled) are appended to ``<id>.events`` in
+JOBS_DIR, which any worker can follow for ``/jobs/<id>/events``, and are kept
+for JOB_EVENTS_TTL_SECONDS after the job ends. A render that prints nothing
+for RENDER_STALL_SECONDS is treated as stalled and killed.
+
+Configuration (environment):
+    JOBS_DIR                 job and cancellation markers, event logs (default: tmp/jobs)
+    JOB_POLL_SECONDS         how often a running render checks for cancellation (default: 0.5)
+    JOB_KILL_GRACE_SECONDS   time between SIGTERM and SIGKILL of a render's processes (default: 2)
+    JOB_EVENTS_TTL_SECONDS   how long a finished job's events are kept (default: 300)
+    JOB_PROGRESS_SECONDS     minimum interval between progress events (default: 0.5)
+    RENDER_STALL_SECONDS     silence after which a render is killed as stalled (default: 120)
+"""
+
+import codecs
+import contextlib
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import select
+import signal
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ..manim_engine.progress import RenderProgress
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join("tmp", "jobs"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+JOB_KILL_GRACE_SECONDS = float(os.getenv("JOB_KILL_GRACE_SECONDS", "2"))
+JOB_EVENTS_TTL_SECONDS = float(os.getenv("JOB_EVENTS_TTL_SECONDS", "300"))
+JOB_PROGRESS_SECONDS = float(os.getenv("JOB_PROGRESS_SECONDS", "0.5"))
+RENDER_STALL_SECONDS = float(os.getenv("RENDER_STALL_SECONDS", "120"))
+
+JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Events after which a job's log is complete
+TERMINAL_EVENTS = ("done", "failed", "cancelled", "lost")
+
+
+class RenderCancelled(Exception):
+    """A render was cancelled by its client, or the client went away."""
+
+
+class RenderStalled(subprocess.TimeoutExpired):
+    """A render printed nothing for RENDER_STALL_SECONDS; handled like a timeout."""
+
+
+def client_disconnected(environ: dict) -> Callable[[], bool]:
+    """
+    Check for whether the client of a WSGI request has closed its connection.
+
+    Works with gunicorn (sync and gthread workers) and the Werkzeug development
+    server; elsewhere the check never reports a disconnect.
+    """
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        return lambda: False
+
+    def check() -> bool:
+        # poll, not select: a gthread worker's sockets can be numbered above FD_SETSIZE (1024)
+        try:
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            events = poller.poll(0)
+        except (OSError, ValueError):
+            return False  # cannot tell; let the render run
+        if not events:
+            return False
+        if events[0][1] & (select.POLLHUP | select.POLLERR):
+            return True
+        try:
+            # readable with nothing to read means the peer closed the connection
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except (ConnectionResetError, BrokenPipeError):
+            return True
+        except OSError:
+            return False
+
+    return check
+
+
+def kill_process_group(process: subprocess.Popen, grace: float = JOB_KILL_GRACE_SECONDS):
+    """Terminate ``process`` and every process in its group, escalating to SIGKILL after ``grace`` seconds."""
+    if not hasattr(os, "killpg"):
+        process.kill()
+        return
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    # children may outlive the group leader; sweep whatever is left
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+
+class RenderJob:
+    """A render that can be cancelled; ``should_cancel`` is polled by the waiting and rendering code."""
+
+    def __init__(self, job_id: str, tenant: str, registry: "JobRegistry",
+                 disconnected: Optional[Callable[[], bool]] = None):
+        self.id = job_id
+        self.tenant = tenant
+        self.registry = registry
+        self.disconnected = disconnected
+        self.created_at = time.time()
+        self.reason: Optional[str] = None
+        self._cancel = threading.Event()
+
+    def publish(self, event: dict):
+        """Append an event to the job's log."""
+        self.registry.publish(self.id, event)
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._cancel.is_set():
+            self.reason = reason
+            self._cancel.set()
+
+    def should_cancel(self) -> bool:
+        if self._cancel.is_set():
+            return True
+        if self.registry.cancel_requested(self.id):
+            self.cancel("cancelled")
+        elif self.disconnected is not None and self.disconnected():
+            self.cancel("client disconnected")
+        return self._cancel.is_set()
+
+
+class JobRegistry:
+    """Jobs running in this process, with cancellation shared by every process through JOBS_DIR."""
+
+    def __init__(self, directory: str = JOBS_DIR):
+        self.directory = directory
+        self._jobs: Dict[str, RenderJob] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def open_log(self, job_id: str, tenant: str, fresh: bool = False) -> bool:
+        """
+        Create a job's event log unless it exists (or always, with ``fresh``).
+
+        Returns:
+            bool: True if the log was created.
+        """
+        if not JOB_ID_RE.match(job_id):
+            raise ValueError(f"Invalid job id '{job_id}'")
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self._path(job_id, "events"), "w" if fresh else "x", encoding="utf-8") as f:
+                # the first line names the log's owner; events follow
+                f.write(json.dumps({"tenant": tenant, "created_at": time.time()}) + "\n")
+        except FileExistsError:
+            return False
+        return True
+
+    def attach(self, job_id: str, tenant: str, disconnected: Optional[Callable[[], bool]] = None,
+               exclusive: bool = True) -> RenderJob:
+        """
+        Register a running job; ``detach`` it when it ends.
+
+        Args:
+            exclusive: Refuse a job id that is already running and start a fresh
+                event log. Queue workers pass False: the queue lease decides who
+                runs a job, and a retry continues the job's log.
+
+        Raises:
+            ValueError: If ``job_id`` is malformed, or already running when ``exclusive``.
+        """
+        if not JOB_ID_RE.match(job_id):
+            raise ValueError(f"Invalid job id '{job_id}'")
+        os.makedirs(self.directory, exist_ok=True)
+        self._sweep()
+        with self._lock:
+            if exclusive and (job_id in self._jobs or os.path.exists(self._path(job_id, "json"))):
+                raise ValueError(f"Job '{job_id}' is already running")
+            job = RenderJob(job_id, tenant, self, disconnected)
+            self._jobs[job_id] = job
+            with open(self._path(job_id, "json"), "w", encoding="utf-8") as f:
+                json.dump({"tenant": tenant, "pid": os.getpid(), "created_at": job.created_at}, f)
+            self.open_log(job_id, tenant, fresh=exclusive)
+        return job
+
+    def detach(self, job: RenderJob):
+        with self._lock:
+            if self._jobs.get(job.id) is job:
+                del self._jobs[job.id]
+            for suffix in ("json", "cancel"):
+                with contextlib.suppress(OSError):
+                    os.remove(self._path(job.id, suffix))
+
+    @contextlib.contextmanager
+    def job(self, job_id: str, tenant: str, disconnected: Optional[Callable[[], bool]] = None):
+        """
+        Register a job for the duration of the block, recording how it ended.
+
+        Raises:
+            ValueError: If ``job_id`` is malformed or already running.
+        """
+        job = self.attach(job_id, tenant, disconnected)
+        job.publish({"type": "queued"})
+        try:
+            yield job
+        except RenderCancelled as e:
+            job.publish({"type": "cancelled", "reason": job.reason or str(e)})
+            raise
+        except BaseException as e:
+            job.publish({"type": "failed", "error": str(e) or type(e).__name__})
+            raise
+        else:
+            job.publish({"type": "done"})
+        finally:
+            self.detach(job)
+
+    def owner(self, job_id: str) -> Optional[str]:
+        """Tenant of a job running on this node, or None."""
+        if not JOB_ID_RE.match(job_id):
+            return None
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.tenant
+        try:
+            with open(self._path(job_id, "json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("tenant")
+        except (OSError, ValueError):
+            return None
+
+    def cancel(self, job_id: str, tenant: str) -> bool:
+        """
+        Cancel a job started by ``tenant``.
+
+        Returns:
+            bool: False if no such job of this tenant is running on this node.
+        """
+        if self.owner(job_id) != tenant:
+            return False
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+        else:
+            with open(self._path(job_id, "cancel"), "w", encoding="utf-8"):
+                pass
+        logger.info(f"Job {job_id} cancelled by {tenant}")
+        return True
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._path(job_id, "cancel"))
+
+    def _sweep(self):
+        """Remove event logs of jobs that ended more than JOB_EVENTS_TTL_SECONDS ago."""
+        cutoff = time.time() - JOB_EVENTS_TTL_SECONDS
+        for path in glob.glob(os.path.join(self.directory, "*.events")):
+            job_id = os.path.basename(path)[:-len(".events")]
+            with contextlib.suppress(OSError):
+                if os.path.getmtime(path) < cutoff and not os.path.exists(self._path(job_id, "json")):
+                    os.remove(path)
+
+    # --- events --------------------------------------------------------------
+
+    def publish(self, job_id: str, event: dict):
+        event = dict(event, time=round(time.time(), 3))
+        try:
+            # one short O_APPEND write per event, so concurrent readers never see half a line
+            with open(self._path(job_id, "events"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not record event for job {job_id}: {e}")
+
+    def events_owner(self, job_id: str, wait: float = 0.0) -> Optional[str]:
+        """
+        Tenant of a job with an event log, waiting up to ``wait`` seconds for the job to be registered.
+
+        Clients open the event stream and send the render request at the same
+        time, so the job may not exist yet.
+        """
+        if not JOB_ID_RE.match(job_id):
+            return None
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                with open(self._path(job_id, "events"), "r", encoding="utf-8") as f:
+                    return json.loads(f.readline()).get("tenant")
+            except (OSError, ValueError):
+                pass
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(JOB_POLL_SECONDS)
+
+    def events(self, job_id: str) -> List[dict]:
+        """Events recorded so far, oldest first."""
+        try:
+            with open(self._path(job_id, "events"), "r", encoding="utf-8") as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            return []
+        return [json.loads(line) for line in lines if line.endswith("\n")]
+
+    def follow(self, job_id: str, after: int = 0, keepalive: float = 15.0,
+               alive: Optional[Callable[[], bool]] = None) -> Iterator[Optional[dict]]:
+        """
+        Yield a job's events as they are recorded, until it ends.
+
+        Each event carries its sequence number as ``id``; pass the last one
+        seen as ``after`` to resume. None is yielded after ``keepalive``
+        seconds without events, so the caller can ping the client.
+
+        Args:
+            alive: Whether the job can still record events (default: it is
+                running on this node); a job that is not ends with a ``lost`` event.
+        """
+        alive = alive or (lambda: os.path.exists(self._path(job_id, "json")))
+        seen = 0
+        partial = ""
+        idle_since = time.monotonic()
+        with open(self._path(job_id, "events"), "r", encoding="utf-8") as f:
+            f.readline()  # owner
+            while True:
+                chunk = f.read()
+                lines = (partial + chunk).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    seen += 1
+                    if seen <= after:
+                        continue
+                    event = dict(json.loads(line), id=seen)
+                    idle_since = time.monotonic()
+                    yield event
+                    if event["type"] in TERMINAL_EVENTS:
+                        return
+                if not chunk:
+                    # the final event is written before the job is unregistered, so a job
+                    # that is gone with nothing left to read ended without one (worker crashed)
+                    if not alive():
+                        position = f.tell()
+                        if not f.read(1):
+                            yield {"type": "lost", "id": seen + 1}
+                            return
+                        f.seek(position)
+                        continue
+                    if time.monotonic() - idle_since >= keepalive:
+                        idle_since = time.monotonic()
+                        yield None
+                    time.sleep(JOB_POLL_SECONDS)
+
+
+def _pump(stream, name: str, chunks: "queue.Queue"):
+    """Forward a pipe's output to ``chunks`` as it arrives, then a None end marker."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        for block in iter(lambda: stream.read1(65536), b""):
+            chunks.put((name, decoder.decode(block)))
+        chunks.put((name, decoder.decode(b"", final=True)))
+    except (OSError, ValueError):
+        pass
+    finally:
+        chunks.put((name, None))
+
+
+def run_render_process(command: List[str], timeout: Optional[float] = None, job: Optional[RenderJob] = None,
+                       animations: Optional[int] = None, stall_timeout: Optional[float] = RENDER_STALL_SECONDS,
+                       **kwargs) -> subprocess.CompletedProcess:
+    """
+    ``subprocess.run(command, capture_output=True, text=True)`` in a new process group.
+
+    Output is read while the render runs; with a ``job``, manim's progress is
+    published as events. On cancellation, timeout or a stall the whole group is killed.
+
+    Args:
+        command: Command line.
+        timeout: Seconds before the render is killed.
+        job: Job whose cancellation stops the render and which receives progress events.
+        animations: Expected number of animations (``progress.count_animations``), for the overall fraction.
+        stall_timeout: Seconds without any output before the render is killed; None to disable.
+        **kwargs: Passed to ``subprocess.Popen`` (cwd, env).
+
+    Returns:
+        subprocess.CompletedProcess: Return code and captured output; check it as with ``subprocess.run``.
+
+    Raises:
+        RenderCancelled: If the job was cancelled.
+        subprocess.TimeoutExpired: If the render ran longer than ``timeout``, or stalled (``RenderStalled``).
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True, **kwargs)
+    chunks: "queue.Queue" = queue.Queue()
+    output = {"stdout": [], "stderr": []}
+    readers = [threading.Thread(target=_pump, args=(getattr(process, name), name, chunks), daemon=True)
+               for name in output]
+    for reader in readers:
+        reader.start()
+
+    progress = RenderProgress(animations)
+    if job is not None:
+        job.publish({"type": "started", "animations": animations})
+    now = time.monotonic()
+    deadline = now + timeout if timeout is not None else None
+    last_output = last_event = now
+    open_streams = len(readers)
+    pending = False  # progress not yet published
+    try:
+        while open_streams:
+            try:
+                name, text = chunks.get(timeout=JOB_POLL_SECONDS)
+            except queue.Empty:
+                name, text = None, ""
+            now = time.monotonic()
+            if text is None:
+                open_streams -= 1
+            elif text:
+                output[name].append(text)
+                last_output = now
+                pending = progress.feed(text, name) or pending
+            # also while the output pauses, so the last progress before a long frame is not held back
+            if job is not None and pending and now - last_event >= JOB_PROGRESS_SECONDS:
+                job.publish(progress.event())
+                last_event, pending = now, False
+            if job is not None and job.should_cancel():
+                logger.info(f"Job {job.id} {job.reason}; killing render process group {process.pid}")
+                raise RenderCancelled(f"Render {job.reason}")
+            if deadline is not None and now > deadline:
+                logger.warning(f"Render exceeded {timeout:.0f}s; killing process group {process.pid}")
+                raise subprocess.TimeoutExpired(command, timeout)
+            if stall_timeout is not None and now - last_output > stall_timeout:
+                logger.warning(f"Render silent for {stall_timeout:.0f}s at {progress.event()['fraction']:.0%}; "
+                               f"killing process group {process.pid}")
+                raise RenderStalled(command, stall_timeout)
+        process.wait()
+    finally:
+        if process.returncode is None:
+            kill_process_group(process)
+        for reader in readers:
+            reader.join(JOB_KILL_GRACE_SECONDS)
+        process.stdout.close()
+        process.stderr.close()
+    if job is not None and pending:
+        job.publish(progress.event())
+    return subprocess.CompletedProcess(command, process.returncode, "".join(output["stdout"]),
+                                       "".join(output["stderr"]))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> JobRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = JobRegistry()
+    return _registry
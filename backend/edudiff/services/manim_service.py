@@ -1,26 +1,37 @@
 import logging
 import re
 from ..manim_engine import templates
+from ..math.equations import scene_code, solve_equation
 from ..llm import generator
 
 logger = logging.getLogger(__name__)
 
 class ManimService:
     @staticmethod
-    def generate_code(concept):
+    def generate_code(concept, params=None):
         """
         Generate Manim code based on the concept with validation.
         
+        Args:
+            concept: The user's concept text.
+            params: Values parsed from the concept (``params.extract_params``), if already extracted.
+        
         Returns:
             tuple: (code, used_ai, visualization_type)
         """
         try:
+            # Linear/quadratic equations are solved locally and animated step by step
+            solution = solve_equation(concept)
+            if solution:
+                logger.info(f"Solving '{solution['equation']}' locally ({solution['kind']})")
+                return scene_code(solution), False, "equation_steps"
+
             # Check if this is a LaTeX expression
             if templates.is_likely_latex(concept):
                 return templates.generate_latex_scene_code(concept), False, "latex_render"
             
             # Try to use a template first
-            result = templates.select_template(concept)
+            result = templates.select_template(concept, params)
             if result:
                 code, viz_type = result
                 logger.info(f"Using template '{viz_type}' for concept: {concept}")
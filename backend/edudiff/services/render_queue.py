@@ -0,0 +1,310 @@
+"""
+Durable local render queue.
+
+With RENDER_QUEUE enabled, ``/generate`` does not run manim in the API
+process: it enqueues the scene here and waits, and render workers
+(``render_worker.py``) lease jobs, render them and record the result. API
+nodes and render nodes then scale independently, any number of worker
+processes drain the same queue, and nothing beyond a file is needed.
+
+The queue is one SQLite database in WAL mode. A worker leases a job for
+RENDER_LEASE_SECONDS and renews the lease with heartbeats while it renders;
+a worker that dies stops renewing, and the job is leased again once the
+lease runs out, up to RENDER_MAX_ATTEMPTS attempts. Failures that may pass
+on a retry (a stalled render, a full node) are retried after an exponential
+backoff; errors in the scene itself are not. Leases go to the interactive
+lane first, then to the tenant that has had the fewest jobs leased in the
+last FAIR_WINDOW_SECONDS (so tenants take turns), then oldest first.
+
+Workers on other hosts need RENDER_QUEUE_DB, JOBS_DIR and the video output
+directory on a shared volume whose file locking SQLite can rely on (a local
+disk mounted into several containers, not NFS).
+
+Configuration (environment):
+    RENDER_QUEUE                render through the queue and render_worker.py (default: 0)
+    RENDER_QUEUE_DB             queue database (default: tmp/render_queue.sqlite3)
+    RENDER_LEASE_SECONDS        lease length; heartbeats renew it at a third of this (default: 30)
+    RENDER_MAX_ATTEMPTS         attempts per job, counting lease expiries (default: 3)
+    RENDER_RETRY_BACKOFF        seconds before the first retry, doubled per attempt (default: 5)
+    RENDER_QUEUE_RETENTION      seconds finished jobs are kept (default: 86400)
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+RENDER_QUEUE = os.getenv("RENDER_QUEUE", "0") in ("1", "true", "True")
+RENDER_QUEUE_DB = os.getenv("RENDER_QUEUE_DB", os.path.join("tmp", "render_queue.sqlite3"))
+RENDER_LEASE_SECONDS = float(os.getenv("RENDER_LEASE_SECONDS", "30"))
+RENDER_MAX_ATTEMPTS = int(os.getenv("RENDER_MAX_ATTEMPTS", "3"))
+RENDER_RETRY_BACKOFF = float(os.getenv("RENDER_RETRY_BACKOFF", "5"))
+RENDER_QUEUE_RETENTION = float(os.getenv("RENDER_QUEUE_RETENTION", "86400"))
+
+# Job states; the last three are final
+QUEUED, LEASED, DONE, FAILED, CANCELLED = "queued", "leased", "done", "failed", "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Recent service that counts against a tenant when picking the next job
+FAIR_WINDOW_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_jobs (
+    id TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS render_jobs_state ON render_jobs (state, available_at);
+CREATE INDEX IF NOT EXISTS render_jobs_tenant ON render_jobs (tenant, updated_at);
+"""
+
+
+def _row(row: Optional[sqlite3.Row]) -> Optional[dict]:
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class RenderQueue:
+    """Render jobs in SQLite, leased to workers."""
+
+    def __init__(self, path: str = RENDER_QUEUE_DB, lease_seconds: float = RENDER_LEASE_SECONDS,
+                 max_attempts: int = RENDER_MAX_ATTEMPTS, backoff: float = RENDER_RETRY_BACKOFF):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db().executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        """This thread's connection (sqlite3 connections are not shared between threads)."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """A write transaction; IMMEDIATE so two workers never lease the same job."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # --- API side ------------------------------------------------------------
+
+    def enqueue(self, job_id: str, tenant: str, lane: str, payload: dict,
+                max_attempts: Optional[int] = None) -> dict:
+        """
+        Add a job.
+
+        Raises:
+            ValueError: If a job with this id exists.
+        """
+        now = time.time()
+        try:
+            with self._transaction() as db:
+                db.execute(
+                    "INSERT INTO render_jobs (id, tenant, lane, payload, state, max_attempts, available_at,"
+                    " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, tenant, lane, json.dumps(payload), QUEUED, max_attempts or self.max_attempts,
+                     now, now, now))
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Job '{job_id}' already exists") from e
+        logger.info(f"Queued render {job_id} for {tenant} ({lane}); {self.depth()} waiting")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return _row(self._db().execute("SELECT * FROM render_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def depth(self, lane: Optional[str] = None) -> int:
+        """Jobs waiting for a worker (one lane, or all)."""
+        if lane:
+            query, args = "SELECT COUNT(*) FROM render_jobs WHERE state = ? AND lane = ?", (QUEUED, lane)
+        else:
+            query, args = "SELECT COUNT(*) FROM render_jobs WHERE state = ?", (QUEUED,)
+        return self._db().execute(query, args).fetchone()[0]
+
+    def queued_for(self, tenant: str) -> int:
+        """Jobs of ``tenant`` waiting for a worker, in either lane."""
+        return self._db().execute("SELECT COUNT(*) FROM render_jobs WHERE state = ? AND tenant = ?",
+                                  (QUEUED, tenant)).fetchone()[0]
+
+    def cancel(self, job_id: str, tenant: str) -> Optional[str]:
+        """
+        Cancel a job of ``tenant``: a queued job at once, a leased one at its worker's next heartbeat.
+
+        Returns:
+            str: The job's state after the call, or None if there is no such unfinished job.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if db.execute("UPDATE render_jobs SET state = ?, error = 'cancelled', updated_at = ?"
+                          " WHERE id = ? AND tenant = ? AND state = ?",
+                          (CANCELLED, now, job_id, tenant, QUEUED)).rowcount:
+                return CANCELLED
+            if db.execute("UPDATE render_jobs SET cancel_requested = 1, updated_at = ?"
+                          " WHERE id = ? AND tenant = ? AND state = ?",
+                          (now, job_id, tenant, LEASED)).rowcount:
+                return LEASED
+        return None
+
+    def wait(self, job_id: str, timeout: float, poll: float = 0.5,
+             cancelled: Optional[Callable[[], bool]] = None) -> Optional[dict]:
+        """
+        Wait for a job to finish.
+
+        Args:
+            timeout: Seconds to wait.
+            cancelled: Polled while waiting; when it returns True the wait stops early.
+
+        Returns:
+            dict: The job, finished or not (check ``state``), or None if it does not exist.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["state"] in FINAL_STATES or time.monotonic() >= deadline:
+                return job
+            if cancelled is not None and cancelled():
+                return job
+            time.sleep(poll)
+
+    # --- worker side ---------------------------------------------------------
+
+    def lease(self, worker: str, lanes: Iterable[str] = ("interactive", "batch")) -> Optional[dict]:
+        """
+        Take the next job for ``worker``, reclaiming jobs whose worker stopped heartbeating.
+
+        Returns:
+            dict: The leased job (``attempts`` counts this attempt), or None if nothing is ready.
+        """
+        lanes = list(lanes)
+        now = time.time()
+        with self._transaction() as db:
+            expired = db.execute("SELECT id, worker, attempts, max_attempts FROM render_jobs"
+                                 " WHERE state = ? AND lease_expires < ?", (LEASED, now)).fetchall()
+            for job in expired:
+                final = job["attempts"] >= job["max_attempts"]
+                logger.warning(f"Lease of render {job['id']} by {job['worker']} expired "
+                               f"(attempt {job['attempts']}/{job['max_attempts']})")
+                db.execute("UPDATE render_jobs SET state = ?, worker = NULL, lease_expires = NULL, error = ?,"
+                           " updated_at = ? WHERE id = ?",
+                           (FAILED if final else QUEUED, "worker lost", now, job["id"]))
+            row = db.execute(
+                f"SELECT * FROM render_jobs AS j WHERE state = ? AND available_at <= ?"
+                f" AND lane IN ({', '.join('?' * len(lanes))})"
+                " ORDER BY CASE lane WHEN 'interactive' THEN 0 ELSE 1 END,"
+                " (SELECT COUNT(*) FROM render_jobs AS r WHERE r.tenant = j.tenant AND r.attempts > 0"
+                "  AND r.updated_at > ?),"
+                " created_at LIMIT 1",
+                (QUEUED, now, *lanes, now - FAIR_WINDOW_SECONDS)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE render_jobs SET state = ?, worker = ?, attempts = attempts + 1,"
+                       " lease_expires = ?, updated_at = ? WHERE id = ?",
+                       (LEASED, worker, now + self.lease_seconds, now, row["id"]))
+        job = self.get(row["id"])
+        logger.info(f"Render {job['id']} leased to {worker} (attempt {job['attempts']}/{job['max_attempts']})")
+        return job
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """
+        Renew a lease.
+
+        Returns:
+            bool: False if the worker should stop: the lease was lost or the job was cancelled.
+        """
+        with self._transaction() as db:
+            renewed = db.execute("UPDATE render_jobs SET lease_expires = ?, updated_at = ?"
+                                 " WHERE id = ? AND worker = ? AND state = ?",
+                                 (time.time() + self.lease_seconds, time.time(), job_id, worker, LEASED)).rowcount
+            row = db.execute("SELECT cancel_requested FROM render_jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(renewed) and not (row and row["cancel_requested"])
+
+    def _finish(self, job_id: str, worker: str, state: str, result: Optional[dict] = None,
+                error: Optional[str] = None, available_at: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            return bool(db.execute(
+                "UPDATE render_jobs SET state = ?, result = ?, error = ?, worker = NULL, lease_expires = NULL,"
+                " available_at = COALESCE(?, available_at), updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                (state, json.dumps(result) if result is not None else None, error, available_at, now,
+                 job_id, worker, LEASED)).rowcount)
+
+    def complete(self, job_id: str, worker: str, result: dict) -> bool:
+        """Record a finished render; False if the lease had been lost."""
+        return self._finish(job_id, worker, DONE, result=result)
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = False) -> str:
+        """
+        Record a failed attempt, queueing a retry with backoff if ``retry`` and attempts remain.
+
+        Returns:
+            str: The job's new state (queued or failed).
+        """
+        job = self.get(job_id)
+        if retry and job is not None and job["attempts"] < job["max_attempts"] and not job["cancel_requested"]:
+            delay = self.backoff * 2 ** (job["attempts"] - 1)
+            self._finish(job_id, worker, QUEUED, error=error, available_at=time.time() + delay)
+            logger.warning(f"Render {job_id} failed ({error}); retrying in {delay:.0f}s")
+            return QUEUED
+        self._finish(job_id, worker, FAILED, error=error)
+        return FAILED
+
+    def cancelled(self, job_id: str, worker: str) -> bool:
+        """Record that the worker stopped a cancelled job."""
+        return self._finish(job_id, worker, CANCELLED, error="cancelled")
+
+    def purge(self, older_than: float = RENDER_QUEUE_RETENTION) -> int:
+        """Delete jobs that finished more than ``older_than`` seconds ago."""
+        placeholders = ", ".join("?" * len(FINAL_STATES))
+        with self._transaction() as db:
+            return db.execute(f"DELETE FROM render_jobs WHERE state IN ({placeholders}) AND updated_at < ?",
+                              (*FINAL_STATES, time.time() - older_than)).rowcount
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_render_queue() -> RenderQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RenderQueue()
+    return _queue
@@ -0,0 +1,179 @@
+"""
+Render worker: drains the render queue.
+
+A worker leases a job (``render_queue``), writes its scene to a scratch
+directory, renders it with ``render_scene`` (taking a node render slot, so
+several workers on one host still respect RENDER_SLOTS) and moves the video
+to the job's output path. A heartbeat thread renews the lease while the
+render runs; when the job is cancelled or the lease is lost, the render's
+process group is killed. Progress goes to the job's event log in JOBS_DIR, so
+``/jobs/<id>/events`` works as it does for renders in the API process.
+
+Run with ``python render_worker.py`` (see ``--help``).
+
+Configuration (environment):
+    RENDER_WORK_DIR       scratch space for scenes being rendered (default: tmp/render_work)
+    RENDER_WORKER_POLL    seconds between polls of an empty queue (default: 1)
+"""
+
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from ..manim_engine.renderer import render_scene
+from .jobs import RenderCancelled, RenderStalled, get_job_registry
+from .render_queue import CANCELLED, FAILED, FINAL_STATES, QUEUED, RenderQueue, get_render_queue
+from .scheduler import LANES, SchedulerRejected
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORK_DIR = os.getenv("RENDER_WORK_DIR", os.path.join("tmp", "render_work"))
+RENDER_WORKER_POLL = float(os.getenv("RENDER_WORKER_POLL", "1"))
+
+# How often an idle worker deletes old finished jobs
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Failures a retry may get past: a stalled render, a full node, I/O errors. Scene errors are final."""
+    if isinstance(error, (SchedulerRejected, OSError)):
+        return True
+    return isinstance(error, RuntimeError) and isinstance(error.__cause__, RenderStalled)
+
+
+class RenderWorker:
+    """Leases render jobs one at a time and renders them."""
+
+    def __init__(self, queue: Optional[RenderQueue] = None, worker_id: Optional[str] = None,
+                 lanes: Iterable[str] = LANES, work_dir: str = RENDER_WORK_DIR, poll: float = RENDER_WORKER_POLL):
+        self.queue = queue or get_render_queue()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lanes = list(lanes)
+        self.work_dir = work_dir
+        self.poll = poll
+        self.stop = threading.Event()
+
+    def run(self, once: bool = False) -> int:
+        """
+        Render jobs until ``stop`` is set (or, with ``once``, until the queue is empty).
+
+        A job being rendered when ``stop`` is set is finished first.
+
+        Returns:
+            int: Jobs processed.
+        """
+        logger.info(f"Render worker {self.worker_id} started (lanes: {', '.join(self.lanes)})")
+        processed = 0
+        last_purge = 0.0
+        while not self.stop.is_set():
+            job = self.queue.lease(self.worker_id, self.lanes)
+            if job is None:
+                if once:
+                    break
+                if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                    self.queue.purge()
+                    last_purge = time.monotonic()
+                self.stop.wait(self.poll)
+                continue
+            self.process(job)
+            processed += 1
+        logger.info(f"Render worker {self.worker_id} stopped after {processed} jobs")
+        return processed
+
+    def _heartbeat(self, job: dict, render_job, done: threading.Event):
+        while not done.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(job["id"], self.worker_id):
+                current = self.queue.get(job["id"])
+                cancelled = current is not None and current["cancel_requested"]
+                render_job.cancel("cancelled" if cancelled else "lease lost")
+                return
+
+    def process(self, job: dict):
+        """Render one leased job and record the outcome in the queue and the job's event log."""
+        payload = job["payload"]
+        registry = get_job_registry()
+        render_job = registry.attach(job["id"], job["tenant"], exclusive=False)
+        render_job.publish({"type": "leased", "worker": self.worker_id, "attempt": job["attempts"]})
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, render_job, done), daemon=True)
+        heartbeat.start()
+        try:
+            os.makedirs(self.work_dir, exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix=f"{job['id']}_", dir=self.work_dir) as scratch:
+                scene_file = os.path.join(scratch, "scene.py")
+                with open(scene_file, "w", encoding="utf-8") as f:
+                    f.write(payload["code"])
+                video = render_scene(scene_file, payload.get("scene", "MainScene"), os.path.join(scratch, "media"),
+                                     quality=payload.get("quality", "l"), tenant=job["tenant"], lane=job["lane"],
+                                     cost=payload.get("cost", 1.0), job=render_job)
+                if not video:
+                    raise RuntimeError("Video file not found after rendering")
+                output_path = payload["output_path"]
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                shutil.move(video, output_path)
+        except RenderCancelled:
+            if render_job.reason == "lease lost":
+                logger.warning(f"Lost the lease on render {job['id']}; another worker will take it")
+            else:
+                self.queue.cancelled(job["id"], self.worker_id)
+                render_job.publish({"type": "cancelled", "reason": render_job.reason})
+        except Exception as e:
+            state = self.queue.fail(job["id"], self.worker_id, str(e), retry=is_retryable(e))
+            logger.error(f"Render {job['id']} failed on attempt {job['attempts']}: {e}")
+            render_job.publish({"type": "retrying" if state == QUEUED else "failed", "error": str(e)})
+        else:
+            if self.queue.complete(job["id"], self.worker_id, {"video_path": payload["output_path"]}):
+                render_job.publish({"type": "done"})
+            else:
+                logger.warning(f"Render {job['id']} finished after its lease was lost")
+        finally:
+            done.set()
+            heartbeat.join()
+            registry.detach(render_job)
+
+
+def cancel_render(job_id: str, tenant: str) -> bool:
+    """
+    Cancel a queued render of ``tenant``.
+
+    Returns:
+        bool: False if the tenant has no such unfinished job.
+    """
+    state = get_render_queue().cancel(job_id, tenant)
+    if state == CANCELLED:
+        # never leased, so no worker will record it
+        get_job_registry().publish(job_id, {"type": "cancelled", "reason": "cancelled"})
+    return state is not None
+
+
+def wait_for_render(job_id: str, timeout: float, cancelled: Optional[Callable[[], bool]] = None) -> dict:
+    """
+    Wait for a queued render; it is cancelled if ``cancelled`` fires or ``timeout`` passes first.
+
+    Returns:
+        dict: The finished job.
+
+    Raises:
+        RenderCancelled: If the job was cancelled.
+        subprocess.TimeoutExpired: If it did not finish within ``timeout``.
+        RuntimeError: If the render failed.
+    """
+    job = get_render_queue().wait(job_id, timeout, cancelled=cancelled)
+    if job is None:
+        raise RuntimeError(f"Render job {job_id} is not in the queue")
+    if job["state"] not in FINAL_STATES:
+        cancel_render(job_id, job["tenant"])
+        if cancelled is not None and cancelled():
+            raise RenderCancelled("Render client disconnected")
+        raise subprocess.TimeoutExpired(job_id, timeout)
+    if job["state"] == CANCELLED:
+        raise RenderCancelled("Render cancelled")
+    if job["state"] == FAILED:
+        raise RuntimeError(job["error"])
+    return job
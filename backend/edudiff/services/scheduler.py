@@ -0,0 +1,357 @@
+"""
+Render scheduler: admission control, priority lanes and per-tenant fairness.
+
+Every manim render takes a slot first. Slots are lock files shared by all
+workers on the node, so no more than RENDER_SLOTS renders (default: the core
+count) run at once however many gunicorn workers there are; a render that
+would oversubscribe the CPU waits instead of slowing everyone down.
+
+Waiting renders are queued in two lanes. ``interactive`` (a user waiting on
+``/generate``) always goes first; ``batch`` (pipeline jobs, prewarming) only
+runs when no interactive render is waiting, and never holds more than
+RENDER_BATCH_SLOTS slots. Within a lane, tenants share slots by weighted fair
+queuing: each render is tagged with a virtual finish time (its estimated cost
+divided by the tenant's weight, after the tenant's previous render), and the
+smallest tag runs next, so one user queueing ten renders does not delay
+another user's first.
+
+Requests are refused quickly instead of queueing without bound:
+429 when the tenant already has RENDER_TENANT_MAX_QUEUED renders waiting (a
+tenant known only by its address, which a whole NAT'd classroom may share,
+gets RENDER_IP_MAX_QUEUED), 503
+when the lane is RENDER_QUEUE_MAX deep or a slot does not free up within
+RENDER_QUEUE_TIMEOUT. Both carry a Retry-After estimated from recent render
+times. Queues are per process; run gunicorn with threads so one process sees
+the whole node's queue. With RENDER_QUEUE the API holds no slots, and the same
+limits apply to the jobs waiting in the durable render queue instead.
+
+Configuration (environment):
+    RENDER_SLOTS               concurrent renders per node (default: CPU count)
+    RENDER_BATCH_SLOTS         slots the batch lane may hold (default: half of RENDER_SLOTS, at least 1)
+    RENDER_SLOT_DIR            slot lock files (default: tmp/render_slots)
+    RENDER_QUEUE_MAX           waiting renders per lane before 503 (default: 4 x RENDER_SLOTS)
+    RENDER_TENANT_MAX_QUEUED   waiting renders per signed-in user before 429 (default: 2)
+    RENDER_IP_MAX_QUEUED       waiting renders per client address without a verified user (default: 8)
+    RENDER_QUEUE_TIMEOUT       seconds a render may wait for a slot (default: 120)
+    RENDER_TENANT_WEIGHTS      tenant=weight,... for tenants with a larger share (default weight: 1)
+    SCHEDULER_TRUST_FORWARDED  take the client address from X-Forwarded-For (default: 0)
+"""
+
+import collections
+import contextlib
+import fcntl
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .jobs import RenderCancelled
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "batch")
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        if "=" in item:
+            tenant, weight = item.rsplit("=", 1)
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+
+RENDER_SLOTS = int(os.getenv("RENDER_SLOTS", str(os.cpu_count() or 1)))
+RENDER_BATCH_SLOTS = int(os.getenv("RENDER_BATCH_SLOTS", str(max(1, RENDER_SLOTS // 2))))
+RENDER_SLOT_DIR = os.getenv("RENDER_SLOT_DIR", os.path.join("tmp", "render_slots"))
+RENDER_QUEUE_MAX = int(os.getenv("RENDER_QUEUE_MAX", str(4 * RENDER_SLOTS)))
+RENDER_TENANT_MAX_QUEUED = int(os.getenv("RENDER_TENANT_MAX_QUEUED", "2"))
+RENDER_IP_MAX_QUEUED = int(os.getenv("RENDER_IP_MAX_QUEUED", "8"))
+RENDER_QUEUE_TIMEOUT = float(os.getenv("RENDER_QUEUE_TIMEOUT", "120"))
+RENDER_TENANT_WEIGHTS = _parse_weights(os.getenv("RENDER_TENANT_WEIGHTS", ""))
+SCHEDULER_TRUST_FORWARDED = os.getenv("SCHEDULER_TRUST_FORWARDED", "0") in ("1", "true", "True")
+
+# How often a waiting render re-checks slots freed by other processes
+SLOT_POLL_SECONDS = 0.25
+# Render time assumed before any render has finished
+DEFAULT_RENDER_SECONDS = 30.0
+
+
+class SchedulerRejected(Exception):
+    """A render was refused: the tenant or the node is over its queue limit."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        self.status = status            # 429: this tenant, 503: the node
+        self.retry_after = retry_after  # seconds
+        super().__init__(message)
+
+    def to_dict(self) -> dict:
+        return {"error": "Render queue is full" if self.status == 503 else "Too many queued renders",
+                "details": str(self), "retry_after": self.retry_after}
+
+
+class RenderTicket:
+    """One render waiting for, or holding, a slot."""
+
+    __slots__ = ("id", "tenant", "lane", "start_tag", "finish_tag", "slot", "fd", "enqueued_at", "granted_at")
+
+    def __init__(self, ticket_id: int, tenant: str, lane: str, start_tag: float, finish_tag: float):
+        self.id = ticket_id
+        self.tenant = tenant
+        self.lane = lane
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.slot: Optional[int] = None
+        self.fd: Optional[int] = None
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+
+
+class RenderScheduler:
+    """Node-wide render slots with per-process lanes and weighted fair queues."""
+
+    def __init__(self, slots: int = RENDER_SLOTS, batch_slots: int = RENDER_BATCH_SLOTS,
+                 slot_dir: str = RENDER_SLOT_DIR, queue_max: int = RENDER_QUEUE_MAX,
+                 tenant_max_queued: int = RENDER_TENANT_MAX_QUEUED, timeout: float = RENDER_QUEUE_TIMEOUT,
+                 weights: Optional[Dict[str, float]] = None, ip_max_queued: int = RENDER_IP_MAX_QUEUED):
+        self.slots = max(1, slots)
+        self.batch_slots = max(1, min(batch_slots, self.slots))
+        self.slot_dir = slot_dir
+        self.queue_max = queue_max
+        self.tenant_max_queued = tenant_max_queued
+        self.ip_max_queued = ip_max_queued
+        self.timeout = timeout
+        self.weights = weights if weights is not None else RENDER_TENANT_WEIGHTS
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._waiting: Dict[str, List[RenderTicket]] = {lane: [] for lane in LANES}
+        self._virtual_time = {lane: 0.0 for lane in LANES}
+        self._last_finish: Dict[str, Dict[str, float]] = {lane: {} for lane in LANES}
+        self._active: Dict[int, RenderTicket] = {}
+        self._finished = collections.deque(maxlen=500)  # (finished at, seconds held, seconds since queued)
+
+    # --- slots ---------------------------------------------------------------
+
+    def _try_lock_slot(self) -> Optional[tuple]:
+        os.makedirs(self.slot_dir, exist_ok=True)
+        for slot in range(self.slots):
+            fd = os.open(os.path.join(self.slot_dir, f"slot_{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return slot, fd
+        return None
+
+    # --- queueing ------------------------------------------------------------
+
+    def _tenant_queued(self, tenant: str) -> int:
+        return sum(1 for lane in LANES for t in self._waiting[lane] if t.tenant == tenant)
+
+    def _retry_after(self, ahead: int) -> int:
+        """Seconds until a render queued behind ``ahead`` others would likely start."""
+        return max(1, math.ceil((ahead / self.slots + 1) * self.typical_render_seconds()))
+
+    def _admit(self, tenant: str, lane: str, queue=None):
+        """Raise SchedulerRejected if a new render for ``tenant`` in ``lane`` must be refused."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown render lane '{lane}' (expected one of: {', '.join(LANES)})")
+        if queue is not None:
+            queued, tenant_queued = queue.depth(lane), queue.queued_for(tenant)
+        else:
+            queued, tenant_queued = len(self._waiting[lane]), self._tenant_queued(tenant)
+        by_address = tenant.startswith("ip:")
+        limit = self.ip_max_queued if by_address else self.tenant_max_queued
+        if tenant_queued >= limit:
+            raise SchedulerRejected(f"{limit} renders already queued for this {'address' if by_address else 'user'}",
+                                    429, self._retry_after(queued))
+        if queued >= self.queue_max:
+            raise SchedulerRejected(f"{queued} renders queued in the {lane} lane", 503, self._retry_after(queued))
+
+    def _is_next(self, ticket: RenderTicket) -> bool:
+        waiting = self._waiting[ticket.lane]
+        if min(waiting, key=lambda t: (t.finish_tag, t.id)) is not ticket:
+            return False
+        if ticket.lane == "batch":
+            if self._waiting["interactive"]:
+                return False
+            if sum(1 for t in self._active.values() if t.lane == "batch") >= self.batch_slots:
+                return False
+        return True
+
+    def check(self, tenant: str, lane: str = "interactive", queue=None):
+        """
+        Refuse early, before any work is spent on a request that could not queue.
+
+        Args:
+            tenant: Fairness key (user id or client address).
+            lane: "interactive" or "batch".
+            queue: The durable RenderQueue when renders go through render workers. This process
+                then holds no tickets, so the limits apply to the jobs waiting in that queue.
+
+        Raises:
+            SchedulerRejected: If ``acquire`` (or the queue) would refuse the render right now.
+        """
+        with self._cond:
+            self._admit(tenant, lane, queue)
+
+    def acquire(self, tenant: str, lane: str = "interactive", cost: float = 1.0,
+                timeout: Optional[float] = None, cancelled: Optional[Callable[[], bool]] = None) -> RenderTicket:
+        """
+        Wait for a render slot.
+
+        Args:
+            tenant: Fairness key (user id or client address).
+            lane: "interactive" or "batch".
+            cost: Estimated render cost (e.g. CPU seconds); longer renders advance the tenant's tag further.
+            timeout: Seconds to wait for a slot (default: RENDER_QUEUE_TIMEOUT).
+            cancelled: Polled while waiting; the render leaves the queue once it returns True.
+
+        Returns:
+            RenderTicket: The granted ticket; pass it to ``release``.
+
+        Raises:
+            SchedulerRejected: If the queue is over its limits or no slot freed up in time.
+            RenderCancelled: If ``cancelled`` returned True before a slot was granted.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        weight = self.weights.get(tenant, 1.0)
+        with self._cond:
+            self._admit(tenant, lane)
+            start = max(self._virtual_time[lane], self._last_finish[lane].get(tenant, 0.0))
+            finish = start + max(cost, 0.01) / weight
+            self._last_finish[lane][tenant] = finish
+            ticket = RenderTicket(next(self._ids), tenant, lane, start, finish)
+            self._waiting[lane].append(ticket)
+            try:
+                while True:
+                    if self._is_next(ticket):
+                        locked = self._try_lock_slot()
+                        if locked is not None:
+                            ticket.slot, ticket.fd = locked
+                            break
+                    if cancelled is not None and cancelled():
+                        raise RenderCancelled(f"Render cancelled while queued for {tenant}")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        ahead = len(self._waiting[lane]) - 1
+                        raise SchedulerRejected(f"No render slot within {self.timeout:.0f}s", 503,
+                                                self._retry_after(ahead))
+                    self._cond.wait(min(remaining, SLOT_POLL_SECONDS))
+            finally:
+                self._waiting[lane].remove(ticket)
+                if ticket.fd is None and not any(t.tenant == tenant for t in self._waiting[lane]):
+                    # an abandoned ticket gives back its place in the tenant's sequence
+                    self._last_finish[lane][tenant] = max(self._virtual_time[lane], start)
+                self._cond.notify_all()
+            ticket.granted_at = time.monotonic()
+            self._virtual_time[lane] = max(self._virtual_time[lane], ticket.start_tag)
+            self._active[ticket.id] = ticket
+        logger.info(f"Render slot {ticket.slot} granted to {tenant} ({lane}); "
+                    f"{self.queued()} waiting, {len(self._active)} active in this process")
+        return ticket
+
+    def release(self, ticket: RenderTicket):
+        """Give a slot back and wake the next render."""
+        with self._cond:
+            if self._active.pop(ticket.id, None) is None:
+                return
+            now = time.monotonic()
+            self._finished.append((now, now - ticket.granted_at, now - ticket.enqueued_at))
+            fcntl.flock(ticket.fd, fcntl.LOCK_UN)
+            os.close(ticket.fd)
+            ticket.fd = None
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, tenant: str, lane: str = "interactive", cost: float = 1.0, timeout: Optional[float] = None,
+             cancelled: Optional[Callable[[], bool]] = None):
+        """``acquire``/``release`` as a context manager."""
+        ticket = self.acquire(tenant, lane, cost, timeout, cancelled)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    # --- load ------------------------------------------------------------------
+
+    def queued(self, lane: Optional[str] = None) -> int:
+        """Renders waiting for a slot in this process (one lane, or all)."""
+        return sum(len(self._waiting[l]) for l in ([lane] if lane else LANES))
+
+    def typical_render_seconds(self) -> float:
+        """Mean slot hold time of recent renders."""
+        samples = [held for _, held, _ in self._finished]
+        return sum(samples) / len(samples) if samples else DEFAULT_RENDER_SECONDS
+
+    def p95_latency_seconds(self, window: float = 300.0) -> Optional[float]:
+        """
+        95th percentile of queue wait plus render time, over renders finished in the last ``window`` seconds.
+
+        Returns:
+            float: Seconds, or None if no render finished in the window.
+        """
+        since = time.monotonic() - window
+        samples = sorted(latency for finished, _, latency in list(self._finished) if finished >= since)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(math.ceil(0.95 * len(samples))) - 1)]
+
+    def stats(self) -> dict:
+        with self._cond:
+            p95 = self.p95_latency_seconds()
+            return {
+                "slots": self.slots,
+                "active": len(self._active),
+                "queued": {lane: len(self._waiting[lane]) for lane in LANES},
+                "p95_latency_seconds": round(p95, 2) if p95 is not None else None,
+            }
+
+
+def _verified_user(token: str) -> Optional[str]:
+    """User id of a Firebase ID token, if firebase_admin is installed and the token verifies."""
+    try:
+        import firebase_admin
+        from firebase_admin import auth
+    except ImportError:
+        return None
+    try:
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app()
+        return auth.verify_id_token(token)["uid"]
+    except Exception as e:
+        logger.debug(f"Ignoring unverifiable bearer token: {e}")
+        return None
+
+
+def tenant_for(headers, remote_addr: Optional[str]) -> str:
+    """
+    Fairness key of a request: the verified user id, else the client address.
+
+    Unverified tokens are ignored, so a client cannot claim another user's share.
+    """
+    authorization = headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        user = _verified_user(authorization[len("Bearer "):].strip())
+        if user:
+            return f"user:{user}"
+    if SCHEDULER_TRUST_FORWARDED and headers.get("X-Forwarded-For"):
+        remote_addr = headers["X-Forwarded-For"].split(",")[0].strip()
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RenderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RenderScheduler()
+    return _scheduler
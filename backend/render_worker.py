@@ -0,0 +1,74 @@
+"""
+Render worker entry point: renders jobs from the render queue.
+
+Start the API with RENDER_QUEUE=1 and run workers next to it, on the same
+host or on render hosts sharing RENDER_QUEUE_DB, JOBS_DIR and the video
+directory (see ``edudiff/services/render_queue.py``):
+
+    RENDER_QUEUE=1 gunicorn app:app
+    python render_worker.py --processes 4
+    python render_worker.py --lanes batch --once
+
+SIGTERM or Ctrl-C stops leasing new jobs; renders in progress are finished.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+load_dotenv()
+from edudiff.services.render_worker import RenderWorker
+from edudiff.services.scheduler import LANES, RENDER_SLOTS
+
+
+def run_worker(lanes, once):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s: %(message)s")
+    worker = RenderWorker(lanes=lanes)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop.set())
+    worker.run(once=once)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=RENDER_SLOTS,
+                        help="worker processes (default: RENDER_SLOTS); node render slots still cap concurrency")
+    parser.add_argument("--lanes", default=",".join(LANES), help="comma-separated lanes to take jobs from")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    lanes = [lane.strip() for lane in args.lanes.split(",") if lane.strip()]
+    unknown = set(lanes) - set(LANES)
+    if unknown:
+        parser.error(f"unknown lanes: {', '.join(sorted(unknown))}")
+
+    if args.processes <= 1:
+        run_worker(lanes, args.once)
+        return 0
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(lanes, args.once), name=f"render-worker-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        # the children stop on the same signal; the parent only waits for them
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, forward)
+    for process in processes:
+        process.join()
+    return max((process.exitcode or 0) for process in processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import contextlib
+import os
+import sys
+import wave
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.audio import cache as cache_module
+from edudiff.audio.cache import TTSCache
+
+IDENTITY = {"backend": "test", "version": 1}
+
+
+def write_wav(path, seconds, rate=8000):
+    with contextlib.closing(wave.open(str(path), "w")) as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0" * int(seconds * rate))
+    return str(path)
+
+
+def test_hits_are_linked_with_their_duration(tmp_path):
+    cache = TTSCache(str(tmp_path / "cache"))
+    key = TTSCache.key("We start with a set of axes.", IDENTITY)
+    assert key == TTSCache.key("We  start with a set of axes. ", IDENTITY)
+    assert cache.get(key, str(tmp_path)) is None
+    assert cache.put(key, write_wav(tmp_path / "fresh.wav", 1.5), "axes") == 1.5
+
+    path, duration = TTSCache(str(tmp_path / "cache")).get(key, str(tmp_path / "job"))
+    assert duration == 1.5 and os.path.exists(path)
+    assert cache.duration(path) == 1.5
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    size = os.path.getsize(write_wav(tmp_path / "probe.wav", 1))
+    cache = TTSCache(str(tmp_path / "cache"), max_bytes=2 * size)
+    keys = [TTSCache.key(f"segment {i}", IDENTITY) for i in range(3)]
+    cache.put(keys[0], write_wav(tmp_path / "0.wav", 1))
+    cache.put(keys[1], write_wav(tmp_path / "1.wav", 1))
+    linked, _ = cache.get(keys[0], str(tmp_path / "job"))  # keys[1] is now the oldest
+    cache.put(keys[2], write_wav(tmp_path / "2.wav", 1))
+
+    assert cache.get(keys[1], str(tmp_path / "job")) is None
+    assert not os.path.exists(cache._path(keys[1]))
+    assert cache.get(keys[0], str(tmp_path / "job")) is not None
+    assert os.path.exists(linked)
+
+
+def test_remembered_durations_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "MAX_DURATIONS", 3)
+    cache = TTSCache(str(tmp_path / "cache"))
+    key = TTSCache.key("The final answer is", IDENTITY)
+    cache.put(key, write_wav(tmp_path / "fresh.wav", 1))
+    # a copy (as across filesystems) is a file of its own
+    monkeypatch.setattr(cache_module, "link_or_copy", cache_module.shutil.copyfile)
+    for i in range(5):
+        cache.get(key, str(tmp_path / f"job{i}"))
+    assert len(cache._durations) == 3
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.pipeline import checkpoint
+from edudiff.pipeline.checkpoint import JobCheckpoint, job_key_for
+
+
+def test_key_covers_settings():
+    assert job_key_for("Solve  X = 1") == job_key_for("solve x = 1")
+    assert job_key_for("solve x = 1", {"narration": "mux"}) != job_key_for("solve x = 1", {"narration": "inline"})
+
+
+def test_stages_round_trip_and_expire():
+    with tempfile.TemporaryDirectory() as root:
+        ckpt = JobCheckpoint("job", root=root)
+        ckpt.save("code", "print(1)")
+        assert JobCheckpoint("job", root=root).load("code") == "print(1)"
+        assert JobCheckpoint("job", root=root).has("code")
+        ckpt.meta["stages"]["code"]["completed_at"] = time.time() - checkpoint.CHECKPOINT_TTL - 1
+        ckpt._write_meta()
+        assert not JobCheckpoint("job", root=root).has("code")
+        assert not any(name.endswith(".tmp") for name in os.listdir(ckpt.dir))
+
+
+def test_old_format_is_ignored():
+    with tempfile.TemporaryDirectory() as root:
+        ckpt = JobCheckpoint("job", root=root)
+        ckpt.save("code", "print(1)")
+        ckpt.meta["version"] = checkpoint.CHECKPOINT_VERSION - 1
+        ckpt._write_meta()
+        assert not JobCheckpoint("job", root=root).has("code")
+
+
+def test_runs_of_one_job_are_serialized():
+    with tempfile.TemporaryDirectory() as root:
+        order = []
+        first = JobCheckpoint("job", root=root)
+
+        def second_run():
+            ckpt = JobCheckpoint("job", root=root)
+            with ckpt.locked():
+                order.append(("second", ckpt.has("code")))
+
+        with first.locked():
+            thread = threading.Thread(target=second_run)
+            thread.start()
+            time.sleep(0.2)
+            first.save("code", "print(1)")
+            order.append(("first", True))
+        thread.join(5)
+        assert order == [("first", True), ("second", True)]
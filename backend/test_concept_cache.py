@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.services.concept_cache import ConceptIndex
+
+
+def test_hits_do_not_carry_the_job_id(tmp_path):
+    index = ConceptIndex(path=str(tmp_path / "index.json"))
+    index.add("explain the pythagorean theorem", {"success": True, "job_id": "job-of-someone-else"})
+    hit = ConceptIndex(path=str(tmp_path / "index.json")).lookup("What is the Pythagorean theorem?")
+    assert hit["success"] and "job_id" not in hit
+
+
+def test_entry_vectors_are_reused_until_the_index_changes(tmp_path):
+    index = ConceptIndex(path=str(tmp_path / "index.json"))
+    index.add("derivative of x^2", {"n": 1})
+    index.add("integral of sine", {"n": 2})
+    assert index.lookup("unrelated topic") is None
+    vectors = dict(index._vectors)
+    assert len(vectors) == 2
+    assert index.lookup("another unrelated topic") is None
+    assert all(index._vectors[k] is v for k, v in vectors.items())
+    index.add("eigenvalue of a matrix", {"n": 3})
+    assert not index._vectors
+    assert index.lookup("integrals of sin")["n"] == 2
@@ -0,0 +1,94 @@
+import ast
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.manim_engine.duration import (DurationBudgetError, enforce_duration_budget, narration_offsets,
+                                           planned_duration)
+
+
+def test_within_budget_is_untouched(scene):
+    code = scene("self.play(Create(c), run_time=2)", "self.wait(1)")
+    out, report = enforce_duration_budget(code, budget=60)
+    assert out == code
+    assert report["final"] == 3
+
+
+def test_clamps_and_scales(scene):
+    code = scene("self.play(Create(c), run_time=30)  # slow", "self.wait(10)")
+    out, report = enforce_duration_budget(code, budget=4)
+    assert "# slow" in out
+    assert report["within_budget"]
+    assert planned_duration(out) <= 4.01
+
+
+def test_waits_without_duration_get_keyword(scene):
+    code = scene("self.wait(frozen_frame=False)", "self.wait()", "self.wait(stop_condition=None,)", "self.play(Create(c))")
+    out, _report = enforce_duration_budget(code, budget=2)
+    ast.parse(out)
+    assert "self.wait(frozen_frame=False, duration=" in out
+    assert "self.wait(duration=" in out
+    assert "self.wait(stop_condition=None,duration=" in out
+    assert planned_duration(out) <= 2.01
+
+
+def test_runtime_duration_is_bounded(scene):
+    out, _report = enforce_duration_budget(scene("self.wait(x)", "self.play(Create(c), run_time=t)"), budget=60)
+    assert "self.wait(min(x, 5))" in out
+    assert "run_time=min(t, 5)" in out
+
+
+def test_narration_is_kept(scene):
+    code = scene('self.add_sound("a.wav")', "self.wait(8)", "self.play(Create(c), run_time=5)")
+    out, report = enforce_duration_budget(code, budget=10)
+    assert "self.wait(8)" in out
+    assert report["narration"] == 8
+    try:
+        enforce_duration_budget(code, budget=5)
+    except DurationBudgetError as e:
+        assert e.report["narration"] == 8
+    else:
+        raise AssertionError("narration over budget was accepted")
+
+
+def test_animation_run_time_is_capped_on_the_play(scene):
+    out, report = enforce_duration_budget(scene("self.play(Create(c, run_time=600))"), budget=60)
+    assert report["planned"] == 600
+    assert "self.play(Create(c, run_time=600), run_time=5)" in out
+
+
+def test_loops_without_a_fixed_count_are_rejected(scene):
+    for lines in (("for i in range(n):", "    self.wait(5)"), ("while True:", "    self.play(Create(c))")):
+        try:
+            enforce_duration_budget(scene(*lines), budget=60)
+        except DurationBudgetError as e:
+            assert e.report["unbounded"]
+        else:
+            raise AssertionError(f"accepted {lines}")
+    assert planned_duration(scene("n = 4", "for i in range(n):", "    self.wait(5)")) == 20
+    enforce_duration_budget(scene("for dot in dots:", "    dot.set_color(RED)"), budget=60)  # no timed calls
+
+
+def test_helper_methods_are_planned(scene):
+    code = scene("self.step()", "self.step()") + "\n    def step(self):\n        self.play(Create(c), run_time=30)\n"
+    out, report = enforce_duration_budget(code, budget=60)
+    assert report["planned"] == 60
+    assert out.count("run_time=5") == 1
+    assert planned_duration(out) == 10
+
+
+def test_default_run_times_follow_manim(scene):
+    code = scene('title = Text("Short")',
+                 'body = Text("The derivative measures the rate of change")',
+                 'self.play(Write(title))',
+                 '"narration 0"',
+                 'self.wait(2)',
+                 'self.play(Write(body))',  # 15 glyphs or more: Write takes 2 s
+                 '"narration 1"',
+                 'self.wait(2)',
+                 'self.play(DrawBorderThenFill(c), AddTextLetterByLetter(title))')
+    assert narration_offsets(code) == {0: 1, 1: 5}
+    assert planned_duration(code) == 9
+    assert planned_duration(scene(r'self.play(Write(MathTex(r"\frac{d}{dx} x^2 = 2x")))')) == 1
+    assert planned_duration(scene('self.play(Write(label))')) == 1  # unknown text: manim's default
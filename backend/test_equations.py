@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.math.equations import parse_equation, scene_code, solve_equation
+
+
+def test_linear():
+    solution = solve_equation("solve 2(x + 1) = 3x - 4")
+    assert solution["kind"] == "linear"
+    assert solution["solutions"] == ["x = 6"]
+
+
+def test_quadratic():
+    solution = solve_equation("solve x^2 - 5x + 6 = 0")
+    assert solution["kind"] == "quadratic"
+    assert sorted(solution["solutions"]) == ["x = 2", "x = 3"]
+
+
+def test_constant_powers_fold():
+    assert solve_equation("2x = 2^10")["solutions"] == ["x = 512"]
+
+
+def test_huge_powers_are_rejected_quickly():
+    for text in ("2x = 2^2000000", "2x = 9^9^9", "(x + 1)^1000000 = 0"):
+        start = time.monotonic()
+        assert solve_equation(text) is None
+        assert time.monotonic() - start < 1, text
+
+
+def test_not_an_equation():
+    assert parse_equation("what is a derivative") is None
+    assert solve_equation("x^3 = 8") is None
+    assert solve_equation("x = y + 1") is None
+
+
+def test_scene_code_compiles():
+    compile(scene_code(solve_equation("3x - 4 = 11")), "<scene>", "exec")
+
+
+def test_large_constants_are_cheap():
+    for text in ("x^2 = 10000000000000061", "x^2 = 99999999999999999999999999999999977", "x^2 = 999999999989"):
+        start = time.monotonic()
+        solve_equation(text)
+        assert time.monotonic() - start < 1, text
+    assert solve_equation("x^2 = 10000000000000061") is None
+    assert solve_equation("x^2 = 12")["solutions"] == ["x = - 2\\sqrt{3}", "x = 2\\sqrt{3}"]
+
+
+def test_points_bounds_and_solved_forms_are_not_equations():
+    for text in ("tangent to x^2 - 3x at x = 2", "integral of x^2 from x = 0 to 3",
+                 "derivative of sin(x) at x = 1", "area of a circle with r = 5", "f(x) = x^2 - 4", "x = 7"):
+        assert solve_equation(text) is None, text
+    assert solve_equation("7 = x + 2")["solutions"] == ["x = 5"]
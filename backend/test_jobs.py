@@ -0,0 +1,140 @@
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.services.jobs import JobRegistry, RenderCancelled, RenderStalled, client_disconnected, run_render_process
+
+
+def render_command(pid_file):
+    """A render that reports progress, then starts a grandchild in its process group and sleeps."""
+    return [sys.executable, "-c", "import subprocess, sys, time\n"
+            "print('Animation 0: Create(Circle):  50%|#####     | 15/30', file=sys.stderr, flush=True)\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+            "open(sys.argv[1], 'w').write(str(child.pid))\n"
+            "time.sleep(30)\n", str(pid_file)]
+
+
+def test_disconnect_detection():
+    server, client = socket.socketpair()
+    check = client_disconnected({"gunicorn.socket": server})
+    assert not check()
+    client.sendall(b"x")
+    assert not check()  # pending data is not a disconnect
+    client.close()
+    server.recv(1)
+    assert check()
+    server.close()
+    assert client_disconnected({})() is False
+
+
+def test_disconnect_detection_on_high_descriptors():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if max(soft, hard) < 1200:
+        return
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, 1200), hard))
+    server, client = socket.socketpair()
+    high = socket.socket(fileno=os.dup2(server.fileno(), 1105))
+    try:
+        assert not client_disconnected({"gunicorn.socket": high})()
+    finally:
+        high.close()
+        server.close()
+        client.close()
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_cancel_reaches_the_owning_process(tmp_path):
+    owner, other = JobRegistry(str(tmp_path)), JobRegistry(str(tmp_path))
+    job = owner.attach("job-0001", "user:a")
+    try:
+        owner.attach("job-0001", "user:a")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("attached twice")
+    assert other.owner("job-0001") == "user:a"
+    assert not other.cancel("job-0001", "user:b")
+    assert not job.should_cancel()
+    assert other.cancel("job-0001", "user:a")
+    assert job.should_cancel() and job.reason == "cancelled"
+    owner.detach(job)
+    assert other.owner("job-0001") is None and not other.cancel_requested("job-0001")
+
+
+def test_follow_until_the_job_ends(tmp_path):
+    registry = JobRegistry(str(tmp_path))
+    with registry.job("job-0001", "user:a") as job:
+        job.publish({"type": "progress", "fraction": 0.5})
+    assert registry.events_owner("job-0001") == "user:a"
+    events = list(registry.follow("job-0001"))
+    assert [(e["id"], e["type"]) for e in events] == [(1, "queued"), (2, "progress"), (3, "done")]
+    assert [e["id"] for e in registry.follow("job-0001", after=2)] == [3]
+
+    # a job that went away without a final event (its worker died)
+    registry.detach(registry.attach("job-0002", "user:a"))
+    assert [e["type"] for e in registry.follow("job-0002")] == ["lost"]
+
+
+def test_follow_sends_keepalives(tmp_path):
+    registry = JobRegistry(str(tmp_path))
+    job = registry.attach("job-0001", "user:a")
+    events = registry.follow("job-0001", keepalive=0)
+    assert next(events) is None
+    job.publish({"type": "done"})
+    assert next(events)["type"] == "done"
+    registry.detach(job)
+
+
+def test_render_process_output_and_progress(tmp_path):
+    registry = JobRegistry(str(tmp_path))
+    job = registry.attach("job-0001", "user:a")
+    result = run_render_process([sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr)"],
+                                timeout=30, job=job)
+    assert (result.returncode, result.stdout, result.stderr) == (0, "out\n", "err\n")
+    assert registry.events("job-0001")[0]["type"] == "started"
+    registry.detach(job)
+
+
+def group_is_gone(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    # a killed grandchild of this test process lingers as a zombie until init reaps it
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split(")")[-1].split()[0] == "Z"
+
+
+def test_cancelled_render_kills_the_process_group(tmp_path):
+    registry = JobRegistry(str(tmp_path))
+    job = registry.attach("job-0001", "user:a")
+    threading.Timer(1.0, registry.cancel, args=("job-0001", "user:a")).start()
+    started = time.monotonic()
+    try:
+        run_render_process(render_command(tmp_path / "child.pid"), timeout=30, job=job, animations=1)
+    except RenderCancelled:
+        pass
+    else:
+        raise AssertionError("not cancelled")
+    assert time.monotonic() - started < 10
+    events = registry.events("job-0001")
+    assert any(e["type"] == "progress" for e in events)
+    assert group_is_gone(int((tmp_path / "child.pid").read_text()))
+    registry.detach(job)
+
+
+def test_stalled_render_is_killed(tmp_path):
+    started = time.monotonic()
+    try:
+        run_render_process(render_command(tmp_path / "child.pid"), timeout=30, stall_timeout=1)
+    except RenderStalled as e:
+        assert isinstance(e, subprocess.TimeoutExpired)
+    else:
+        raise AssertionError("not stopped")
+    assert time.monotonic() - started < 10
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.manim_engine.params import compile_function, expression_tree, extract_params, params_key
+
+
+def test_polynomial_with_range():
+    params = extract_params("graph x^2 - 4x + 3 from -1 to 5")
+    assert params["expression"] == "x**2 - 4*x + 3"
+    assert params["coefficients"] == [1.0, -4.0, 3.0]
+    assert params["x_range"] == [-1.0, 5.0]
+
+
+def test_compile_function():
+    f = compile_function("x**2 - 4*x + 3")
+    assert f(1) == 0.0
+    assert f(2) == -1.0
+
+
+def test_rejects_unsafe_expressions():
+    for expression in ("__import__('os')", "x.real", "x**100", "open(x)"):
+        try:
+            expression_tree(expression)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {expression}")
+
+
+def test_power_tower_is_cheap():
+    start = time.monotonic()
+    params = extract_params("plot 9^9^9 x")
+    assert time.monotonic() - start < 1
+    assert "expression" not in params
+
+
+def test_small_and_variable_exponents_still_parse():
+    assert compile_function(expression_tree("e**(-x**2)"))(0) == 1.0
+    assert compile_function(expression_tree("x**(1/2)"))(4) == 2.0
+    assert compile_function(expression_tree("2**x"))(3) == 8.0
+
+
+def test_params_key_is_stable():
+    a = params_key(extract_params("graph sin x from 0 to 6"))
+    assert a == params_key(extract_params("graph sin x from 0 to 6"))
+    assert a != params_key(extract_params("graph cos x from 0 to 6"))
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.manim_engine.registry import KeywordAutomaton, TemplateRegistry
+
+
+def registry():
+    templates = TemplateRegistry()
+    templates.register("derivative", keywords=["derivative", "slope"], priority=-1)
+    templates.register("tangent", keywords=["tangent", "derivative"])
+    templates.register("ode", keywords=["ode", "differential equation"])
+    templates.register("sine", keywords=["sine", "sin"])
+    templates.register("cosine", keywords=["cosine"])
+    templates.register("quadratic", keywords=["parabola", "x^2"], formula_keywords=["x^2"])
+    return templates
+
+
+def test_automaton_finds_overlapping_keywords():
+    matches = sorted(KeywordAutomaton(["he", "she", "hers"]).iter_matches("ushers"))
+    assert matches == [("he", 2, 4), ("hers", 2, 6), ("she", 1, 4)]
+
+
+def test_word_boundaries_and_plurals():
+    templates = registry()
+    assert templates.match("write some code") is None
+    assert templates.match("plot the cosine").spec.name == "cosine"
+    assert templates.match("solving odes").spec.name == "ode"
+    assert templates.match("sines and waves").spec.name == "sine"
+
+
+def test_score_then_priority_then_order():
+    templates = registry()
+    assert templates.match("tangent line and derivative").spec.name == "tangent"
+    assert templates.match("derivative and slope").spec.name == "derivative"
+    assert templates.match("the derivative").spec.name == "tangent"
+
+
+def test_formula_keywords_can_be_skipped():
+    templates = registry()
+    assert templates.match("graph x^2").spec.name == "quadratic"
+    assert templates.match("graph x^2", skip_formulas=True) is None
+
+
+def test_reregistering_keeps_order_and_recompiles():
+    templates = registry()
+    templates.register("ode", keywords=["ode", "slope field"])
+    assert [spec.name for spec in templates][2] == "ode"
+    assert templates.match("a slope field").spec.name == "ode"
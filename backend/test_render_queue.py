@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.services.render_queue import CANCELLED, DONE, FAILED, LEASED, QUEUED, RenderQueue
+
+
+def render_queue(tmp_path, **kwargs):
+    return RenderQueue(str(tmp_path / "queue.sqlite3"), **kwargs)
+
+
+def test_lease_complete_and_wait(tmp_path):
+    queue = render_queue(tmp_path)
+    queue.enqueue("job-0001", "user:a", "interactive", {"code": "..."})
+    try:
+        queue.enqueue("job-0001", "user:a", "interactive", {})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate job accepted")
+
+    job = queue.lease("worker-1")
+    assert (job["id"], job["state"], job["attempts"], job["payload"]) == ("job-0001", LEASED, 1, {"code": "..."})
+    assert queue.lease("worker-2") is None
+    assert queue.heartbeat("job-0001", "worker-1")
+    assert not queue.heartbeat("job-0001", "worker-2")
+    assert queue.complete("job-0001", "worker-1", {"video": "out.mp4"})
+    done = queue.wait("job-0001", timeout=1)
+    assert done["state"] == DONE and done["result"] == {"video": "out.mp4"}
+
+
+def test_interactive_first_then_tenants_take_turns(tmp_path):
+    queue = render_queue(tmp_path)
+    for job_id, tenant, lane in (("a-1", "user:a", "batch"), ("a-2", "user:a", "interactive"),
+                                 ("a-3", "user:a", "interactive"), ("b-1", "user:b", "interactive")):
+        queue.enqueue(job_id, tenant, lane, {})
+    order = [queue.lease("worker")["id"] for _ in range(4)]
+    assert order == ["a-2", "b-1", "a-3", "a-1"]
+    assert queue.depth() == 0
+
+
+def test_expired_leases_are_reclaimed_until_attempts_run_out(tmp_path):
+    queue = render_queue(tmp_path, lease_seconds=0.05, max_attempts=2)
+    queue.enqueue("job-0001", "user:a", "interactive", {})
+    assert queue.lease("worker-1")["attempts"] == 1
+    time.sleep(0.1)
+    job = queue.lease("worker-2")  # worker-1 stopped heartbeating
+    assert (job["worker"], job["attempts"]) == ("worker-2", 2)
+    assert not queue.complete("job-0001", "worker-1", {})
+    time.sleep(0.1)
+    assert queue.lease("worker-3") is None
+    job = queue.get("job-0001")
+    assert (job["state"], job["error"]) == (FAILED, "worker lost")
+
+
+def test_retries_back_off(tmp_path):
+    queue = render_queue(tmp_path, backoff=0.1, max_attempts=2)
+    queue.enqueue("job-0001", "user:a", "interactive", {})
+    queue.lease("worker")
+    assert queue.fail("job-0001", "worker", "stalled", retry=True) == QUEUED
+    assert queue.lease("worker") is None  # not before the backoff
+    time.sleep(0.15)
+    assert queue.lease("worker")["attempts"] == 2
+    assert queue.fail("job-0001", "worker", "stalled", retry=True) == FAILED
+
+    queue.enqueue("job-0002", "user:a", "interactive", {})
+    queue.lease("worker")
+    assert queue.fail("job-0002", "worker", "NameError in scene") == FAILED
+
+
+def test_cancel(tmp_path):
+    queue = render_queue(tmp_path)
+    queue.enqueue("job-0001", "user:a", "interactive", {})
+    queue.enqueue("job-0002", "user:a", "interactive", {})
+    assert queue.cancel("job-0001", "user:b") is None  # not this tenant's job
+    assert queue.cancel("job-0001", "user:a") == CANCELLED
+    assert queue.queued_for("user:a") == 1
+
+    queue.lease("worker")
+    assert queue.cancel("job-0002", "user:a") == LEASED
+    assert not queue.heartbeat("job-0002", "worker")  # the worker stops at its next heartbeat
+    assert queue.cancelled("job-0002", "worker")
+    assert queue.get("job-0002")["state"] == CANCELLED
+    assert queue.purge(older_than=0) == 2
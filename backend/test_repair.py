@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.manim_engine.repair import RepairCache, fingerprint_error
+
+
+def cache():
+    return RepairCache(os.path.join(tempfile.mkdtemp(), "stats.json"))
+
+
+def test_fingerprint_ignores_paths_and_lines():
+    a = fingerprint_error('File "/tmp/a/scene.py", line 9, in construct\n'
+                          "TypeError: Scene.play() got an unexpected keyword argument 'speed'")
+    b = fingerprint_error('File "/tmp/b/scene.py", line 12, in construct\n'
+                          "TypeError: Scene.play() got an unexpected keyword argument 'speed'")
+    assert a["key"] == b["key"] == "unexpected_kwarg:speed:play"
+    assert (a["lineno"], b["lineno"]) == (9, 12)
+
+
+def test_drop_kwarg_only_on_named_callee_and_keeps_comments(scene):
+    code = scene("c = Circle(speed=2)  # keep me", "self.play(Create(c), speed=2,  run_time=1)")
+    fixed, _fp, rule = cache().repair(code, "TypeError: Scene.play() got an unexpected keyword argument 'speed'")
+    assert rule == "drop_kwarg:play.speed"
+    assert "c = Circle(speed=2)  # keep me" in fixed
+    assert "self.play(Create(c),  run_time=1)" in fixed
+
+
+def test_drop_kwarg_from_base_init_uses_failing_line(scene):
+    code = scene("a = Circle(foo=1)", "b = Square(\n            foo=2,\n        )")
+    stderr = ('File "scene.py", line 7, in construct\n'
+              "TypeError: Mobject.__init__() got an unexpected keyword argument 'foo'")
+    fixed, _fp, rule = cache().repair(code, stderr)
+    assert rule == "drop_kwarg:line.foo"
+    assert "a = Circle(foo=1)" in fixed
+    assert "b = Square(\n            )" in fixed
+    assert cache().repair(code, stderr.splitlines()[-1]) is None
+
+
+def test_preemptive_renames_keep_formatting(scene):
+    code = scene("# draw it", "self.play(ShowCreation(c))", 'g = axes.get_graph(lambda x: x**2)  # parabola')
+    fixed, applied = cache().preemptive_fixes(code)
+    assert applied == ["rename_removed_classes"]
+    assert fixed == code.replace("ShowCreation", "Create")
+
+
+def test_preemptive_fixes_leave_running_code_alone(scene):
+    code = scene('a = Text("Ticket costs $5, parking $3", font="Arial")', 'b = Text("file_{name}.py")',
+                 "square.set_width(2)")
+    assert cache().preemptive_fixes(code) == (code, [])
+    own = "class TexText(Text):\n    pass\n\n\n" + scene('t = TexText("hi")')
+    assert cache().preemptive_fixes(own) == (own, [])
+
+
+def test_text_with_latex_becomes_mathtex_after_the_error(scene):
+    code = scene('t = Text("$x^{2}$", font="Arial", color=BLUE)', 't.set_color_by_tex("x", RED)')
+    stderr = "AttributeError: 'Text' object has no attribute 'set_color_by_tex'"
+    fixed, _fp, rule = cache().repair(code, stderr)
+    assert rule == "text_to_mathtex"
+    assert "t = MathTex('x^{2}', color=BLUE)" in fixed
+
+
+def test_method_renames_are_reactive(scene):
+    code = scene("square.set_width(2)  # fit")
+    fixed, _fp, rule = cache().repair(code, "AttributeError: 'Square' object has no attribute 'set_width'")
+    assert rule == "rename_method:set_width"
+    assert "square.scale_to_fit_width(2)  # fit" in fixed
+
+
+def test_positive_waits(scene):
+    fixed, applied = cache().preemptive_fixes(scene("self.wait(0)  # pause"))
+    assert "self.wait(1)  # pause" in fixed
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.manim_engine.scene_ir import parse_scene
+
+SCENE = '''from manim import *
+
+
+class Helper(VGroup):
+    pass
+
+
+class MainScene(MovingCameraScene):
+    def construct(self):
+        title = MathTex("x^2", "+1")
+        self.add(title)
+        self.play(Write(title), run_time=2)
+        for _ in range(3):
+            self.play(Indicate(title))
+        self.add_sound("a.wav")
+        self.wait(4)
+        "narration 1"
+        self.wait(min(t, 3))
+'''
+
+
+def test_classes_and_calls():
+    ir = parse_scene(SCENE)
+    assert ir.class_name == "MainScene"
+    assert ir.base_names == ["MovingCameraScene"]
+    assert ir.all_base_names == {"VGroup", "MovingCameraScene"}
+    assert ir.tex_strings == ["x^2", "+1"]
+    assert ir.call_names["play"] == 2
+    assert set(ir.assignments()) == {"title"}
+
+
+def test_animations_are_top_level_play_and_add():
+    ir = parse_scene(SCENE)
+    assert [(a.index, a.method) for a in ir.animations] == [(0, "add"), (1, "play")]
+
+
+def test_timeline():
+    ir = parse_scene(SCENE)
+    timeline = [(t.kind, t.multiplier, t.upper_bound, t.narration, t.segment) for t in ir.timeline]
+    assert timeline == [
+        ("play", 1, 2.0, False, None),
+        ("play", 3, 1.0, False, None),
+        ("wait", 1, 4.0, True, None),
+        ("wait", 1, 3.0, True, 1),
+    ]
+    assert len(ir.waits) == 2
+
+
+def test_parse_is_memoized():
+    assert parse_scene(SCENE) is parse_scene(SCENE)
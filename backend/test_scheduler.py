@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.services.jobs import RenderCancelled
+from edudiff.services.render_queue import RenderQueue
+from edudiff.services.scheduler import RenderScheduler, SchedulerRejected, tenant_for
+
+
+def scheduler(tmp_path, **kwargs):
+    options = dict(slots=1, batch_slots=1, slot_dir=str(tmp_path / "slots"), queue_max=10,
+                   tenant_max_queued=5, ip_max_queued=5, timeout=5, weights={})
+    options.update(kwargs)
+    return RenderScheduler(**options)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def queue_renders(sched, renders):
+    """Queue (tenant, lane) renders one at a time behind a held slot; returns the order they ran in."""
+    order, threads, queued = [], [], sched.queued()
+
+    def render(tenant, lane):
+        with sched.slot(tenant, lane):
+            order.append((tenant, lane))
+
+    for i, (tenant, lane) in enumerate(renders):
+        threads.append(threading.Thread(target=render, args=(tenant, lane)))
+        threads[-1].start()
+        wait_until(lambda: sched.queued() == queued + i + 1)
+    return order, threads
+
+
+def rejection(call, *args, **kwargs):
+    try:
+        call(*args, **kwargs)
+    except SchedulerRejected as e:
+        return e
+    raise AssertionError("not rejected")
+
+
+def test_tenants_take_turns(tmp_path):
+    sched = scheduler(tmp_path)
+    holder = sched.acquire("user:holder")
+    order, threads = queue_renders(sched, [("user:a", "interactive"), ("user:a", "interactive"),
+                                           ("user:b", "interactive")])
+    sched.release(holder)
+    for thread in threads:
+        thread.join()
+    assert [tenant for tenant, _ in order] == ["user:a", "user:b", "user:a"]
+
+
+def test_interactive_renders_go_before_batch(tmp_path):
+    sched = scheduler(tmp_path)
+    holder = sched.acquire("user:holder")
+    order, threads = queue_renders(sched, [("user:a", "batch"), ("user:b", "interactive")])
+    sched.release(holder)
+    for thread in threads:
+        thread.join()
+    assert [lane for _, lane in order] == ["interactive", "batch"]
+
+
+def test_batch_lane_holds_at_most_its_slots(tmp_path):
+    sched = scheduler(tmp_path, slots=2, batch_slots=1)
+    batch = sched.acquire("user:a", "batch")
+    assert rejection(sched.acquire, "user:b", "batch", timeout=0.3).status == 503
+    with sched.slot("user:b", "interactive"):
+        pass
+    sched.release(batch)
+
+
+def test_slots_are_shared_by_every_scheduler_on_the_node(tmp_path):
+    first, second = scheduler(tmp_path), scheduler(tmp_path)
+    ticket = first.acquire("user:a")
+    assert rejection(second.acquire, "user:b", timeout=0.3).status == 503
+    first.release(ticket)
+    second.release(second.acquire("user:b", timeout=1))
+
+
+def test_queue_limits(tmp_path):
+    sched = scheduler(tmp_path, queue_max=3, tenant_max_queued=1, ip_max_queued=2)
+    holder = sched.acquire("user:holder")
+    _, threads = queue_renders(sched, [("user:a", "interactive"), ("ip:10.0.0.1", "interactive")])
+
+    refused = rejection(sched.check, "user:a")
+    assert refused.status == 429 and refused.retry_after >= 1
+    sched.check("ip:10.0.0.1")  # a shared address gets the higher limit
+    _, more = queue_renders(sched, [("ip:10.0.0.1", "interactive")])
+    assert rejection(sched.check, "ip:10.0.0.1").status == 429
+    assert rejection(sched.check, "user:c").status == 503
+    sched.check("user:c", "batch")
+
+    sched.release(holder)
+    for thread in threads + more:
+        thread.join()
+    sched.check("user:a")
+
+
+def test_queue_limits_apply_to_the_render_queue(tmp_path):
+    sched = scheduler(tmp_path, queue_max=2, tenant_max_queued=1)
+    queue = RenderQueue(str(tmp_path / "queue.sqlite3"))
+    sched.check("user:a", queue=queue)
+    queue.enqueue("job-a-0001", "user:a", "interactive", {})
+    assert rejection(sched.check, "user:a", queue=queue).status == 429
+    queue.enqueue("job-b-0001", "user:b", "interactive", {})
+    assert rejection(sched.check, "user:c", queue=queue).status == 503
+    sched.check("user:c", "batch", queue=queue)
+
+
+def test_cancelled_while_queued(tmp_path):
+    sched = scheduler(tmp_path)
+    holder = sched.acquire("user:holder")
+    try:
+        sched.acquire("user:a", cancelled=lambda: True)
+    except RenderCancelled:
+        pass
+    else:
+        raise AssertionError("not cancelled")
+    assert sched.queued() == 0
+    sched.release(holder)
+
+
+def test_tenant_is_the_address_without_a_verified_user():
+    assert tenant_for({"Authorization": "Bearer forged"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert tenant_for({}, None) == "ip:unknown"
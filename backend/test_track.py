@@ -0,0 +1,84 @@
+import array
+import contextlib
+import os
+import shutil
+import sys
+import wave
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from edudiff.audio import track
+from edudiff.audio.track import build_narration_track, mux_narration_with_holds
+
+RATE = 1000
+
+
+def write_wav(path, value, seconds, rate=RATE):
+    with contextlib.closing(wave.open(str(path), "w")) as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(array.array("h", [value] * int(seconds * rate)).tobytes())
+    return str(path)
+
+
+def read_samples(path):
+    with contextlib.closing(wave.open(str(path), "rb")) as f:
+        samples = array.array("h")
+        samples.frombytes(f.readframes(f.getnframes()))
+        return f.getframerate(), samples
+
+
+def test_clips_are_laid_out_at_their_offsets(tmp_path):
+    clips = [(1.5, write_wav(tmp_path / "b.wav", 200, 0.5)), (0.0, write_wav(tmp_path / "a.wav", 100, 1))]
+    rate, samples = read_samples(build_narration_track(clips, str(tmp_path / "out" / "track.wav")))
+    assert rate == RATE and len(samples) == 2 * RATE
+    assert set(samples[:RATE]) == {100}
+    assert set(samples[RATE:int(1.5 * RATE)]) == {0}
+    assert set(samples[int(1.5 * RATE):]) == {200}
+
+
+def test_overlapping_clips_are_mixed_with_clipping(tmp_path):
+    clips = [(0.0, write_wav(tmp_path / "a.wav", 30000, 1)), (0.5, write_wav(tmp_path / "b.wav", 10000, 1))]
+    _, samples = read_samples(build_narration_track(clips, str(tmp_path / "track.wav")))
+    assert len(samples) == int(1.5 * RATE)
+    assert samples[RATE // 2 - 1] == 30000
+    assert set(samples[RATE // 2:RATE]) == {32767}
+    assert set(samples[RATE:]) == {10000}
+
+
+def test_no_clips():
+    with pytest.raises(ValueError):
+        build_narration_track([], "track.wav")
+
+
+def test_other_formats_are_converted(tmp_path):
+    if shutil.which(track.FFMPEG_BINARY) is None:
+        pytest.skip("ffmpeg is not installed")
+    clips = [(0.0, write_wav(tmp_path / "a.wav", 100, 1)), (1.0, write_wav(tmp_path / "b.wav", 100, 1, rate=2000))]
+    rate, samples = read_samples(build_narration_track(clips, str(tmp_path / "track.wav")))
+    assert rate == RATE and abs(len(samples) - 2 * RATE) <= 2
+
+
+def test_holds_freeze_the_frame_at_each_segment(tmp_path, monkeypatch):
+    calls = []
+
+    def ffmpeg(args, what):
+        calls.append(args)
+        open(args[-1], "wb").close()
+
+    monkeypatch.setattr(track, "_ffmpeg", ffmpeg)
+    mux_narration_with_holds("in.mp4", "track.wav", [(1.0, 2.5), (3.0, 1.0)], str(tmp_path / "out.mp4"))
+    graph = calls[0][calls[0].index("-filter_complex") + 1].split(";")
+    assert graph[0] == "[0:v]split=3[s0][s1][s2]"
+    assert graph[1] == "[s0]trim=start=0.000:end=1.000,setpts=PTS-STARTPTS,tpad=stop_mode=clone:stop_duration=2.500[v0]"
+    assert graph[3] == "[s2]trim=start=3.000,setpts=PTS-STARTPTS[v2]"
+    assert graph[4] == "[v0][v1][v2]concat=n=3:v=1:a=0[v]"
+
+
+def test_missing_ffmpeg_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(track, "FFMPEG_BINARY", str(tmp_path / "no-ffmpeg"))
+    with pytest.raises(RuntimeError, match="not installed"):
+        mux_narration_with_holds("in.mp4", "track.wav", [], str(tmp_path / "out.mp4"))